@@ -0,0 +1,62 @@
+"""
+Benchmark of the amount formatting.
+
+Compares the shared amount formatter with the previous per-row formatting of
+the reports, `"{:,.2f} {}".format(number.normalize(), currency)`, on small
+amounts (postings), large amounts (running totals) and a mix of both, and
+checks that both give the same text.
+
+Run with: python benchmarks/bench_amount_format.py [COUNT]
+"""
+
+import random
+import sys
+import time
+from decimal import Decimal
+
+from ledger2bql.amount_format import format_amount
+
+COUNT = 200_000
+REPEAT = 5
+
+
+def make_numbers(count, low, high, seed=1):
+    rng = random.Random(seed)
+    return [Decimal(rng.randint(low, high)).scaleb(-2) for _ in range(count)]
+
+
+def previous_format(numbers):
+    return ["{:,.2f} {}".format(number.normalize(), "EUR") for number in numbers]
+
+
+def shared_format(numbers):
+    return [format_amount(number, "EUR") for number in numbers]
+
+
+def best_time(function, numbers):
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function(numbers)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(count=COUNT):
+    small = make_numbers(count, -99_999, 99_999)
+    large = make_numbers(count, -10**9, 10**9, seed=2)
+    mixed = small[: count // 2] + large[: count // 2]
+
+    print(f"{'amounts':<8}{'previous':>12}{'shared':>12}{'speedup':>10}")
+    for name, numbers in (("small", small), ("large", large), ("mixed", mixed)):
+        assert previous_format(numbers) == shared_format(numbers)
+        previous = best_time(previous_format, numbers)
+        shared = best_time(shared_format, numbers)
+        print(
+            f"{name:<8}{previous * 1e9 / count:>10.0f}ns{shared * 1e9 / count:>10.0f}ns"
+            f"{previous / shared:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else COUNT)
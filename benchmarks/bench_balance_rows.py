@@ -0,0 +1,85 @@
+"""
+Benchmark of the balance report rows.
+
+Formats a synthetic 100k-account balance and compares the memory and the
+attribute access time of the slotted AccountBalance rows with an equivalent
+class that has a per-instance dictionary.
+
+Run with: python benchmarks/bench_balance_rows.py [ROWS]
+"""
+
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+from beancount.core.amount import Amount
+from beancount.core.inventory import Inventory
+from beancount.core.position import Position
+
+from ledger2bql.balance import format_output
+from ledger2bql.models import AccountBalance, CommandArgs
+
+ROWS = 100_000
+CURRENCIES = ("EUR", "USD", "CHF")
+
+
+class DictAccountBalance:
+    """AccountBalance without __slots__, for comparison."""
+
+    def __init__(self, account, depth, units, converted=None):
+        self.account = account
+        self.depth = depth
+        self.units = units
+        self.converted = converted
+
+
+def make_rows(count):
+    rows = []
+    for i in range(count):
+        inventory = Inventory()
+        inventory.add_position(
+            Position(Amount(Decimal(i) / 100, CURRENCIES[i % len(CURRENCIES)]), None)
+        )
+        rows.append((f"Assets:Group{i % 100}:Account{i}", inventory))
+    return rows
+
+
+def measure_instances(row_class, count):
+    """Peak memory of `count` rows, and the time to read all their attributes."""
+    units = {"EUR": Decimal(1)}
+    tracemalloc.start()
+    instances = [row_class(f"Assets:Account{i}", 2, units) for i in range(count)]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(10):
+        for row in instances:
+            row.account, row.depth, row.units, row.converted
+    elapsed = time.perf_counter() - start
+    return peak, elapsed
+
+
+def main(count=ROWS):
+    rows = make_rows(count)
+
+    for name, args in (
+        ("bal", CommandArgs(account_regex=(), sort="account")),
+        ("bal -H", CommandArgs(account_regex=(), sort="account", hierarchy=True)),
+        ("bal -H -T", CommandArgs(account_regex=(), hierarchy=True, total=True)),
+    ):
+        start = time.perf_counter()
+        format_output(rows, args)
+        print(f"{name:<12} {time.perf_counter() - start:8.3f} s")
+
+    for row_class in (AccountBalance, DictAccountBalance):
+        peak, elapsed = measure_instances(row_class, count)
+        print(
+            f"{row_class.__name__:<20} {peak / count:8.1f} bytes/row "
+            f"{elapsed * 1e9 / (count * 10):8.1f} ns/row"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
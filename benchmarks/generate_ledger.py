@@ -0,0 +1,237 @@
+"""
+Deterministic generator of large synthetic Beancount ledgers.
+
+The same parameters and seed always produce the same file, so benchmark
+results can be compared across releases.
+
+Run with: python benchmarks/generate_ledger.py OUTPUT [--accounts N] ...
+"""
+
+import argparse
+import datetime
+import os
+import random
+from decimal import Decimal
+
+BASE_CURRENCY = "EUR"
+OTHER_CURRENCIES = ("USD", "CHF", "GBP", "BAM", "JPY", "CAD", "AUD", "SEK")
+START_YEAR = 2020
+CATEGORIES = ("Food", "Transport", "Housing", "Leisure", "Health")
+
+# Named queries written to the ledger, for the query command.
+QUERIES = {
+    "food": "SELECT date, account, position WHERE account ~ 'Expenses:Food'",
+    "large": "SELECT date, account, position WHERE number > 150",
+}
+
+
+def _amount(rng, low, high):
+    return Decimal(rng.randint(low * 100, high * 100)) / 100
+
+
+def generate_ledger(
+    stream,
+    accounts=100,
+    years=2,
+    postings_per_day=10,
+    currencies=3,
+    prices=True,
+    lots=50,
+    seed=1,
+    day_streams=None,
+):
+    """
+    Write a synthetic ledger to the stream.
+    accounts: number of expense accounts, in a two-level hierarchy.
+    postings_per_day: number of postings per day, two per transaction.
+    currencies: number of operating currencies, including EUR.
+    prices: write weekly price directives for the currencies and the stocks.
+    lots: number of stock purchases, with a cost basis.
+    day_streams: optional function returning the stream for the dated
+    directives of a given day. By default, everything goes to the stream.
+    """
+    rng = random.Random(seed)
+    write = stream.write
+    currencies = (BASE_CURRENCY,) + OTHER_CURRENCIES[: max(currencies, 1) - 1]
+    start = datetime.date(START_YEAR, 1, 1)
+    end = datetime.date(START_YEAR + years, 1, 1)
+
+    write('option "title" "Synthetic benchmark ledger"\n')
+    write(f'option "operating_currency" "{BASE_CURRENCY}"\n')
+    write('option "booking_method" "FIFO"\n\n')
+
+    # Accounts
+    bank_accounts = [f"Assets:Bank:{currency}" for currency in currencies]
+    cash_accounts = [f"Assets:Cash:{currency}" for currency in currencies]
+    expense_accounts = [
+        f"Expenses:{CATEGORIES[i % len(CATEGORIES)]}:Item{i:05d}"
+        for i in range(accounts)
+    ]
+    symbols = [f"STK{i}" for i in range(1, 6)] if lots else []
+    for account in bank_accounts + cash_accounts:
+        write(f"{start} open {account} {account.rsplit(':', 1)[1]}\n")
+    for account in expense_accounts:
+        write(f"{start} open {account}\n")
+    write(f"{start} open Income:Salary\n")
+    write(f"{start} open Equity:Opening-Balances\n")
+    if lots:
+        write(f"{start} open Assets:Broker\n")
+        write(f"{start} open Income:CapitalGains\n")
+    write("\n")
+
+    for name, query in QUERIES.items():
+        write(f'{start} query "{name}" "{query}"\n')
+    write("\n")
+
+    balances = {account: Decimal(0) for account in bank_accounts + cash_accounts}
+    holdings = {symbol: 0 for symbol in symbols}
+    rates = {currency: Decimal(rng.randint(50, 200)) / 100 for currency in currencies}
+    stock_prices = {symbol: Decimal(rng.randint(10, 500)) for symbol in symbols}
+
+    total_days = (end - start).days
+    lot_days = sorted(rng.randrange(total_days) for _ in range(lots))
+    transactions_per_day = max(postings_per_day // 2, 1)
+
+    day = start
+    day_index = 0
+    while day < end:
+        if day_streams:
+            write = day_streams(day).write
+
+        # Balance assertions at the start of each month.
+        if day.day == 1 and day != start:
+            for account, balance in balances.items():
+                currency = account.rsplit(":", 1)[1]
+                write(f"{day} balance {account} {balance} {currency}\n")
+
+        # Prices, once a week.
+        if prices and day.weekday() == 0:
+            for currency in currencies[1:]:
+                rates[currency] = max(
+                    rates[currency] + Decimal(rng.randint(-5, 5)) / 1000, Decimal("0.01")
+                )
+                write(f"{day} price {currency} {rates[currency]} {BASE_CURRENCY}\n")
+            for symbol in symbols:
+                stock_prices[symbol] = max(
+                    stock_prices[symbol] + rng.randint(-10, 10), Decimal(1)
+                )
+                write(f"{day} price {symbol} {stock_prices[symbol]} {BASE_CURRENCY}\n")
+
+        # Salary, at the start of each month.
+        if day.day == 1:
+            for account in bank_accounts:
+                currency = account.rsplit(":", 1)[1]
+                amount = _amount(rng, 3000, 6000)
+                balances[account] += amount
+                write(
+                    f'{day} * "Employer" "Salary"\n'
+                    f"  {account}  {amount} {currency}\n"
+                    f"  Income:Salary  {-amount} {currency}\n\n"
+                )
+
+        for _ in range(transactions_per_day):
+            account = rng.choice(bank_accounts + cash_accounts)
+            currency = account.rsplit(":", 1)[1]
+            amount = _amount(rng, 1, 200)
+            balances[account] -= amount
+            write(
+                f'{day} * "Payee {rng.randrange(500)}" "Purchase"\n'
+                f"  {rng.choice(expense_accounts)}  {amount} {currency}\n"
+                f"  {account}  {-amount} {currency}\n\n"
+            )
+
+        # Stock purchases, and the occasional sale of the oldest lots.
+        while lot_days and lot_days[0] == day_index:
+            lot_days.pop(0)
+            symbol = rng.choice(symbols)
+            price = stock_prices[symbol]
+            account = bank_accounts[0]
+            if holdings[symbol] >= 20 and rng.random() < 0.3:
+                quantity = rng.randint(1, holdings[symbol] // 2)
+                holdings[symbol] -= quantity
+                balances[account] += quantity * price
+                write(
+                    f'{day} * "Broker" "Sell {symbol}"\n'
+                    f"  Assets:Broker  {-quantity} {symbol} {{}} @ {price} {BASE_CURRENCY}\n"
+                    f"  {account}  {quantity * price} {BASE_CURRENCY}\n"
+                    f"  Income:CapitalGains\n\n"
+                )
+            else:
+                quantity = rng.randint(1, 50)
+                holdings[symbol] += quantity
+                balances[account] -= quantity * price
+                write(
+                    f'{day} * "Broker" "Buy {symbol}"\n'
+                    f"  Assets:Broker  {quantity} {symbol} {{{price} {BASE_CURRENCY}}}\n"
+                    f"  {account}  {-quantity * price} {BASE_CURRENCY}\n\n"
+                )
+
+        day += datetime.timedelta(days=1)
+        day_index += 1
+
+
+def generate_split_ledger(directory, files=12, years=2, **options):
+    """
+    Write a synthetic ledger split into a main file, with the options and
+    the accounts, and the given number of included files, by date.
+    Returns the path of the main file.
+    """
+    start = datetime.date(START_YEAR, 1, 1)
+    total_days = (datetime.date(START_YEAR + years, 1, 1) - start).days
+    names = [f"part{index:03d}.bean" for index in range(files)]
+    streams = [
+        open(os.path.join(directory, name), "w", encoding="utf-8") for name in names
+    ]
+    book = os.path.join(directory, "main.bean")
+    try:
+        with open(book, "w", encoding="utf-8") as stream:
+            generate_ledger(
+                stream,
+                years=years,
+                day_streams=lambda day: streams[(day - start).days * files // total_days],
+                **options,
+            )
+            for name in names:
+                stream.write(f'include "{name}"\n')
+    finally:
+        for part in streams:
+            part.close()
+    return book
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "output", help="Path of the ledger file to write, or the directory with --files."
+    )
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--postings-per-day", type=int, default=10)
+    parser.add_argument("--currencies", type=int, default=3)
+    parser.add_argument("--no-prices", action="store_true")
+    parser.add_argument("--lots", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--files", type=int, help="Split the ledger into this many included files."
+    )
+    options = parser.parse_args()
+
+    generator = {
+        "accounts": options.accounts,
+        "years": options.years,
+        "postings_per_day": options.postings_per_day,
+        "currencies": options.currencies,
+        "prices": not options.no_prices,
+        "lots": options.lots,
+        "seed": options.seed,
+    }
+    if options.files:
+        os.makedirs(options.output, exist_ok=True)
+        generate_split_ledger(options.output, options.files, **generator)
+    else:
+        with open(options.output, "w", encoding="utf-8") as stream:
+            generate_ledger(stream, **generator)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Benchmark suite for the ledger2bql commands.
+
+Generates a synthetic ledger, then times every report:
+- end to end, as a separate process, like a user would run it;
+- per stage, in process: ledger load, query, format and render.
+With --scaling, the load of a ledger split into many included files is also
+timed with an increasing number of parser processes (--jobs).
+
+The results are printed as a summary and can be written as JSON, to track
+regressions across releases.
+
+Run with: python benchmarks/run_benchmarks.py [--output results.json] ...
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from importlib import import_module
+from unittest import mock
+
+from generate_ledger import generate_ledger, generate_split_ledger
+
+# Report name, command line.
+SCENARIOS = [
+    ("bal", ["bal"]),
+    ("bal -H", ["bal", "-H"]),
+    ("bal -X", ["bal", "-X", "EUR"]),
+    ("reg -T", ["reg", "-T"]),
+    ("lots -A", ["lots", "-A"]),
+    ("price", ["price"]),
+    ("assert", ["assert"]),
+    ("query", ["query", "food"]),
+]
+
+# The module holding the format_output function of each command.
+FORMAT_MODULES = {
+    "bal": "ledger2bql.balance",
+    "reg": "ledger2bql.register",
+    "lots": "ledger2bql.lots",
+    "price": "ledger2bql.price",
+    "assert": "ledger2bql.assert_command",
+    "query": "ledger2bql.query",
+}
+
+STAGES = ("load", "query", "format", "render")
+
+
+class StageTimer:
+    """Accumulates the time spent in the wrapped functions, by stage."""
+
+    def __init__(self):
+        self.times = defaultdict(float)
+
+    def wrap(self, stage, func, consume=False):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                if consume:
+                    # Lazily rendered output is produced here, not later.
+                    result = list(result)
+                return result
+            finally:
+                self.times[stage] += time.perf_counter() - start
+
+        return wrapper
+
+
+@contextmanager
+def instrumented(timer, command):
+    """Patch the pipeline functions to time each stage of the command."""
+    from ledger2bql import ledger, utils
+    import tabulate
+
+    format_module = import_module(FORMAT_MODULES[command])
+    with mock.patch.object(
+        ledger, "load_ledger", timer.wrap("load", ledger.load_ledger)
+    ), mock.patch.object(
+        ledger.Ledger, "execute", timer.wrap("query", ledger.Ledger.execute)
+    ), mock.patch.object(
+        format_module, "format_output", timer.wrap("format", format_module.format_output)
+    ), mock.patch.object(
+        utils, "render_table", timer.wrap("render", utils.render_table, consume=True)
+    ), mock.patch.object(
+        tabulate, "tabulate", timer.wrap("render", tabulate.tabulate)
+    ):
+        yield
+
+
+def time_stages(argv, env):
+    """Run the command in process and return the time of each stage."""
+    from click.testing import CliRunner
+    from ledger2bql import ledger
+    from ledger2bql.main import cli
+
+    # Load the ledger (from the cache) on every run, like a new process would.
+    ledger._ledgers.clear()
+
+    timer = StageTimer()
+    with instrumented(timer, argv[0]):
+        start = time.perf_counter()
+        result = CliRunner().invoke(cli, argv + ["--no-pager"], env=env)
+        total = time.perf_counter() - start
+    if result.exit_code != 0:
+        raise RuntimeError(f"{' '.join(argv)} failed: {result.output}{result.exception}")
+
+    stages = {stage: timer.times[stage] for stage in STAGES}
+    stages["other"] = max(total - sum(stages.values()), 0.0)
+    stages["total"] = total
+    return stages
+
+
+def time_end_to_end(argv, env):
+    """Run the command as a new process and return the wall time."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "ledger2bql.main"] + argv + ["--no-pager"],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def summarize(samples):
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "runs": len(samples),
+    }
+
+
+def run_benchmarks(book, repeat, cache_dir, scenarios=SCENARIOS):
+    """Time all the scenarios on the given ledger file."""
+    from ledger2bql.cache import load_ledger
+
+    env = dict(
+        os.environ,
+        BEANCOUNT_FILE=book,
+        LEDGER2BQL_NO_DAEMON="1",
+        LEDGER2BQL_CACHE_DIR=cache_dir,
+    )
+    os.environ.update(env)
+
+    # A cold load parses the ledger and fills the cache for the other runs.
+    start = time.perf_counter()
+    entries, errors, _ = load_ledger(book)
+    ledger_info = {
+        "file": os.path.abspath(book),
+        "size": os.path.getsize(book),
+        "entries": len(entries),
+        "errors": len(errors),
+        "cold_load": time.perf_counter() - start,
+    }
+
+    results = []
+    for name, argv in scenarios:
+        end_to_end = [time_end_to_end(argv, env) for _ in range(repeat)]
+        stage_runs = [time_stages(argv, env) for _ in range(repeat)]
+        stages = {
+            stage: statistics.median(run[stage] for run in stage_runs)
+            for stage in stage_runs[0]
+        }
+        results.append(
+            {
+                "name": name,
+                "argv": argv,
+                "end_to_end": summarize(end_to_end),
+                "stages": stages,
+            }
+        )
+    return ledger_info, results
+
+
+def default_jobs():
+    """1, 2, 4, ... up to the number of CPUs."""
+    jobs = [1]
+    while jobs[-1] * 2 <= (os.cpu_count() or 1):
+        jobs.append(jobs[-1] * 2)
+    if jobs[-1] != (os.cpu_count() or 1):
+        jobs.append(os.cpu_count())
+    return jobs
+
+
+def run_scaling(book, jobs_list, repeat):
+    """
+    Time the load of a split ledger, without any cache, with each number of
+    parser processes. Returns one result per number of jobs.
+    """
+    from ledger2bql import incremental
+
+    os.environ["LEDGER2BQL_DISABLE_CACHE"] = "1"
+    try:
+        results = []
+        for jobs in jobs_list:
+            incremental.set_jobs(jobs)
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                incremental.load_ledger_incremental(book)
+                samples.append(time.perf_counter() - start)
+            results.append({"jobs": jobs, "load": summarize(samples)})
+    finally:
+        incremental.set_jobs(None)
+        del os.environ["LEDGER2BQL_DISABLE_CACHE"]
+
+    for result in results:
+        result["speedup"] = results[0]["load"]["median"] / result["load"]["median"]
+    return results
+
+
+def print_scaling(scaling, files, stream=sys.stdout):
+    stream.write(f"\nParallel load of {files} included files, {os.cpu_count()} CPUs\n")
+    stream.write(f"{'jobs':<10}{'load':>12}{'speedup':>12}\n")
+    for result in scaling:
+        stream.write(
+            f"{result['jobs']:<10}{result['load']['median']:>11.3f}s"
+            f"{result['speedup']:>11.2f}x\n"
+        )
+
+
+def print_summary(ledger_info, results, stream=sys.stdout):
+    stream.write(
+        f"Ledger: {ledger_info['entries']} entries, "
+        f"{ledger_info['size'] / 1e6:.1f} MB, "
+        f"cold load {ledger_info['cold_load']:.2f} s\n\n"
+    )
+    columns = ("end-to-end",) + STAGES + ("other",)
+    stream.write(f"{'report':<10}" + "".join(f"{c:>12}" for c in columns) + "\n")
+    for result in results:
+        values = [result["end_to_end"]["median"]] + [
+            result["stages"][stage] for stage in STAGES + ("other",)
+        ]
+        stream.write(
+            f"{result['name']:<10}" + "".join(f"{v:>11.3f}s" for v in values) + "\n"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ledger", help="Benchmark an existing ledger file.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--postings-per-day", type=int, default=10)
+    parser.add_argument("--currencies", type=int, default=3)
+    parser.add_argument("--no-prices", action="store_true")
+    parser.add_argument("--lots", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--only", action="append", help="Run only the named reports, e.g. 'bal -H'."
+    )
+    parser.add_argument(
+        "--scaling",
+        action="store_true",
+        help="Also time the parallel load of a ledger split into included files.",
+    )
+    parser.add_argument(
+        "--files", type=int, default=24, help="Number of included files, with --scaling."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        nargs="+",
+        help="Numbers of parser processes, with --scaling (default: 1, 2, 4, ... CPUs).",
+    )
+    options = parser.parse_args()
+
+    generator = {
+        "accounts": options.accounts,
+        "years": options.years,
+        "postings_per_day": options.postings_per_day,
+        "currencies": options.currencies,
+        "prices": not options.no_prices,
+        "lots": options.lots,
+        "seed": options.seed,
+    }
+    scenarios = [
+        scenario
+        for scenario in SCENARIOS
+        if not options.only or scenario[0] in options.only
+    ]
+    with tempfile.TemporaryDirectory(prefix="ledger2bql-bench-") as workdir:
+        book = options.ledger
+        if not book:
+            book = os.path.join(workdir, "ledger.bean")
+            with open(book, "w", encoding="utf-8") as stream:
+                generate_ledger(stream, **generator)
+        ledger_info, results = run_benchmarks(
+            book, options.repeat, os.path.join(workdir, "cache"), scenarios
+        )
+        scaling = None
+        if options.scaling:
+            split_dir = os.path.join(workdir, "split")
+            os.makedirs(split_dir)
+            split_book = generate_split_ledger(split_dir, options.files, **generator)
+            scaling = run_scaling(
+                split_book, options.jobs or default_jobs(), options.repeat
+            )
+    print_summary(ledger_info, results)
+    if scaling:
+        print_scaling(scaling, options.files)
+
+    if options.output:
+        try:
+            from importlib.metadata import version
+
+            ledger2bql_version = version("ledger2bql")
+        except Exception:
+            ledger2bql_version = "local"
+        report = {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "ledger2bql": ledger2bql_version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "generator": None if options.ledger else generator,
+            "ledger": ledger_info,
+            "results": results,
+            "scaling": scaling,
+        }
+        with open(options.output, "w", encoding="utf-8") as stream:
+            json.dump(report, stream, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Account index over the loaded entries, to prune the queries on accounts.
+
+The account filters become `account ~ '...'` conditions, which beanquery
+matches against the account of every posting. A ledger has far fewer
+accounts than postings, so the conditions are resolved once against the
+account names instead, and only the transactions with a posting to one of
+the resulting accounts are scanned.
+
+This module imports beanquery, and is imported only to run a query.
+"""
+
+import heapq
+import re
+from bisect import bisect_left
+
+from beancount.core import data
+from beanquery.parser import ast
+from beanquery.sources.beancount import PostingsTable
+
+from .date_index import can_prune, conjuncts
+
+
+class AccountIndex:
+    """The accounts of the ledger, with the positions of their transactions."""
+
+    __slots__ = ("accounts", "positions")
+
+    def __init__(self, entries):
+        # Account -> positions of the transactions with a posting to it.
+        positions = {}
+        opened = set()
+        for position, entry in enumerate(entries):
+            if isinstance(entry, data.Transaction):
+                for posting in entry.postings:
+                    account_positions = positions.setdefault(posting.account, [])
+                    if not account_positions or account_positions[-1] != position:
+                        account_positions.append(position)
+            elif isinstance(entry, data.Open):
+                opened.add(entry.account)
+        # The accounts of the Open directives, and of the postings, in case
+        # the ledger posts to an account that was never opened.
+        self.accounts = sorted(opened.union(positions))
+        self.positions = positions
+
+    def match(self, condition):
+        """
+        The set of accounts which satisfy an account condition of a WHERE
+        clause, or None when the condition is not about the account alone.
+        """
+        if isinstance(condition, ast.Or):
+            matches = [self.match(arg) for arg in condition.args]
+            if any(match is None for match in matches):
+                return None
+            return set().union(*matches)
+        if isinstance(condition, ast.Not):
+            match = self.match(condition.operand)
+            return None if match is None else set(self.accounts) - match
+        if isinstance(condition, ast.NotMatch):
+            match = self.match(ast.Match(condition.left, condition.right))
+            return None if match is None else set(self.accounts) - match
+
+        if not isinstance(condition, (ast.Match, ast.Equal)):
+            return None
+        left, right = condition.left, condition.right
+        if not (isinstance(left, ast.Column) and left.name == "account"):
+            return None
+        if not (isinstance(right, ast.Constant) and isinstance(right.value, str)):
+            return None
+
+        if isinstance(condition, ast.Equal):
+            return {right.value} if right.value in self.positions else set()
+        # Same as the ~ operator of beanquery.
+        try:
+            regex = re.compile(right.value, re.IGNORECASE)
+        except re.error:
+            return None
+        return {account for account in self.accounts if regex.search(account)}
+
+    def entry_positions(self, accounts, lo=0, hi=None):
+        """
+        The sorted positions, within [lo, hi), of the transactions with a
+        posting to one of the accounts.
+        """
+        lists = []
+        for account in accounts:
+            account_positions = self.positions.get(account)
+            if account_positions:
+                start = bisect_left(account_positions, lo)
+                stop = len(account_positions)
+                if hi is not None:
+                    stop = bisect_left(account_positions, hi)
+                lists.append(account_positions[start:stop])
+
+        merged = []
+        for position in heapq.merge(*lists):
+            if not merged or merged[-1] != position:
+                merged.append(position)
+        return merged
+
+    def count_transactions(self, accounts):
+        """An upper bound of the number of transactions of the accounts."""
+        return sum(len(self.positions.get(account, ())) for account in accounts)
+
+
+def _uses_account(condition):
+    return any(
+        isinstance(node, ast.Column) and node.name == "account"
+        for node in condition.walk()
+    )
+
+
+def query_accounts(statement, ledger):
+    """
+    Resolve the account conditions which the WHERE clause of a parsed query
+    requires, i.e. `account ~ '^Assets:Bank'` and `NOT (account ~ '...')`,
+    with the account index of the ledger.
+    Returns the set of the accounts which can match, or None when the query
+    cannot be restricted to some accounts.
+    """
+    if not can_prune(statement):
+        return None
+    conditions = [
+        condition
+        for condition in conjuncts(statement.where_clause)
+        if _uses_account(condition)
+    ]
+    if not conditions:
+        # The index is not even built.
+        return None
+
+    index = ledger.account_index
+    accounts = None
+    for condition in conditions:
+        match = index.match(condition)
+        if match is not None:
+            accounts = match if accounts is None else accounts & match
+    return accounts
+
+
+class AccountPostingsTable(PostingsTable):
+    """The postings table, restricted to the postings of some accounts."""
+
+    def __init__(self, entries, options, accounts):
+        super().__init__(entries, options)
+        self.accounts = accounts
+
+    def __iter__(self):
+        accounts = self.accounts
+        for context in super().__iter__():
+            if context.posting.account in accounts:
+                yield context
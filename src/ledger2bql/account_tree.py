@@ -0,0 +1,125 @@
+"""
+Account tree for the balance report.
+
+The balances of the query rows are stored in a trie of account nodes, one
+node per account name component. Each node holds its own balance and, after
+aggregate(), the total of its whole subtree, as plain {currency: Decimal}
+dictionaries. The tree is shared by --hierarchy (subtree totals), --depth
+(accounts collapsed to a level) and --total (sum of the top-level nodes).
+"""
+
+from decimal import Decimal
+
+
+def inventory_units(inventory):
+    """
+    Get the units of an Inventory as a {currency: number} dictionary, in the
+    order of the inventory positions.
+    """
+    units = {}
+    for position in inventory:
+        currency = position.units.currency
+        units[currency] = units.get(currency, Decimal(0)) + position.units.number
+    return units
+
+
+def add_units(target, units):
+    """Add the {currency: number} units into the target dictionary."""
+    for currency, number in units.items():
+        if currency in target:
+            target[currency] += number
+        else:
+            target[currency] = number
+
+
+class AccountNode:
+    """One account in the tree."""
+
+    __slots__ = (
+        "name",
+        "depth",
+        "parent",
+        "children",
+        "balance",
+        "converted",
+        "total",
+        "total_converted",
+        "has_balance",
+    )
+
+    def __init__(self, name, depth, parent):
+        self.name = name
+        self.depth = depth
+        self.parent = parent
+        self.children = {}
+        # The account's own balance, from the query rows.
+        self.balance = {}
+        self.converted = Decimal(0)
+        # The balance of the account and all its descendants.
+        self.total = {}
+        self.total_converted = Decimal(0)
+        self.has_balance = False
+
+
+class AccountTree:
+    """A trie of accounts, keyed by the account name components."""
+
+    def __init__(self):
+        self.roots = {}
+        # All the nodes, by full account name. Parents are created, and
+        # therefore listed, before their children.
+        self.nodes = {}
+        # The nodes that received a balance, in the order of the rows.
+        self.accounts = []
+
+    def get_node(self, account):
+        """Get the node of an account, creating it and its parents if needed."""
+        node = self.nodes.get(account)
+        if node is not None:
+            return node
+
+        separator = account.rfind(":")
+        if separator < 0:
+            node = AccountNode(account, 1, None)
+            self.roots[account] = node
+        else:
+            parent = self.get_node(account[:separator])
+            node = AccountNode(account, parent.depth + 1, parent)
+            parent.children[account[separator + 1 :]] = node
+        self.nodes[account] = node
+        return node
+
+    def add(self, account, units, converted=None):
+        """Add a balance, as {currency: number} units, to an account."""
+        node = self.get_node(account)
+        if not node.has_balance:
+            node.has_balance = True
+            self.accounts.append(node)
+        add_units(node.balance, units)
+        if converted is not None:
+            node.converted += converted
+        return node
+
+    def _post_order(self):
+        """The nodes, children (in insertion order) before their parent."""
+        order = []
+        stack = list(self.roots.values())
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children.values())
+        order.reverse()
+        return order
+
+    def aggregate(self):
+        """
+        Compute the subtree totals bottom-up, in one pass over the nodes.
+        A node's total lists the currencies of its children first, then its own.
+        """
+        for node in self._post_order():
+            add_units(node.total, node.balance)
+            node.total_converted += node.converted
+            parent = node.parent
+            if parent is not None:
+                add_units(parent.total, node.total)
+                parent.total_converted += node.total_converted
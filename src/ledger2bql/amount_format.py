@@ -0,0 +1,74 @@
+"""
+Formatting of the amounts in the reports.
+
+The reports print every amount with thousands separators and a fixed number
+of decimal places, like "{:,.2f}". Formatting the Decimals is the biggest
+cost of the formatting stage of a large register, so the formatters here
+are built once per number of decimal places and shared by all the commands:
+
+- the format specification is parsed once, and format() is called directly;
+- fast path: an amount below 1000 with exactly that many decimal places,
+  which is what most postings are, is already printed correctly by
+  str(number), so it needs no formatting at all.
+
+Every other number goes through format(), so the output is always the same
+as with "{:,.2f}".format(number).
+"""
+
+from decimal import Decimal
+
+# The formatters, by number of decimal places.
+_number_formats = {}
+_amount_formats = {}
+
+
+def number_format(places=2):
+    """
+    Get the formatter of numbers with the given decimal places, as a
+    function of the number which returns the text.
+    """
+    formatter = _number_formats.get(places)
+    if formatter is not None:
+        return formatter
+
+    spec = f",.{places}f"
+    point = -places - 1
+
+    def format_number(number):
+        # Below 1000, without exponent and with exactly `places` decimals.
+        if type(number) is Decimal and places and number.adjusted() < 3:
+            text = str(number)
+            if text[point : point + 1] == ".":
+                return text
+        return format(number, spec)
+
+    _number_formats[places] = format_number
+    return format_number
+
+
+def amount_format(places=2):
+    """
+    Get the formatter of amounts with the given decimal places, as a
+    function of the number and the currency, i.e. "1,234.50 EUR".
+    """
+    formatter = _amount_formats.get(places)
+    if formatter is not None:
+        return formatter
+
+    spec = f",.{places}f"
+    point = -places - 1
+
+    def format_amount(number, currency):
+        if type(number) is Decimal and places and number.adjusted() < 3:
+            text = str(number)
+            if text[point : point + 1] == ".":
+                return f"{text} {currency}"
+        return f"{format(number, spec)} {currency}"
+
+    _amount_formats[places] = format_amount
+    return format_amount
+
+
+# The formatters of the reports, with two decimal places.
+format_number = number_format(2)
+format_amount = amount_format(2)
@@ -4,6 +4,8 @@ into a Beanquery (BQL) query.
 """
 
 import click
+from .amount_format import format_amount
+from .models import CommandArgs
 from .date_parser import parse_date, parse_date_range
 from .utils import (
     add_common_click_arguments,
@@ -20,14 +22,7 @@ from .utils import (
 def assert_command(account_regex, **kwargs):
     """Translate ledger-cli assert command arguments to a Beanquery (BQL) query."""
 
-    # Package arguments in a way compatible with the existing code
-    class Args:
-        def __init__(self, account_regex, **kwargs):
-            self.account_regex = account_regex
-            for key, value in kwargs.items():
-                setattr(self, key, value)
-
-    args = Args(account_regex, **kwargs)
+    args = CommandArgs(account_regex=account_regex, **kwargs)
 
     # Determine headers for the table
     headers = ["Date", "Account", "Balance"]
@@ -145,7 +140,7 @@ def format_output(output: list, args) -> list:
 
         # Format the amount object
         # The Amount object has a number and currency attribute
-        formatted_balance = "{:,.2f} {}".format(amount_obj.number, amount_obj.currency)
+        formatted_balance = format_amount(amount_obj.number, amount_obj.currency)
 
         # Assemble the row
         new_row = [date, account_name, formatted_balance]
@@ -3,7 +3,9 @@ A command-line tool to translate ledger-cli 'balance' command syntax
 into a Beanquery (BQL) query.
 """
 
+import datetime
 import click
+from functools import partial
 from .date_parser import parse_date, parse_date_range
 from .utils import (
     add_common_click_arguments,
@@ -12,6 +14,16 @@ from .utils import (
     parse_account_pattern,
     parse_amount_filter,
 )
+from .amount_format import format_amount
+from .account_tree import AccountTree, add_units, inventory_units
+from .models import AccountBalance, CommandArgs, ConvertedAmount
+from .periods import (
+    PERIOD_COLUMNS,
+    PERIODS,
+    key_start,
+    period_label,
+    period_starts,
+)
 
 
 @click.command(name="bal", short_help="[b] Show account balances")
@@ -30,27 +42,50 @@ from .utils import (
     is_flag=True,
     help="Show hierarchical view with parent accounts aggregated.",
 )
+@click.option(
+    "--period",
+    type=click.Choice(PERIODS, case_sensitive=False),
+    help="Show the balance changes of each period in its own column.",
+)
 
 @click.argument("account_regex", nargs=-1)
 @add_common_click_arguments
-def bal_command(account_regex, depth, zero, hierarchy, sort=None, **kwargs):
+def bal_command(account_regex, depth, zero, hierarchy, period, sort=None, **kwargs):
     """Translate ledger-cli balance command arguments to a Beanquery (BQL) query."""
     # Apply default sorting for balance command if no sort is specified
     if sort is None:
         sort = "account"
 
-    # Package arguments in a way compatible with the existing code
-    class Args:
-        def __init__(self, account_regex, depth, zero, hierarchy, sort=None, **kwargs):
-            self.account_regex = account_regex
-            self.depth = depth
-            self.zero = zero
-            self.hierarchy = hierarchy
-            self.sort = sort
-            for key, value in kwargs.items():
-                setattr(self, key, value)
+    args = CommandArgs(
+        account_regex=account_regex,
+        depth=depth,
+        zero=zero,
+        hierarchy=hierarchy,
+        period=period and period.lower(),
+        sort=sort,
+        **kwargs,
+    )
 
-    args = Args(account_regex, depth, zero, hierarchy, sort=sort, **kwargs)
+    if args.period:
+        if args.hierarchy:
+            raise click.UsageError("--period cannot be used with --hierarchy.")
+        if args.amount:
+            raise click.UsageError("--period cannot be used with --amount.")
+        if args.sort.lstrip("-") != "account":
+            raise click.UsageError("--period reports can only be sorted by account.")
+
+        # The period columns are added once the periods are known.
+        headers = ["Account"]
+        alignments = ["left"]
+        execute_bql_command_with_click(
+            parse_period_query,
+            partial(format_period_output, headers=headers, alignments=alignments),
+            headers,
+            alignments,
+            args,
+            command_type="bal-period",
+        )
+        return
 
     # Determine headers for the table
     headers = ["Account", "Balance"]
@@ -62,10 +97,9 @@ def bal_command(account_regex, depth, zero, hierarchy, sort=None, **kwargs):
     )
 
 
-def parse_query(args):
-    """Parse Ledger query into BQL"""
+def get_where_clauses(args):
+    """The conditions of the balance query, from the filters of the command."""
     where_clauses = []
-    group_by_clauses = []
 
     # Handle account regular expressions and payee filters
     account_regexes, excluded_account_regexes, payee_where_clauses = (
@@ -119,15 +153,28 @@ def parse_query(args):
         else:
             where_clauses.append(f"currency = '{args.currency}'")
 
+    return where_clauses
+
+
+def parse_query(args):
+    """Parse Ledger query into BQL"""
+    where_clauses = get_where_clauses(args)
+    group_by_clauses = []
+
     # Build the final query
 
-    
-    # Original logic for building the query
+    # With --depth (and without the hierarchy), the accounts are collapsed to
+    # the depth level by the query engine, grouping on the truncated account.
+    account_column = "account"
+    if getattr(args, "depth", None) and not getattr(args, "hierarchy", False):
+        account_column = f"root(account, {int(args.depth)}) as account"
+        group_by_clauses.append("account")
+
     if hasattr(args, "exchange") and args.exchange:
         # When exchange currency is specified, convert all positions to that currency
-        select_clause = f"SELECT account, units(sum(position)) as Balance, convert(sum(position), '{args.exchange}') as Converted"
+        select_clause = f"SELECT {account_column}, units(sum(position)) as Balance, convert(sum(position), '{args.exchange}') as Converted"
     else:
-        select_clause = "SELECT account, units(sum(position)) as Balance"
+        select_clause = f"SELECT {account_column}, units(sum(position)) as Balance"
     query = select_clause
 
     if where_clauses:
@@ -229,508 +276,71 @@ def format_output(output: list, args) -> list:
         
         output = filtered_output
 
-    # Handle hierarchical view if requested
-    if hasattr(args, "hierarchy") and args.hierarchy:
-        # Create hierarchical view: show parent accounts with their aggregated balances
-        from collections import defaultdict
-        from decimal import Decimal
-
-        # Dictionary to store balances for parent accounts
-        parent_balances = defaultdict(lambda: defaultdict(Decimal))
-        parent_converted = defaultdict(Decimal) if args.exchange else None
-
-        # First, collect all individual account balances and compute parent balances
-        individual_rows = {}
-        # Keep track of which accounts exist as individual accounts
-        individual_accounts = set()
-
-        for row in list(output):  # Ensure output is a list of lists
-            if not row:
-                continue
-
-            account_name = row[0]
-            individual_rows[account_name] = row
-            individual_accounts.add(account_name)
-
-            # Compute balances for all parent accounts
-            parts = account_name.split(":")
-
-            # For each level of the hierarchy, add this account's balance
-            for i in range(
-                len(parts) - 1
-            ):  # Don't include the account itself, only parents
-                parent_account = ":".join(parts[: i + 1])
-
-                # Handle currency conversion and balance aggregation
-                if args.exchange:
-                    # When exchange currency is specified, we have an additional column with converted values
-                    balance_inventory = row[1]  # Original balance
-
-                    # Sum original balances by currency
-                    if hasattr(
-                        balance_inventory, "items"
-                    ):  # It's an inventory with multiple currencies
-                        for currency, amount in balance_inventory.items():
-                            # Extract currency string
-                            if isinstance(currency, tuple):
-                                currency_str = currency[0]
-                            else:
-                                currency_str = currency
-
-                            # Extract number (handle Decimal)
-                            number = amount.units.number
-
-                            # Add to parent balance
-                            parent_balances[parent_account][currency_str] += number
-
-                    # For converted balances, we need to get the converted value for this specific row
-                    converted_inventory = row[2]  # Converted balance
-                    converted_amount = converted_inventory.get_currency_units(
-                        args.exchange
-                    )
-                    parent_converted[parent_account] += converted_amount.number
-                else:
-                    # The balance is always the last element in the row tuple
-                    balance_inventory = row[-1]
-
-                    # Sum balances by currency
-                    if hasattr(
-                        balance_inventory, "items"
-                    ):  # It's an inventory with multiple currencies
-                        for currency, amount in balance_inventory.items():
-                            # Extract currency string
-                            if isinstance(currency, tuple):
-                                currency_str = currency[0]
-                            else:
-                                currency_str = currency
-
-                            # Extract number (handle Decimal)
-                            number = amount.units.number
-
-                            # Add to parent balance
-                            parent_balances[parent_account][currency_str] += number
-
-        # Now, for accounts that exist as individual accounts, also add their own balances to their aggregated balances
-        for account_name in individual_accounts:
-            # Handle currency conversion and balance aggregation for the account's own balance
-            row = individual_rows[account_name]
-            if args.exchange:
-                # When exchange currency is specified, we have an additional column with converted values
-                balance_inventory = row[1]  # Original balance
-
-                # Sum original balances by currency
-                if hasattr(
-                    balance_inventory, "items"
-                ):  # It's an inventory with multiple currencies
-                    for currency, amount in balance_inventory.items():
-                        # Extract currency string
-                        if isinstance(currency, tuple):
-                            currency_str = currency[0]
-                        else:
-                            currency_str = currency
-
-                        # Extract number (handle Decimal)
-                        number = amount.units.number
-
-                        # Add to the account's own aggregated balance
-                        parent_balances[account_name][currency_str] += number
-
-                # For converted balances, we need to get the converted value for this specific row
-                converted_inventory = row[2]  # Converted balance
-                converted_amount = converted_inventory.get_currency_units(args.exchange)
-                parent_converted[account_name] += converted_amount.number
-            else:
-                # The balance is always the last element in the row tuple
-                balance_inventory = row[-1]
-
-                # Sum balances by currency
-                if hasattr(
-                    balance_inventory, "items"
-                ):  # It's an inventory with multiple currencies
-                    for currency, amount in balance_inventory.items():
-                        # Extract currency string
-                        if isinstance(currency, tuple):
-                            currency_str = currency[0]
-                        else:
-                            currency_str = currency
-
-                        # Extract number (handle Decimal)
-                        number = amount.units.number
-
-                        # Add to the account's own aggregated balance
-                        parent_balances[account_name][currency_str] += number
-
-        # Create combined output with both individual accounts and parent aggregates
-        combined_output = []
-
-        # Collect all unique account names (both individual and parents)
-        all_accounts = set()
-        all_accounts.update(individual_rows.keys())
-        all_accounts.update(parent_balances.keys())
-
-        # Sort accounts to show them in a logical order
-        sorted_accounts = sorted(all_accounts)
-
-        for account_name in sorted_accounts:
-            # For all accounts, use the aggregated balances which include:
-            # 1. The account's own balance (if it exists as an individual account)
-            # 2. The sum of all its children's balances
-            if account_name in parent_balances:
-                # This account has aggregated balances (either it's a parent or it has children)
-                currencies = parent_balances[account_name]
-                if args.exchange:
-                    # Create a mock inventory for the original balances
-                    class MockInventory:
-                        def __init__(self, currency_amounts):
-                            self.currency_amounts = currency_amounts
-
-                        def items(self):
-                            # Return list of (currency, MockPosition) tuples
-                            result = []
-                            for currency, amount in self.currency_amounts.items():
-                                result.append(
-                                    ((currency, None), MockPosition(amount, currency))
-                                )
-                            return result
-
-                        def is_empty(self):
-                            return not self.currency_amounts
-
-                    class MockPosition:
-                        def __init__(self, amount, currency):
-                            self.units = MockUnits(amount, currency)
-
-                    class MockUnits:
-                        def __init__(self, amount, currency):
-                            self.number = amount
-                            self.currency = currency
-
-                    # Create a mock converted inventory
-                    class MockConvertedInventory:
-                        def __init__(self, amount):
-                            self.amount = amount
-
-                        def get_currency_units(self, currency):
-                            class MockConvertedAmount:
-                                def __init__(self, number, currency):
-                                    self.number = number
-                                    self.currency = currency
-
-                            return MockConvertedAmount(self.amount, currency)
-
-                    row = (
-                        account_name,
-                        MockInventory(currencies),
-                        MockConvertedInventory(parent_converted[account_name]),
-                    )
-                else:
-                    # Create a mock inventory for the balances
-                    class MockInventory:
-                        def __init__(self, currency_amounts):
-                            self.currency_amounts = currency_amounts
-
-                        def items(self):
-                            # Return list of (currency, MockPosition) tuples
-                            result = []
-                            for currency, amount in self.currency_amounts.items():
-                                result.append(
-                                    ((currency, None), MockPosition(amount, currency))
-                                )
-                            return result
-
-                        def is_empty(self):
-                            return not self.currency_amounts
-
-                    class MockPosition:
-                        def __init__(self, amount, currency):
-                            self.units = MockUnits(amount, currency)
-
-                    class MockUnits:
-                        def __init__(self, amount, currency):
-                            self.number = amount
-                            self.currency = currency
-
-                    row = (account_name, MockInventory(currencies))
-                combined_output.append(row)
-            else:
-                # This is a leaf account with no children, use its original data
-                combined_output.append(individual_rows[account_name])
-
-        output = combined_output
-
-    # Handle depth collapsing (this should work for both regular and summarized output)
-    if hasattr(args, "depth") and args.depth:
-        # Group accounts by their parent at the specified depth level and sum balances
-        from collections import defaultdict
-        from decimal import Decimal
+    exchange = getattr(args, "exchange", None)
+    hierarchy = getattr(args, "hierarchy", False)
+    depth = getattr(args, "depth", None)
 
-        # Dictionary to store collapsed balances: {parent_account: {currency: amount}}
-        collapsed_balances = defaultdict(lambda: defaultdict(Decimal))
-        collapsed_converted = defaultdict(Decimal) if args.exchange else None
-
-        for row in list(output):  # Ensure output is a list of lists
-            if not row:
-                continue
-
-            account_name = row[0]
-
-            # Determine the parent account name for collapsing based on depth level
-            parts = account_name.split(":")
-            if len(parts) > args.depth:
-                # Collapse to the specified level
-                collapsed_account = ":".join(parts[: args.depth])
-            else:
-                collapsed_account = (
-                    account_name  # Keep as is if already at or below collapse level
-                )
-
-            # Handle currency conversion and balance summarization
-            if args.exchange:
-                # When exchange currency is specified, we have an additional column with converted values
-                balance_inventory = row[1]  # Original balance
-                converted_inventory = row[2]  # Converted balance
-
-                # Sum original balances by currency
-                if hasattr(
-                    balance_inventory, "items"
-                ):  # It's an inventory with multiple currencies
-                    for currency, amount in balance_inventory.items():
-                        # Extract currency string
-                        if isinstance(currency, tuple):
-                            currency_str = currency[0]
-                        else:
-                            currency_str = currency
-
-                        # Extract number (handle Decimal)
-                        number = amount.units.number
-
-                        # Add to collapsed balance
-                        collapsed_balances[collapsed_account][currency_str] += number
-
-                # Sum converted balances
-                converted_amount = converted_inventory.get_currency_units(args.exchange)
-                collapsed_converted[collapsed_account] += converted_amount.number
-            else:
-                # The balance is always the last element in the row tuple
-                balance_inventory = row[-1]
-
-                # Sum balances by currency
-                if hasattr(
-                    balance_inventory, "items"
-                ):  # It's an inventory with multiple currencies
-                    for currency, amount in balance_inventory.items():
-                        # Extract currency string
-                        if isinstance(currency, tuple):
-                            currency_str = currency[0]
-                        else:
-                            currency_str = currency
-
-                        # Extract number (handle Decimal)
-                        number = amount.units.number
-
-                        # Add to collapsed balance
-                        collapsed_balances[collapsed_account][currency_str] += number
-
-        # Convert the collapsed data back to the format expected by the rest of the function
-        output = []
-        for collapsed_account, currencies in collapsed_balances.items():
-            if args.exchange:
-                # Create a mock inventory for the original balances
-                class MockInventory:
-                    def __init__(self, currency_amounts):
-                        self.currency_amounts = currency_amounts
-
-                    def items(self):
-                        # Return list of (currency, MockPosition) tuples
-                        result = []
-                        for currency, amount in self.currency_amounts.items():
-                            result.append(
-                                ((currency, None), MockPosition(amount, currency))
-                            )
-                        return result
-
-                    def is_empty(self):
-                        return not self.currency_amounts
-
-                class MockPosition:
-                    def __init__(self, amount, currency):
-                        self.units = MockUnits(amount, currency)
-
-                class MockUnits:
-                    def __init__(self, amount, currency):
-                        self.number = amount
-                        self.currency = currency
-
-                # Create a mock converted inventory
-                class MockConvertedInventory:
-                    def __init__(self, amount):
-                        self.amount = amount
-
-                    def get_currency_units(self, currency):
-                        class MockConvertedAmount:
-                            def __init__(self, number, currency):
-                                self.number = number
-                                self.currency = currency
-
-                        return MockConvertedAmount(self.amount, currency)
-
-                row = (
-                    collapsed_account,
-                    MockInventory(currencies),
-                    MockConvertedInventory(collapsed_converted[collapsed_account]),
-                )
-            else:
-                # Create a mock inventory for the balances
-                class MockInventory:
-                    def __init__(self, currency_amounts):
-                        self.currency_amounts = currency_amounts
-
-                    def items(self):
-                        # Return list of (currency, MockPosition) tuples
-                        result = []
-                        for currency, amount in self.currency_amounts.items():
-                            result.append(
-                                ((currency, None), MockPosition(amount, currency))
-                            )
-                        return result
-
-                    def is_empty(self):
-                        return not self.currency_amounts
-
-                class MockPosition:
-                    def __init__(self, amount, currency):
-                        self.units = MockUnits(amount, currency)
-
-                class MockUnits:
-                    def __init__(self, amount, currency):
-                        self.number = amount
-                        self.currency = currency
-
-                row = (collapsed_account, MockInventory(currencies))
-            output.append(row)
-
-    # If using hierarchy, determine the minimum depth for total calculation
-    min_depth = None
-    if hasattr(args, "hierarchy") and args.hierarchy and args.total:
-        # Find the minimum depth among all accounts
-        depths = [row[0].count(":") + 1 for row in output if row]
-        if depths:
-            min_depth = min(depths)
-
-    for row in list(output):  # Ensure output is a list of lists
+    # Collect the balances in the account tree. Without the hierarchy, the
+    # rows are already collapsed to the depth level by the query.
+    tree = AccountTree()
+    for row in output:
         if not row:
             continue
-
         account_name = row[0]
-        account_depth = account_name.count(":") + 1  # Calculate depth based on colons
-
-        if args.depth and account_depth > args.depth:
-            continue
+        converted = None
+        if exchange:
+            converted = row[2].get_currency_units(exchange).number
+        tree.add(account_name, inventory_units(row[1]), converted)
+
+    if hierarchy:
+        # Show every account in the tree, with the balance of its subtree.
+        tree.aggregate()
+        balances = [
+            AccountBalance(
+                node.name,
+                node.depth,
+                node.total,
+                ConvertedAmount(node.total_converted, exchange) if exchange else None,
+            )
+            for node in sorted(tree.nodes.values(), key=lambda node: node.name)
+            if not depth or node.depth <= depth
+        ]
+    else:
+        balances = [
+            AccountBalance(
+                node.name,
+                node.depth,
+                node.balance,
+                ConvertedAmount(node.converted, exchange) if exchange else None,
+            )
+            for node in tree.accounts
+        ]
 
-        if args.zero and row[-1].is_empty():
+    for balance in balances:
+        if args.zero and balance.is_empty():
             continue
 
-        # Handle currency conversion
-        if args.exchange:
-            # When exchange currency is specified, we have an additional column with converted values
-            balance_inventory = row[1]  # Original balance
-            converted_inventory = row[2]  # Converted balance
-
-            # Format original balance
-            balance_parts = []
-            for currency, amount in balance_inventory.items():
-                # Check if the currency is a tuple and extract the string
-                if isinstance(currency, tuple):
-                    currency_str = currency[0]
-                else:
-                    currency_str = currency
-
-                # Correctly access the number from the Position object's `units`
-                formatted_value = "{:,.2f}".format(amount.units.number)
-
-                balance_parts.append(f"{formatted_value} {currency_str}")
-
-            formatted_balance = " ".join(balance_parts)
-
-            # Format converted balance
-            converted_amount = converted_inventory.get_currency_units(args.exchange)
-            formatted_converted = "{:,.2f} {}".format(
-                converted_amount.number, converted_amount.currency
+        formatted_balance = " ".join(
+            format_amount(number, currency)
+            for currency, number in balance.units.items()
+        )
+
+        # With the hierarchy, only the top-level accounts are included in the
+        # total, as they already contain their descendants.
+        if args.total and (not hierarchy or balance.depth == 1):
+            add_units(grand_total, balance.units)
+            if exchange:
+                converted_total += balance.converted.number
+
+        if exchange:
+            formatted_converted = format_amount(
+                balance.converted.number, balance.converted.currency
+            )
+            formatted_output.append(
+                (balance.account, formatted_balance, formatted_converted)
             )
-
-            # Accumulate for grand total
-            if args.total:
-                # When using hierarchy, only include accounts at the minimum depth to avoid double-counting
-                should_include_in_total = True
-                if (
-                    hasattr(args, "hierarchy")
-                    and args.hierarchy
-                    and min_depth is not None
-                ):
-                    should_include_in_total = account_depth == min_depth
-
-                if should_include_in_total:
-                    # Accumulate original currencies
-                    for currency, amount in balance_inventory.items():
-                        # Check if the currency is a tuple and extract the string
-                        if isinstance(currency, tuple):
-                            currency_str = currency[0]
-                        else:
-                            currency_str = currency
-
-                        if currency_str in grand_total:
-                            grand_total[currency_str] += amount.units.number
-                        else:
-                            grand_total[currency_str] = amount.units.number
-
-                    # Accumulate converted amount
-                    converted_total += converted_amount.number
-
-            new_row = list(row)
-            new_row[1] = formatted_balance
-            new_row[2] = formatted_converted
-            formatted_output.append(tuple(new_row))
         else:
-            # The balance is always the last element in the row tuple
-            balance_inventory = row[-1]
-
-            # An Inventory object can contain multiple currencies. We need to iterate
-            # through its items, which are (currency, Position) pairs.
-            balance_parts = []
-            for currency, amount in balance_inventory.items():
-                # Check if the currency is a tuple and extract the string
-                if isinstance(currency, tuple):
-                    currency_str = currency[0]
-                else:
-                    currency_str = currency
-
-                # Correctly access the number from the Position object's `units`
-                formatted_value = "{:,.2f}".format(amount.units.number)
-
-                balance_parts.append(f"{formatted_value} {currency_str}")
-
-                # Accumulate for grand total
-                if args.total:
-                    # When using hierarchy, only include accounts at the minimum depth to avoid double-counting
-                    should_include_in_total = True
-                    if (
-                        hasattr(args, "hierarchy")
-                        and args.hierarchy
-                        and min_depth is not None
-                    ):
-                        should_include_in_total = account_depth == min_depth
-
-                    if should_include_in_total:
-                        if currency_str in grand_total:
-                            grand_total[currency_str] += amount.units.number
-                        else:
-                            grand_total[currency_str] = amount.units.number
-
-            formatted_balance = " ".join(balance_parts)
-
-            new_row = list(row)
-            new_row[-1] = formatted_balance
-            formatted_output.append(tuple(new_row))
+            formatted_output.append((balance.account, formatted_balance))
 
     # Add grand total row if requested
     if args.total and (grand_total or args.exchange):
@@ -738,11 +348,10 @@ def format_output(output: list, args) -> list:
             # Format the grand total balances
             total_parts = []
             for currency, amount in grand_total.items():
-                formatted_value = "{:,.2f}".format(amount)
-                total_parts.append(f"{formatted_value} {currency}")
+                total_parts.append(format_amount(amount, currency))
 
             formatted_total = " ".join(total_parts)
-            formatted_converted_total = "{:,.2f} {}".format(
+            formatted_converted_total = format_amount(
                 converted_total, args.exchange
             )
 
@@ -765,8 +374,7 @@ def format_output(output: list, args) -> list:
             # Format the grand total balances
             total_parts = []
             for currency, amount in grand_total.items():
-                formatted_value = "{:,.2f}".format(amount)
-                total_parts.append(f"{formatted_value} {currency}")
+                total_parts.append(format_amount(amount, currency))
 
             formatted_total = " ".join(total_parts)
             # Add a separator row and the total row
@@ -774,3 +382,119 @@ def format_output(output: list, args) -> list:
             formatted_output.append(("Total", formatted_total))
 
     return formatted_output
+
+
+def period_bounds(args):
+    """
+    The outer (begin, end) dates of a period report, from --begin, --end
+    and --date-range, as begin <= date < end. Either can be None.
+    """
+    begins = []
+    ends = []
+    if args.begin:
+        begins.append(parse_date(args.begin))
+    if args.end:
+        ends.append(parse_date(args.end))
+    if args.date_range:
+        begin_date, end_date = parse_date_range(args.date_range)
+        if begin_date:
+            begins.append(begin_date)
+        if end_date:
+            ends.append(end_date)
+    begin = max(begins) if begins else None
+    end = min(ends) if ends else None
+    return (
+        begin and datetime.date.fromisoformat(begin),
+        end and datetime.date.fromisoformat(end),
+    )
+
+
+def parse_period_query(args):
+    """
+    Build the query of the balance changes of each account in each period,
+    grouped by the account and the columns of the period.
+    """
+    where_clauses = get_where_clauses(args)
+
+    account_column = "account"
+    if args.depth:
+        account_column = f"root(account, {int(args.depth)}) as account"
+    period_columns = PERIOD_COLUMNS[args.period]
+    targets = [account_column, *period_columns, "units(sum(position)) as Balance"]
+    if args.exchange:
+        targets.append(f"convert(sum(position), '{args.exchange}') as Converted")
+    query = "SELECT " + ", ".join(targets)
+
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+
+    groups = range(1, len(period_columns) + 2)
+    query += " GROUP BY " + ", ".join(str(group) for group in groups)
+    query += " ORDER BY account " + ("DESC" if args.sort.startswith("-") else "ASC")
+    return query
+
+
+def format_period_output(output: list, args, headers, alignments) -> list:
+    """
+    Pivot the rows of the period query into one row per account, with the
+    balance changes of each period in its own column. The period columns
+    are added to the headers and alignments. Periods without postings get
+    an empty cell, from the outer bounds of the report, or from the first
+    to the last period with postings.
+    """
+    period = args.period
+    exchange = args.exchange
+    key_size = len(PERIOD_COLUMNS[period])
+
+    # Account -> period start -> {currency: number}. The accounts are kept
+    # in the order of the query.
+    cells = {}
+    for row in output:
+        start = key_start(period, row[1 : 1 + key_size])
+        if exchange:
+            converted = row[2 + key_size].get_currency_units(exchange)
+            units = {exchange: converted.number}
+        else:
+            units = inventory_units(row[1 + key_size])
+        add_units(cells.setdefault(row[0], {}).setdefault(start, {}), units)
+
+    if not cells:
+        return []
+
+    begin, end = period_bounds(args)
+    starts = [start for periods in cells.values() for start in periods]
+    if begin is None:
+        begin = min(starts)
+    if end is None:
+        end = max(starts) + datetime.timedelta(days=1)
+    starts = period_starts(period, begin, end)
+
+    headers.extend(period_label(period, start) for start in starts)
+    alignments.extend("right" for _ in starts)
+
+    def format_cell(units):
+        return " ".join(
+            format_amount(number, currency) for currency, number in units.items()
+        )
+
+    formatted_output = []
+    totals = {start: {} for start in starts}
+    for account, periods in cells.items():
+        if args.zero and not any(
+            number for units in periods.values() for number in units.values()
+        ):
+            continue
+        row = [account]
+        for start in starts:
+            units = periods.get(start, {})
+            row.append(format_cell(units))
+            add_units(totals[start], units)
+        formatted_output.append(row)
+
+    if args.total and formatted_output:
+        formatted_output.append(["-------------------"] * (len(starts) + 1))
+        formatted_output.append(
+            ["Total", *(format_cell(totals[start]) for start in starts)]
+        )
+
+    return formatted_output
@@ -0,0 +1,166 @@
+"""
+Batch mode: run many reports against one loaded ledger.
+
+`ledger2bql batch FILE` reads one report per line, in the same syntax as the
+command line, i.e.
+
+    bal ^Assets -X EUR > assets.txt
+    reg Expenses -b 2025-01 --total
+    # Comments and empty lines are skipped.
+    query holidays -o csv > holidays.csv
+
+Every report runs through the same query and formatting code as the single
+commands, but the ledger is loaded only once, and the reports are written
+to their own files: the one after `>`, or `NN-command.txt` (`.csv`, ... with
+--output-format), in the --output-dir directory.
+
+All the lines are parsed before the first report runs, so that a typo does
+not leave a half-written set of reports. With --workers, the reports run on
+a thread pool; the queries on the shared ledger still run one at a time.
+"""
+
+import os
+import shlex
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import click
+from . import profiling
+from .logging_utils import get_logger
+from .utils import redirect_output
+
+logger = get_logger(__name__)
+
+# The commands which write a report.
+REPORT_COMMANDS = ("bal", "reg", "query", "lots", "assert", "price")
+
+
+class Report:
+    """One line of the batch file: the parsed command and its output file."""
+
+    __slots__ = ("line_number", "name", "context", "output")
+
+    def __init__(self, line_number, name, context, output):
+        self.line_number = line_number
+        self.name = name
+        self.context = context
+        self.output = output
+
+
+def split_line(line):
+    """
+    Split a line of the batch file into the command line arguments and the
+    output file, given after a `>`. Returns None for an empty line.
+    """
+    argv = shlex.split(line, comments=True)
+    if argv and argv[0] == "ledger2bql":
+        argv = argv[1:]
+    if not argv:
+        return None
+
+    output = None
+    if len(argv) >= 2 and argv[-2] == ">":
+        argv, output = argv[:-2], argv[-1]
+    return argv, output
+
+
+def parse_batch(group, lines):
+    """
+    Parse the lines of the batch file with the commands of the given group.
+    Returns the list of the reports. Raises a UsageError, with the line
+    number, for the first invalid line.
+    """
+    parent = click.Context(group, info_name="ledger2bql")
+    reports = []
+    for line_number, line in enumerate(lines, 1):
+        try:
+            split = split_line(line)
+            if split is None:
+                continue
+            argv, output = split
+
+            name, command, args = group.resolve_command(parent, argv)
+            if command.name not in REPORT_COMMANDS:
+                raise click.UsageError(f"'{name}' is not a report command.")
+            context = command.make_context(name, args, parent=parent)
+        except (ValueError, click.ClickException) as e:
+            message = e.format_message() if isinstance(e, click.ClickException) else str(e)
+            raise click.UsageError(f"Line {line_number}: {message}")
+
+        if output is None:
+            output_format = context.params.get("output_format")
+            extension = output_format.lower() if output_format else "txt"
+            output = f"{line_number:02d}-{command.name}.{extension}"
+        reports.append(Report(line_number, command.name, context, output))
+    return reports
+
+
+def run_report(report, output_dir):
+    """
+    Run a report and write it to its output file.
+    Returns the error message, or None when the report succeeded.
+    """
+    path = os.path.join(output_dir, report.output)
+    logger.debug("Running report of line {} into {}", report.line_number, path)
+    try:
+        with open(path, "w", encoding="utf-8", newline="") as stream:
+            with redirect_output(stream), report.context as context:
+                context.command.invoke(context)
+    except click.ClickException as e:
+        return e.format_message()
+    except Exception as e:
+        logger.exception("Report of line {} failed", report.line_number)
+        return str(e) or type(e).__name__
+    return None
+
+
+@click.command(name="batch", short_help="Run many reports against one loaded ledger")
+@click.argument("batch_file", type=click.File("r", encoding="utf-8"), default="-")
+@click.option(
+    "--output-dir",
+    "-d",
+    type=click.Path(file_okay=False),
+    default=".",
+    show_default=True,
+    help="Directory of the report files.",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Run this many reports at the same time, on a thread pool.",
+)
+@click.pass_context
+def batch_command(ctx, batch_file, output_dir, workers):
+    """
+    Run the reports listed in BATCH_FILE (or stdin), one command line per
+    line, and write each one to its own file.
+    """
+    reports = parse_batch(ctx.find_root().command, batch_file)
+    if not reports:
+        click.echo("No reports to run.", err=True)
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+    with profiling.stage("batch"):
+        if workers == 1:
+            errors = [run_report(report, output_dir) for report in reports]
+        else:
+            profiling.stop_memory_tracing(f"with --workers {workers}")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                errors = list(
+                    executor.map(lambda report: run_report(report, output_dir), reports)
+                )
+
+    failed = 0
+    for report, error in zip(reports, errors):
+        path = os.path.join(output_dir, report.output)
+        if error is None:
+            click.echo(f"{report.name:<8}{path}")
+        else:
+            failed += 1
+            click.echo(f"Line {report.line_number}: {error}", err=True)
+    if failed:
+        click.echo(f"{failed} of {len(reports)} reports failed.", err=True)
+        sys.exit(1)
@@ -0,0 +1,250 @@
+"""
+Persistent on-disk cache of the loaded Beancount ledger.
+
+Parsing and booking a large ledger takes seconds, while the input rarely
+changes between runs. The loaded (entries, errors, options_map) triple is
+pickled into the cache directory, together with a manifest of every file
+that took part in the load. The manifest records the path, mtime, size and
+content hash of each file, and the files matched by each include directive.
+The cached data is reused as long as all the files are unchanged and the
+include globs still match the same files. With LEDGER2BQL_INCREMENTAL=1,
+the unchanged files are not parsed again when some of them changed (see
+the incremental module).
+"""
+
+import glob
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+from .logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Bump this whenever the layout of the cache file changes.
+CACHE_FORMAT_VERSION = 2
+
+
+def get_cache_dir():
+    """
+    Get the directory where the cache files are stored.
+    LEDGER2BQL_CACHE_DIR overrides the default, which follows XDG conventions.
+    """
+    cache_dir = os.getenv("LEDGER2BQL_CACHE_DIR")
+    if not cache_dir:
+        base_dir = os.getenv("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        cache_dir = os.path.join(base_dir, "ledger2bql")
+    return cache_dir
+
+
+def is_cache_enabled():
+    """The cache can be switched off with the LEDGER2BQL_DISABLE_CACHE variable."""
+    return not os.getenv("LEDGER2BQL_DISABLE_CACHE")
+
+
+def get_cache_path(book):
+    """Get the path of the cache file for the given ledger file."""
+    book = os.path.abspath(book)
+    digest = hashlib.sha256(book.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(get_cache_dir(), f"{digest}.ledger.pickle")
+
+
+def hash_file(filename):
+    """Compute the content hash of a file."""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(filename):
+    """
+    Return the (mtime_ns, size, content hash) signature of a file,
+    or None if the file does not exist.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, hash_file(filename))
+
+
+# An include directive, at the start of a line.
+_INCLUDE_RE = re.compile(rb'^include[ \t]+"([^"\n]*)"', re.MULTILINE)
+
+
+def include_patterns(filename):
+    """Get the include patterns of a ledger file, as written."""
+    with open(filename, "rb") as file:
+        content = file.read()
+    return [match.group(1).decode("utf-8") for match in _INCLUDE_RE.finditer(content)]
+
+
+def expand_include(base_dir, pattern):
+    """Get the files matched by an include pattern, like beancount's loader."""
+    matches = glob.glob(os.path.join(base_dir, pattern), recursive=True)
+    return sorted(os.path.normpath(match) for match in matches)
+
+
+def build_includes(filenames):
+    """
+    Get the (base directory, pattern, matched files) of the include directives
+    of the given files.
+    """
+    includes = []
+    for filename in filenames:
+        try:
+            patterns = include_patterns(filename)
+        except OSError:
+            continue
+        base_dir = os.path.dirname(filename)
+        includes.extend(
+            (base_dir, pattern, expand_include(base_dir, pattern)) for pattern in patterns
+        )
+    return includes
+
+
+def are_includes_current(includes):
+    """Check that the include globs still match the same files."""
+    return all(
+        expand_include(base_dir, pattern) == matches
+        for base_dir, pattern, matches in includes
+    )
+
+
+def build_manifest(filenames):
+    """
+    Build the manifest of the files that took part in loading the ledger,
+    and of the include directives, so that a new file matching a glob is
+    noticed too.
+    """
+    return {
+        "files": {filename: file_signature(filename) for filename in filenames},
+        "includes": build_includes(filenames),
+    }
+
+
+def is_file_current(filename, signature):
+    """
+    Check that the file has not changed since its signature was taken.
+    Only files with a different mtime or size get their contents hashed, so
+    a file that was touched but not modified does not invalidate the cache.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return False
+    if signature is None:
+        return False
+
+    mtime_ns, size, content_hash = signature
+    if stat.st_size != size:
+        return False
+    if stat.st_mtime_ns == mtime_ns:
+        return True
+    return hash_file(filename) == content_hash
+
+
+def is_manifest_current(manifest):
+    """Check that none of the files in the manifest has changed."""
+    return all(
+        is_file_current(filename, signature)
+        for filename, signature in manifest["files"].items()
+    ) and are_includes_current(manifest["includes"])
+
+
+def read_cache(book):
+    """
+    Read the cached ledger for the given file.
+    Returns the (entries, errors, options_map) triple, or None on a cache miss.
+    """
+    cache_path = get_cache_path(book)
+    if not os.path.exists(cache_path):
+        logger.debug("No ledger cache at {}", cache_path)
+        return None
+
+    try:
+        with open(cache_path, "rb") as file:
+            # The header is stored separately so that the validity check does
+            # not need to unpickle the whole ledger.
+            header = pickle.load(file)
+            if header.get("version") != CACHE_FORMAT_VERSION:
+                logger.debug("Ledger cache format is outdated")
+                return None
+            if header.get("book") != os.path.abspath(book):
+                return None
+            if not is_manifest_current(header["manifest"]):
+                logger.debug("Ledger cache is stale")
+                return None
+
+            entries, errors, options_map = pickle.load(file)
+    except Exception as e:
+        # A corrupted or incompatible cache is simply ignored and rebuilt.
+        logger.warning("Could not read ledger cache {}: {}", cache_path, e)
+        return None
+
+    logger.debug("Loaded ledger from cache {}", cache_path)
+    return entries, errors, options_map
+
+
+def write_cache(book, entries, errors, options_map):
+    """Store the loaded ledger in the cache."""
+    cache_path = get_cache_path(book)
+    header = {
+        "version": CACHE_FORMAT_VERSION,
+        "book": os.path.abspath(book),
+        "manifest": build_manifest(options_map["include"]),
+    }
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # Write to a temporary file first so that a concurrent reader never
+        # sees a partially written cache.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path))
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(
+                    (entries, errors, options_map),
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        logger.warning("Could not write ledger cache {}: {}", cache_path, e)
+        return
+
+    logger.debug("Stored ledger in cache {}", cache_path)
+
+
+def load_ledger(book):
+    """
+    Load the Beancount ledger, using the on-disk cache when it is current.
+    Returns the (entries, errors, options_map) triple.
+    """
+    if is_cache_enabled():
+        cached = read_cache(book)
+        if cached is not None:
+            return cached
+
+    from .incremental import get_jobs, is_parse_cache_enabled, load_ledger_incremental
+
+    if is_parse_cache_enabled() or get_jobs() > 1:
+        # Only the files that changed are parsed again, possibly in parallel.
+        entries, errors, options_map = load_ledger_incremental(book)
+    else:
+        import beancount.loader
+
+        entries, errors, options_map = beancount.loader.load_file(book)
+
+    if is_cache_enabled():
+        write_cache(book, entries, errors, options_map)
+
+    return entries, errors, options_map
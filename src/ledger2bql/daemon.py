@@ -0,0 +1,465 @@
+"""
+Long-lived query daemon and its thin client.
+
+`ledger2bql serve` keeps the loaded ledger and the beanquery connection in
+memory and answers requests over a Unix domain socket. The ledger files are
+watched for changes, and the ledger is reloaded as soon as one of them changes.
+
+The commands use a running daemon transparently: run_bql_query() first asks
+the daemon and only loads the ledger itself when there is no daemon.
+
+Messages are length-prefixed JSON documents; the Beancount values in the
+result rows are tagged with their type, so the client gets them back as they
+were. The socket lives in a directory that only the current user can access,
+and both ends check that the peer runs as the same user.
+"""
+
+import datetime
+import functools
+import hashlib
+import json
+import os
+import socket
+import stat
+import struct
+import tempfile
+import threading
+from decimal import Decimal
+
+import click
+
+from .logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+_HEADER = struct.Struct("!Q")
+
+# How often the daemon checks the ledger files for changes, in seconds.
+WATCH_INTERVAL = 1.0
+
+
+def is_supported():
+    """Unix domain sockets are not available on all platforms."""
+    return hasattr(socket, "AF_UNIX")
+
+
+def is_daemon_enabled():
+    """The client side can be switched off with LEDGER2BQL_NO_DAEMON."""
+    return is_supported() and not os.getenv("LEDGER2BQL_NO_DAEMON")
+
+
+def get_socket_dir():
+    """Get the private directory for the daemon sockets."""
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"ledger2bql-{os.getuid()}")
+
+
+def get_socket_path(book):
+    """
+    Get the socket path of the daemon serving the given ledger file.
+    LEDGER2BQL_SOCKET overrides the default location.
+    """
+    socket_path = os.getenv("LEDGER2BQL_SOCKET")
+    if socket_path:
+        return socket_path
+    digest = hashlib.sha256(os.path.abspath(book).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(get_socket_dir(), f"{digest}.sock")
+
+
+def check_socket_dir(socket_dir):
+    """
+    Refuse a socket directory which other users could have created or can
+    write to, e.g. one planted in the shared temp directory.
+    """
+    info = os.lstat(socket_dir)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"The socket directory {socket_dir} is not a directory")
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"The socket directory {socket_dir} is owned by another user")
+    if info.st_mode & 0o077:
+        raise PermissionError(
+            f"The socket directory {socket_dir} is accessible by other users"
+        )
+
+
+def get_peer_uid(sock):
+    """The user id of the process at the other end, or None where unsupported."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    credentials = struct.Struct("3i")
+    _, uid, _ = credentials.unpack(
+        sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, credentials.size)
+    )
+    return uid
+
+
+def check_peer(sock):
+    """Refuse to talk to a process of another user."""
+    uid = get_peer_uid(sock)
+    if uid is not None and uid != os.getuid():
+        raise PermissionError(f"The peer runs as another user ({uid})")
+
+
+@functools.cache
+def get_datatypes():
+    """The column datatypes which are sent to the client, by name."""
+    from beancount.core.amount import Amount
+    from beancount.core.inventory import Inventory
+    from beancount.core.position import Cost, Position
+
+    return {
+        datatype.__name__: datatype
+        for datatype in (
+            bool, int, float, str, Decimal, datetime.date, datetime.datetime,
+            set, dict, Amount, Cost, Position, Inventory,
+        )
+    }
+
+
+def encode_datatype(datatype):
+    datatypes = get_datatypes()
+    return datatype.__name__ if datatypes.get(datatype.__name__) is datatype else "object"
+
+
+def _number(number):
+    return None if number is None else str(number)
+
+
+def _encode_amount(amount):
+    return {"$": "Amount", "v": [_number(amount.number), amount.currency]}
+
+
+def _encode_cost(cost):
+    date = cost.date and cost.date.isoformat()
+    return {"$": "Cost", "v": [_number(cost.number), cost.currency, date, cost.label]}
+
+
+def _encode_position(position):
+    units, cost = position
+    return {
+        "$": "Position",
+        "v": [_number(units.number), units.currency, cost and _encode_cost(cost)],
+    }
+
+
+def _encode_inventory(inventory):
+    return {"$": "Inventory", "v": [_encode_position(position) for position in inventory]}
+
+
+def _encode_items(items):
+    return [encode_value(item) for item in items]
+
+
+@functools.cache
+def get_encoders():
+    """
+    The encoders by the exact type of the value; this is the hot path for the
+    rows of large results.
+    """
+    from beancount.core.amount import Amount
+    from beancount.core.inventory import Inventory
+    from beancount.core.position import Cost, Position
+
+    return {
+        type(None): lambda value: value,
+        str: lambda value: value,
+        bool: lambda value: value,
+        int: lambda value: value,
+        float: lambda value: value,
+        Decimal: lambda value: {"$": "Decimal", "v": str(value)},
+        datetime.date: lambda value: {"$": "date", "v": value.isoformat()},
+        datetime.datetime: lambda value: {"$": "datetime", "v": value.isoformat()},
+        Amount: _encode_amount,
+        Cost: _encode_cost,
+        Position: _encode_position,
+        Inventory: _encode_inventory,
+        set: lambda value: {"$": "set", "v": _encode_items(value)},
+        frozenset: lambda value: {"$": "set", "v": _encode_items(value)},
+        list: _encode_items,
+        tuple: _encode_items,
+        dict: lambda value: {
+            "$": "dict",
+            "v": {str(key): encode_value(item) for key, item in value.items()},
+        },
+    }
+
+
+def encode_value(value):
+    """Convert a query result value into JSON, tagging the non-JSON types."""
+    encoders = get_encoders()
+    encoder = encoders.get(type(value))
+    if encoder is not None:
+        return encoder(value)
+    if isinstance(value, type):
+        return {"$": "type", "v": encode_datatype(value)}
+    for datatype, encoder in encoders.items():
+        # Subclasses, e.g. the result rows of beanquery.
+        if isinstance(value, datatype):
+            return encoder(value)
+    raise TypeError(f"Cannot send a value of type {type(value).__name__}")
+
+
+def _decimal(number):
+    return None if number is None else Decimal(number)
+
+
+@functools.cache
+def get_decoders():
+    """Rebuild the tagged values. Tagged values nested in them are already decoded."""
+    from beancount.core.amount import Amount
+    from beancount.core.inventory import Inventory
+    from beancount.core.position import Cost, Position
+
+    datatypes = get_datatypes()
+    return {
+        "Decimal": Decimal,
+        "datetime": datetime.datetime.fromisoformat,
+        "date": datetime.date.fromisoformat,
+        "Inventory": Inventory,
+        "Position": lambda value: Position(Amount(_decimal(value[0]), value[1]), value[2]),
+        "Amount": lambda value: Amount(_decimal(value[0]), value[1]),
+        "Cost": lambda value: Cost(
+            _decimal(value[0]),
+            value[1],
+            value[2] and datetime.date.fromisoformat(value[2]),
+            value[3],
+        ),
+        "set": set,
+        "dict": dict,
+        "type": lambda value: datatypes.get(value, object),
+    }
+
+
+def decode_value(value):
+    """Rebuild a tagged value; called for each JSON object, innermost first."""
+    tag = value.get("$")
+    if tag is None:
+        return value
+    decoder = get_decoders().get(tag)
+    if decoder is None:
+        raise ValueError(f"Unknown value type in message: {tag}")
+    return decoder(value["v"])
+
+
+def send_message(sock, message):
+    """Send a length-prefixed JSON message."""
+    payload = json.dumps(encode_value(message), separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _receive_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed by peer")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def receive_message(sock):
+    """Receive a length-prefixed JSON message."""
+    (size,) = _HEADER.unpack(_receive_exactly(sock, _HEADER.size))
+    return json.loads(_receive_exactly(sock, size), object_hook=decode_value)
+
+
+def is_daemon_running(book):
+    """Check whether a daemon may be serving the given ledger, without connecting."""
+    return is_daemon_enabled() and os.path.exists(get_socket_path(book))
+
+
+def request(book, message):
+    """
+    Send a request to the daemon serving the given ledger.
+    Returns the response, or None if no daemon is running.
+    """
+    if not is_daemon_running(book):
+        return None
+
+    socket_path = get_socket_path(book)
+    try:
+        check_socket_dir(os.path.dirname(os.path.abspath(socket_path)))
+    except OSError as e:
+        logger.warning("Not using the query daemon: {}", e)
+        return None
+
+    message = dict(message, book=os.path.abspath(book))
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1.0)
+            sock.connect(socket_path)
+            check_peer(sock)
+            # Queries on a large ledger may take a while.
+            sock.settimeout(None)
+            send_message(sock, message)
+            response = receive_message(sock)
+    except PermissionError as e:
+        logger.warning("Not using the query daemon: {}", e)
+        return None
+    except (OSError, ValueError) as e:
+        # A stale socket of a daemon that is no longer running.
+        logger.debug("Query daemon not available at {}: {}", socket_path, e)
+        return None
+
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return response
+
+
+def execute_query(query, book):
+    """
+    Run the query on the daemon. Returns the (columns, rows) tuple, or None
+    without a daemon.
+    """
+    response = request(book, {"op": "execute", "query": query})
+    if response is None:
+        return None
+    logger.debug("Query executed by the daemon at {}", lambda: get_socket_path(book))
+    columns = [tuple(column) for column in response["columns"]]
+    return columns, [tuple(row) for row in response["rows"]]
+
+
+def get_named_queries(book):
+    """
+    Get the named queries as a list of (name, query_string) tuples from the
+    daemon, or None without a daemon.
+    """
+    response = request(book, {"op": "queries"})
+    if response is None:
+        return None
+    return [tuple(entry) for entry in response["queries"]]
+
+
+class QueryServer:
+    """Serves the queries for one ledger file over a Unix domain socket."""
+
+    def __init__(self, book, socket_path):
+        self.book = os.path.abspath(book)
+        self.socket_path = socket_path
+        self._stop = threading.Event()
+        self.ready = threading.Event()
+
+    def handle(self, message):
+        """Process one request and return the response."""
+        from .ledger import get_ledger
+
+        if message.get("book") != self.book:
+            return {"error": f"The daemon serves {self.book}, not {message.get('book')}"}
+
+        op = message.get("op")
+        if op == "ping":
+            return {"ok": True}
+
+        # get_ledger() reloads the ledger when one of its files has changed.
+        ledger = get_ledger(self.book)
+        if op == "execute":
+            columns, rows = ledger.execute(message["query"])
+            return {"columns": columns, "rows": rows}
+        if op == "queries":
+            return {
+                "queries": [
+                    (entry.name, entry.query_string)
+                    for entry in ledger.get_query_entries()
+                ]
+            }
+        return {"error": f"Unknown request: {op}"}
+
+    def _serve_connection(self, connection):
+        with connection:
+            try:
+                check_peer(connection)
+                message = receive_message(connection)
+            except (OSError, ValueError) as e:
+                logger.warning("Invalid request: {}", e)
+                return
+            try:
+                response = self.handle(message)
+            except Exception as e:
+                response = {"error": f"{type(e).__name__}: {e}"}
+            try:
+                try:
+                    send_message(connection, response)
+                except TypeError as e:
+                    send_message(connection, {"error": str(e)})
+            except OSError as e:
+                logger.warning("Could not send the response: {}", e)
+
+    def _watch(self):
+        """Reload the ledger in the background whenever one of its files changes."""
+        from .ledger import get_ledger
+
+        while not self._stop.wait(WATCH_INTERVAL):
+            try:
+                get_ledger(self.book)
+            except Exception as e:
+                logger.error("Could not reload the ledger: {}", e)
+
+    def shutdown(self):
+        """Stop serving. The accept loop is woken up by a dummy connection."""
+        self._stop.set()
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(self.socket_path)
+        except OSError:
+            pass
+
+    def serve_forever(self):
+        """Load the ledger and serve requests until interrupted."""
+        from .ledger import get_ledger
+
+        get_ledger(self.book)
+
+        socket_dir = os.path.dirname(self.socket_path)
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        check_socket_dir(socket_dir)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        watcher = threading.Thread(target=self._watch, daemon=True)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            server.listen()
+            watcher.start()
+            self.ready.set()
+            try:
+                while not self._stop.is_set():
+                    connection, _ = server.accept()
+                    if self._stop.is_set():
+                        connection.close()
+                        break
+                    threading.Thread(
+                        target=self._serve_connection, args=(connection,), daemon=True
+                    ).start()
+            finally:
+                self._stop.set()
+                if os.path.exists(self.socket_path):
+                    os.unlink(self.socket_path)
+
+
+@click.command(name="serve", short_help="Run a query daemon for the ledger")
+@click.option("--socket", "socket_path", help="Path of the Unix domain socket.")
+def serve_command(socket_path):
+    """
+    Keep the ledger loaded and answer queries over a Unix domain socket.
+
+    While the daemon is running, the other commands send their queries to it
+    instead of loading the ledger themselves. The ledger is reloaded when
+    any of its files changes. Stop the daemon with Ctrl+C.
+    """
+    from .utils import get_beancount_file_path
+
+    if not is_supported():
+        raise click.ClickException("The query daemon requires Unix domain sockets.")
+
+    book = get_beancount_file_path()
+    socket_path = socket_path or get_socket_path(book)
+
+    click.echo(f"Serving {os.path.abspath(book)} on {socket_path}", err=True)
+    try:
+        QueryServer(book, socket_path).serve_forever()
+    except PermissionError as e:
+        raise click.ClickException(str(e))
+    except KeyboardInterrupt:
+        click.echo("Query daemon stopped.", err=True)
@@ -0,0 +1,149 @@
+"""
+Date index over the loaded entries, to prune the queries with date bounds.
+
+The --begin, --end and --date-range options become `date >= date(...)` and
+`date < date(...)` conditions, which beanquery evaluates for every posting
+of the ledger. The entries are sorted by date, so the entries within the
+bounds are found by bisection instead, and only those are scanned.
+"""
+
+import datetime
+from bisect import bisect_left
+
+
+class DateIndex:
+    """The dates of the date-sorted entries, for bisection."""
+
+    __slots__ = ("entries", "dates")
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.dates = [entry.date for entry in entries]
+
+    def range(self, begin=None, end=None):
+        """
+        The (lo, hi) positions of the entries with begin <= date < end.
+        Either bound can be None.
+        """
+        lo = 0 if begin is None else bisect_left(self.dates, begin)
+        hi = len(self.dates) if end is None else bisect_left(self.dates, end)
+        return lo, max(lo, hi)
+
+    def slice(self, begin=None, end=None):
+        """
+        The entries with begin <= date < end. Either bound can be None.
+        Returns a list, or the whole entries when there are no bounds.
+        """
+        if begin is None and end is None:
+            return self.entries
+        lo, hi = self.range(begin, end)
+        return self.entries[lo:hi]
+
+
+def date_value(node):
+    """The date of a constant date expression, i.e. `date("2025-08-01")`, or None."""
+    from beanquery.parser import ast
+
+    if isinstance(node, ast.Function) and node.fname == "date":
+        if len(node.operands) != 1:
+            return None
+        node = node.operands[0]
+    if not isinstance(node, ast.Constant):
+        return None
+    value = node.value
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def conjuncts(node):
+    """The conditions of a WHERE clause that must all hold."""
+    from beanquery.parser import ast
+
+    if isinstance(node, ast.And):
+        for arg in node.args:
+            yield from conjuncts(arg)
+    elif node is not None:
+        yield node
+
+
+def can_prune(statement):
+    """
+    Check that the query runs on the default postings table only, so that
+    feeding it fewer postings than the whole ledger is safe.
+    """
+    from beanquery.parser import ast
+
+    # The OPEN, CLOSE and CLEAR clauses, other tables and subqueries need
+    # all the entries.
+    if not isinstance(statement, ast.Select) or statement.from_clause is not None:
+        return False
+    return not any(
+        isinstance(node, ast.Select) and node is not statement
+        for node in statement.walk()
+    )
+
+
+def query_date_bounds(statement):
+    """
+    Find the date bounds of a parsed query, from the `date` comparisons
+    which the WHERE clause requires.
+    Returns the (begin, end) dates, as begin <= date < end, either of which
+    can be None, or None when the query cannot be restricted to a date range.
+    """
+    from beanquery.parser import ast
+
+    if not can_prune(statement):
+        return None
+
+    one_day = datetime.timedelta(days=1)
+    begin = end = None
+    for condition in conjuncts(statement.where_clause):
+        if not isinstance(
+            condition,
+            (ast.Equal, ast.Greater, ast.GreaterEq, ast.Less, ast.LessEq),
+        ):
+            continue
+        left, right = condition.left, condition.right
+        op = type(condition)
+        if isinstance(right, ast.Column) and right.name == "date":
+            # date("2025-01-01") <= date
+            left, right = right, left
+            op = {
+                ast.Greater: ast.Less,
+                ast.GreaterEq: ast.LessEq,
+                ast.Less: ast.Greater,
+                ast.LessEq: ast.GreaterEq,
+            }.get(op, op)
+        if not (isinstance(left, ast.Column) and left.name == "date"):
+            continue
+        value = date_value(right)
+        if value is None:
+            continue
+
+        if op in (ast.GreaterEq, ast.Equal):
+            low = value
+        elif op is ast.Greater:
+            low = value + one_day
+        else:
+            low = None
+        if op in (ast.LessEq, ast.Equal):
+            high = value + one_day
+        elif op is ast.Less:
+            high = value
+        else:
+            high = None
+
+        if low is not None and (begin is None or low > begin):
+            begin = low
+        if high is not None and (end is None or high < end):
+            end = high
+
+    if begin is None and end is None:
+        return None
+    return begin, end
@@ -0,0 +1,280 @@
+"""
+Machine-readable output of the query results, for bulk export.
+
+The rows are written as they come from the query, in batches, bypassing the
+table formatting. Decimal numbers are written exactly, without rounding.
+
+Supported formats:
+- csv: one header line and one line per row.
+- jsonl: one JSON object per row.
+- arrow: an Arrow IPC stream. Requires pyarrow.
+- parquet: a Parquet file. Requires pyarrow.
+
+The Arrow schema is written before the rows, so the scale of each decimal
+column is derived from the first batch of rows, with the widest precision
+of the decimal type. A later number that does not fit the column stops the
+export with an error, instead of being rounded.
+"""
+
+import csv
+import datetime
+import decimal
+import json
+import sys
+from decimal import Decimal
+from itertools import chain, islice
+
+import click
+
+OUTPUT_FORMATS = ("csv", "jsonl", "arrow", "parquet")
+
+# Number of rows written at once.
+BATCH_SIZE = 10000
+
+# The largest precision of the Arrow decimal128 and decimal256 types.
+DECIMAL128_PRECISION = 38
+DECIMAL256_PRECISION = 76
+
+
+def iter_batches(rows, size=BATCH_SIZE):
+    """Split the rows into lists of up to `size` rows."""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def to_text(value):
+    """Convert a query result value into plain text."""
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if hasattr(value, "get_positions"):
+        # Inventory
+        return value.to_string(parens=False)
+    if hasattr(value, "units"):
+        # Position
+        return value.to_string()
+    if isinstance(value, set):
+        return ",".join(sorted(str(item) for item in value))
+    return str(value)
+
+
+def to_json(value):
+    """Convert a query result value into a JSON-compatible value."""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, Decimal):
+        # Keep the exact value.
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if hasattr(value, "get_positions"):
+        # Inventory
+        return [to_json(position) for position in value.get_positions()]
+    if hasattr(value, "units"):
+        # Position
+        return {"units": to_json(value.units), "cost": to_json(value.cost)}
+    if hasattr(value, "number") and hasattr(value, "currency"):
+        # Amount or Cost
+        result = {"number": to_json(value.number), "currency": value.currency}
+        if hasattr(value, "date"):
+            result["date"] = to_json(value.date)
+            result["label"] = value.label
+        return result
+    if isinstance(value, (set, frozenset, list, tuple)):
+        return [to_json(item) for item in sorted(value, key=str)]
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    return str(value)
+
+
+def write_csv(columns, rows, stream):
+    """Write the rows as CSV."""
+    writer = csv.writer(stream, lineterminator="\n")
+    writer.writerow([name for name, _ in columns])
+    for batch in iter_batches(rows):
+        writer.writerows([to_text(value) for value in row] for row in batch)
+
+
+def write_jsonl(columns, rows, stream):
+    """Write the rows as JSON Lines."""
+    names = [name for name, _ in columns]
+    encoder = json.JSONEncoder(ensure_ascii=False)
+    for batch in iter_batches(rows):
+        stream.write(
+            "".join(
+                encoder.encode(dict(zip(names, map(to_json, row)))) + "\n"
+                for row in batch
+            )
+        )
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise click.ClickException(
+            "The arrow and parquet output formats require pyarrow. "
+            "Install it with: pip install ledger2bql[arrow]"
+        )
+    return pyarrow
+
+
+def decimal_digits(value):
+    """The number of (integer digits, decimal places) of a Decimal, as written."""
+    _, digits, exponent = value.as_tuple()
+    if not isinstance(exponent, int):
+        raise click.ClickException(f"{value} cannot be written as an Arrow decimal.")
+    return max(len(digits) + exponent, 0), max(-exponent, 0)
+
+
+def decimal_precision(name, values):
+    """
+    The (precision, scale) of a decimal column: the largest scale of the
+    values, with the precision of decimal128, or decimal256 when the values
+    need more digits.
+    """
+    integer_digits, scale = 0, 0
+    for value in values:
+        if value is not None:
+            value_digits, value_scale = decimal_digits(value)
+            integer_digits = max(integer_digits, value_digits)
+            scale = max(scale, value_scale)
+    if integer_digits + scale <= DECIMAL128_PRECISION:
+        return DECIMAL128_PRECISION, scale
+    if integer_digits + scale <= DECIMAL256_PRECISION:
+        return DECIMAL256_PRECISION, scale
+    raise click.ClickException(
+        f"The numbers of column '{name}' need {integer_digits + scale} digits, "
+        f"more than the {DECIMAL256_PRECISION} of an Arrow decimal. "
+        "Use the csv or jsonl output format."
+    )
+
+
+def fit_decimals(name, values, precision, scale):
+    """
+    Rescale the numbers of a decimal column to its scale. Raises a
+    ClickException for a number which does not fit, rather than rounding it.
+    """
+    exponent = Decimal(1).scaleb(-scale)
+    # Too many digits is an invalid operation, and rounding is inexact.
+    context = decimal.Context(
+        prec=precision, traps=[decimal.Inexact, decimal.InvalidOperation]
+    )
+    fitted = []
+    for value in values:
+        if value is not None:
+            # Refuses NaN and infinity.
+            decimal_digits(value)
+            try:
+                value = value.quantize(exponent, context=context)
+            except (decimal.Inexact, decimal.InvalidOperation):
+                raise click.ClickException(
+                    f"The number {value} of column '{name}' does not fit its "
+                    f"decimal({precision}, {scale}) type, derived from the first "
+                    f"{BATCH_SIZE} rows. Use the csv or jsonl output format."
+                )
+        fitted.append(value)
+    return fitted
+
+
+def arrow_schema(pa, columns, rows=()):
+    """
+    Map the query result columns to an Arrow schema. The precision and scale
+    of the decimal columns are derived from the given rows.
+    """
+    fields = []
+    for i, (name, datatype) in enumerate(columns):
+        if datatype is bool:
+            arrow_type = pa.bool_()
+        elif datatype is int:
+            arrow_type = pa.int64()
+        elif datatype is float:
+            arrow_type = pa.float64()
+        elif datatype is Decimal:
+            precision, scale = decimal_precision(name, (row[i] for row in rows))
+            if precision <= DECIMAL128_PRECISION:
+                arrow_type = pa.decimal128(precision, scale)
+            else:
+                arrow_type = pa.decimal256(precision, scale)
+        elif datatype is datetime.date:
+            arrow_type = pa.date32()
+        else:
+            # Strings and the structured Beancount types, as text.
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _arrow_batches(pa, schema, batches):
+    text_columns = [
+        i for i, field in enumerate(schema) if pa.types.is_string(field.type)
+    ]
+    decimal_columns = [
+        i for i, field in enumerate(schema) if pa.types.is_decimal(field.type)
+    ]
+    for batch in batches:
+        arrays = [list(values) for values in zip(*batch)]
+        for i in text_columns:
+            arrays[i] = [None if value is None else to_text(value) for value in arrays[i]]
+        for i in decimal_columns:
+            field = schema.field(i)
+            arrays[i] = fit_decimals(
+                field.name, arrays[i], field.type.precision, field.type.scale
+            )
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(arrays, schema)],
+            schema=schema,
+        )
+
+
+def _first_batch(rows):
+    """Read the first batch, to derive the schema. Returns it with all the batches."""
+    batches = iter_batches(rows)
+    first = next(batches, [])
+    return first, chain([first] if first else [], batches)
+
+
+def write_arrow(columns, rows, stream):
+    """Write the rows as an Arrow IPC stream."""
+    pa = _import_pyarrow()
+    first, batches = _first_batch(rows)
+    schema = arrow_schema(pa, columns, first)
+    with pa.ipc.new_stream(stream, schema) as writer:
+        for batch in _arrow_batches(pa, schema, batches):
+            writer.write_batch(batch)
+
+
+def write_parquet(columns, rows, stream):
+    """Write the rows as a Parquet file."""
+    pa = _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    first, batches = _first_batch(rows)
+    schema = arrow_schema(pa, columns, first)
+    with pq.ParquetWriter(stream, schema) as writer:
+        for batch in _arrow_batches(pa, schema, batches):
+            writer.write_batch(batch)
+
+
+def export_rows(columns, rows, output_format, stream=None):
+    """
+    Write the query results in the given format.
+    columns: list of (name, datatype) tuples, as returned with the query results.
+    stream: the output stream; standard output by default.
+    """
+    if output_format in ("csv", "jsonl"):
+        stream = stream or sys.stdout
+        writer = write_csv if output_format == "csv" else write_jsonl
+    elif output_format in ("arrow", "parquet"):
+        stream = stream or sys.stdout.buffer
+        writer = write_arrow if output_format == "arrow" else write_parquet
+    else:
+        raise click.UsageError(f"Unknown output format: {output_format}")
+
+    writer(columns, rows, stream)
+    stream.flush()
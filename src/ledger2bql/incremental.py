@@ -0,0 +1,290 @@
+"""
+Incremental loading of a ledger split into several included files.
+
+A ledger is usually append-only: new transactions land in the newest file,
+while the files of the previous years never change. When the ledger cache
+is stale, only the files that changed are parsed again. The parse result of
+every file is cached on its own, next to the ledger cache, and validated
+with the same (mtime, size, content hash) signature.
+
+Booking, the plugins and the validations still run over the whole ledger.
+The booking of a new transaction depends on the inventories built by all
+the previous ones, the entries of the files interleave once sorted by date,
+and a plugin can rewrite any entry, so the booked state of a file on its
+own cannot be reused.
+
+The parse cache reimplements the include handling of beancount.loader, so
+it is opt-in, with LEDGER2BQL_INCREMENTAL=1. By default, a stale ledger
+cache is reloaded with beancount.loader.load_file().
+
+With --jobs N, or LEDGER2BQL_JOBS, the files that must be parsed are parsed
+in N worker processes. The includes are discovered level by level: the root
+file first, then all the files it includes at once, and so on.
+"""
+
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+from . import profiling
+from .cache import (
+    file_signature,
+    get_cache_dir,
+    is_cache_enabled,
+    is_file_current,
+)
+from .logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Bump this whenever the layout of the parse cache files changes.
+PARSE_CACHE_FORMAT_VERSION = 1
+
+
+# The number of parser processes, set with --jobs. None defers to LEDGER2BQL_JOBS.
+_jobs = None
+
+
+def set_jobs(jobs):
+    """Set the number of processes parsing the ledger files."""
+    global _jobs
+    _jobs = jobs
+
+
+def get_jobs():
+    """The number of processes parsing the ledger files, 1 by default."""
+    if _jobs is not None:
+        return max(_jobs, 1)
+    try:
+        return max(int(os.getenv("LEDGER2BQL_JOBS") or 1), 1)
+    except ValueError:
+        logger.warning("Invalid LEDGER2BQL_JOBS value: {}", os.getenv("LEDGER2BQL_JOBS"))
+        return 1
+
+
+def is_incremental_enabled():
+    """The incremental load is switched on with the LEDGER2BQL_INCREMENTAL variable."""
+    return bool(os.getenv("LEDGER2BQL_INCREMENTAL"))
+
+
+def is_parse_cache_enabled():
+    return is_cache_enabled() and is_incremental_enabled()
+
+
+def get_parse_cache_path(filename):
+    """Get the path of the parse cache file for the given ledger file."""
+    digest = hashlib.sha256(filename.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(get_cache_dir(), f"{digest}.parse.pickle")
+
+
+def read_parsed(filename):
+    """
+    Read the cached parse result of a single file.
+    Returns the (entries, errors, options_map) triple, or None on a cache miss.
+    """
+    cache_path = get_parse_cache_path(filename)
+    if not os.path.exists(cache_path):
+        return None
+
+    try:
+        with open(cache_path, "rb") as file:
+            header = pickle.load(file)
+            if header.get("version") != PARSE_CACHE_FORMAT_VERSION:
+                return None
+            if header.get("filename") != filename:
+                return None
+            if not is_file_current(filename, header["signature"]):
+                return None
+            return pickle.load(file)
+    except Exception as e:
+        logger.warning("Could not read parse cache {}: {}", cache_path, e)
+        return None
+
+
+def write_parsed(filename, signature, parsed):
+    """Store the parse result of a single file."""
+    cache_path = get_parse_cache_path(filename)
+    header = {
+        "version": PARSE_CACHE_FORMAT_VERSION,
+        "filename": filename,
+        "signature": signature,
+    }
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path))
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(parsed, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        logger.warning("Could not write parse cache {}: {}", cache_path, e)
+
+
+def _parse_uncached(filename):
+    """
+    Parse a single file, without its includes, and store the result in the
+    parse cache. Runs in the worker processes too.
+    """
+    from beancount.parser import parser
+    from beancount.utils import encryption
+
+    # Decrypted contents are never written to the cache.
+    if encryption.is_encrypted_file(filename):
+        return parser.parse_string(encryption.read_encrypted_file(filename), filename)
+
+    # The signature is taken before parsing, so that a file modified while
+    # it is being parsed is parsed again next time.
+    signature = file_signature(filename)
+    parsed = parser.parse_file(filename)
+    if is_parse_cache_enabled():
+        write_parsed(filename, signature, parsed)
+    return parsed
+
+
+def parse_files(filenames, executor=None):
+    """
+    Parse the files, without their includes. The files that are not in the
+    parse cache are parsed by the executor, when one is given and there are
+    several of them.
+    Returns the (entries, errors, options_map) triples, in order.
+    """
+    results = [None] * len(filenames)
+    missing = []
+    for index, filename in enumerate(filenames):
+        parsed = read_parsed(filename) if is_parse_cache_enabled() else None
+        if parsed is None:
+            missing.append(index)
+        else:
+            profiling.count("cached files")
+            results[index] = parsed
+
+    profiling.count("parsed files", len(missing))
+    if executor is not None and len(missing) > 1:
+        futures = [executor.submit(_parse_uncached, filenames[i]) for i in missing]
+        for index, future in zip(missing, futures):
+            results[index] = future.result()
+    else:
+        for index in missing:
+            logger.debug("Parsing file {}", filenames[index])
+            results[index] = _parse_uncached(filenames[index])
+    return results
+
+
+def parse_ledger(book, executor=None):
+    """
+    Parse the ledger file and all of its includes, like beancount's loader.
+    The files of each level of includes are parsed together, by the executor
+    when one is given.
+    Returns the (entries, errors, options_map) triple of the unbooked ledger.
+    """
+    from beancount.core import data
+    from beancount.loader import LoadError, aggregate_options_map
+    from beancount.parser import options
+
+    entries = []
+    errors = []
+    options_map = None
+    other_options_maps = []
+    filenames_seen = set()
+    level = [book]
+
+    while level:
+        filenames = []
+        for filename in map(os.path.normpath, level):
+            if filename in filenames_seen:
+                errors.append(
+                    LoadError(
+                        data.new_metadata("<load>", 0),
+                        f'Duplicate filename parsed: "{filename}"',
+                    )
+                )
+            elif not os.path.exists(filename):
+                errors.append(
+                    LoadError(
+                        data.new_metadata("<load>", 0),
+                        f'File "{filename}" does not exist',
+                    )
+                )
+            else:
+                filenames_seen.add(filename)
+                filenames.append(filename)
+
+        level = []
+        for filename, parsed in zip(filenames, parse_files(filenames, executor)):
+            file_entries, file_errors, file_options = parsed
+            entries.extend(file_entries)
+            errors.extend(file_errors)
+            if options_map is None:
+                options_map = file_options
+            else:
+                other_options_maps.append(file_options)
+
+            # The include patterns are expanded on every load, so that a new
+            # file matching a glob is picked up.
+            cwd = os.path.dirname(filename)
+            for pattern in file_options["include"]:
+                matches = glob.glob(os.path.join(cwd, pattern), recursive=True)
+                if not matches:
+                    errors.append(
+                        LoadError(
+                            data.new_metadata("<load>", 0),
+                            f'File glob "{pattern}" does not match any files',
+                        )
+                    )
+                level.extend(os.path.join(cwd, match) for match in matches)
+
+    if options_map is None:
+        options_map = options.OPTIONS_DEFAULTS.copy()
+    options_map["include"] = sorted(filenames_seen)
+    options_map = aggregate_options_map(options_map, other_options_maps)
+    return entries, errors, options_map
+
+
+def load_ledger_incremental(book):
+    """
+    Load the ledger, parsing only the files that changed since the last load,
+    in parallel with --jobs. Booking, plugins and validations run as in
+    beancount.loader.load_file().
+    Returns the (entries, errors, options_map) triple.
+    """
+    import sys
+    from beancount.core import data
+    from beancount.loader import compute_input_hash, run_transformations
+    from beancount.ops import validation
+    from beancount.parser import booking
+
+    book = os.path.expandvars(os.path.expanduser(book))
+    book = os.path.normpath(os.path.join(os.getcwd(), book))
+
+    jobs = get_jobs()
+    with profiling.stage("parse"):
+        if jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                entries, parse_errors, options_map = parse_ledger(book, executor)
+        else:
+            entries, parse_errors, options_map = parse_ledger(book)
+        entries.sort(key=data.entry_sortkey)
+
+    with profiling.stage("booking"):
+        entries, balance_errors = booking.book(entries, options_map)
+        parse_errors.extend(balance_errors)
+
+        saved_path = list(sys.path)
+        try:
+            sys.path[0:0] = options_map.get("pythonpath", [])
+            entries, errors = run_transformations(entries, parse_errors, options_map, None)
+        finally:
+            sys.path[:] = saved_path
+
+        errors.extend(validation.validate(entries, options_map, None, None))
+
+    options_map["input_hash"] = compute_input_hash(options_map["include"])
+    return entries, errors, options_map
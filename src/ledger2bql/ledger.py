@@ -0,0 +1,337 @@
+"""
+The loaded Beancount ledger, shared across the whole command pipeline.
+
+Every stage of a command (named query lookup, query execution, ...) works on
+the same in-memory entries, so the ledger is loaded only once per process.
+"""
+
+import os
+import threading
+from .cache import are_includes_current, build_includes, load_ledger
+from .logging_utils import get_logger
+from .plan_cache import PlanCache
+from .profiling import stage
+
+logger = get_logger(__name__)
+
+# Loaded ledgers, by absolute path of the top-level file.
+_ledgers = {}
+
+# The number of entries of the first window read back by Ledger.tail().
+TAIL_WINDOW_SIZE = 500
+
+# Held while a ledger is loaded, so that the threads of the batch mode load it
+# only once.
+_load_lock = threading.Lock()
+
+
+def stat_signature(filenames):
+    """A cheap (mtime, size) signature of the given files, used to detect changes."""
+    signature = []
+    for filename in filenames:
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            signature.append((filename, None))
+            continue
+        signature.append((filename, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class Ledger:
+    """A loaded ledger: entries, errors, options and the beanquery connection."""
+
+    def __init__(self, book, entries, errors, options_map):
+        self.book = book
+        self.entries = entries
+        self.errors = errors
+        self.options_map = options_map
+        self.signature = stat_signature(options_map["include"])
+        self.includes = build_includes(options_map["include"])
+        self._connection = None
+        self._date_index = None
+        self._account_index = None
+        self._snapshots = None
+        # The compiled plans are bound to these entries.
+        self.plans = PlanCache()
+        # The plans keep the state of their aggregates while they run, so
+        # the queries of the threads of the batch mode run one at a time.
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """The beanquery connection over the loaded entries, created on first use."""
+        if self._connection is None:
+            import beanquery
+
+            self._connection = beanquery.connect(
+                "beancount:",
+                entries=self.entries,
+                errors=self.errors,
+                options=self.options_map,
+            )
+        return self._connection
+
+    @property
+    def date_index(self):
+        """The date index over the entries, created on first use."""
+        if self._date_index is None:
+            from .date_index import DateIndex
+
+            self._date_index = DateIndex(self.entries)
+        return self._date_index
+
+    @property
+    def snapshots(self):
+        """
+        The monthly balance snapshots, read from the cache or built on first
+        use, or None when they are disabled.
+        """
+        if self._snapshots is None:
+            from .snapshots import get_snapshots, is_snapshots_enabled
+
+            if not is_snapshots_enabled():
+                return None
+            self._snapshots = get_snapshots(self)
+        return self._snapshots
+
+    @property
+    def account_index(self):
+        """The account index over the entries, created on first use."""
+        if self._account_index is None:
+            from .account_index import AccountIndex
+
+            self._account_index = AccountIndex(self.entries)
+        return self._account_index
+
+    def view(self, begin=None, end=None, accounts=None, window=None, opening=None):
+        """
+        A connection whose default postings table holds only the entries
+        with begin <= date < end and, when accounts is given, only the
+        postings to those accounts. A window, as the (lo, hi) range of the
+        positions of the entries, restricts it further. An opening entry,
+        i.e. the balances before begin, is put before the entries. The other
+        tables, i.e. the prices used for the conversions, still cover the
+        whole ledger.
+        """
+        import copy
+        from beanquery.sources.beancount import PostingsTable
+
+        connection = self.connection
+        lo, hi = self.date_index.range(begin, end)
+        if window is not None:
+            lo, hi = max(lo, window[0]), min(hi, window[1])
+        if accounts is None:
+            if window is None:
+                entries = self.date_index.slice(begin, end)
+            else:
+                entries = self.entries[lo:hi]
+            table = PostingsTable(entries, self.options_map)
+        else:
+            from .account_index import AccountPostingsTable
+
+            index = self.account_index
+            if index.count_transactions(accounts) * 2 < hi - lo:
+                # Only the transactions of the accounts are scanned.
+                entries = [
+                    self.entries[position]
+                    for position in index.entry_positions(accounts, lo, hi)
+                ]
+            else:
+                entries = self.entries[lo:hi]
+            table = AccountPostingsTable(entries, self.options_map, accounts)
+        if opening is not None:
+            table.entries = [opening, *entries]
+
+        logger.debug(
+            "Scanning {} of {} entries, from {} to {}, accounts: {}",
+            len(entries),
+            len(self.entries),
+            begin,
+            end,
+            lambda: "all" if accounts is None else len(accounts),
+        )
+        view = copy.copy(connection)
+        view.tables = dict(connection.tables)
+        view.tables[None] = table
+        return view
+
+    def compile(self, query, window=None):
+        """
+        Parse and compile a BQL query into a plan, which can be run many times.
+        A query with date bounds, or account conditions, scans only the
+        matching entries and postings. A sum of the balances up to an end
+        date starts from the balance snapshot of its month. A window, as the
+        (lo, hi) range of the positions of the entries, restricts the scan
+        further.
+        """
+        from .account_index import query_accounts
+        from .date_index import query_date_bounds
+        from .snapshots import query_snapshot_end
+
+        connection = self.connection
+        statement = connection.parse(query)
+        bounds = query_date_bounds(statement)
+        accounts = query_accounts(statement, self)
+        end = None if window is not None else query_snapshot_end(statement)
+        if end is not None and self.snapshots is not None:
+            snapshot = self.snapshots.find(end)
+            if snapshot is not None:
+                # Sum from the balances at the start of the month of the end.
+                month, opening = snapshot
+                logger.debug("Using the balance snapshot of {}", month)
+                view = self.view(month, end, accounts=accounts, opening=opening)
+                return view.compile(statement)
+        if bounds is not None or accounts is not None or window is not None:
+            connection = self.view(
+                *(bounds or (None, None)), accounts=accounts, window=window
+            )
+        return connection.compile(statement)
+
+    def execute(self, query, window=None):
+        """
+        Run a BQL query on the ledger, reusing the compiled plan of the same
+        query when there is one. With a window, only the entries within the
+        (lo, hi) range of positions are scanned.
+        Returns the result columns, as (name, datatype) tuples, and the rows.
+        """
+        with self._lock:
+            with stage("compile"):
+                if window is None:
+                    compiled = self.plans.get(query, self.compile)
+                else:
+                    compiled = self.compile(query, window)
+            with stage("execute"):
+                description, rows = compiled()
+        columns = [(column.name, column.datatype) for column in description]
+        return columns, rows
+
+    def _prepare_windows(self, query):
+        """
+        Parse a query which is run window by window. Returns the statement,
+        the accounts it is restricted to, and the range of the positions of
+        the entries within its date bounds.
+        """
+        from .account_index import query_accounts
+        from .date_index import query_date_bounds
+
+        with self._lock:
+            with stage("compile"):
+                statement = self.connection.parse(query)
+                bounds = query_date_bounds(statement) or (None, None)
+                accounts = query_accounts(statement, self)
+        return statement, accounts, self.date_index.range(*bounds)
+
+    def _run_window(self, statement, accounts, window):
+        """
+        Run a parsed query on the entries within the window. Returns the
+        result description and the rows, or None when the query needs all
+        the rows at once, i.e. with ORDER BY, LIMIT, DISTINCT or aggregates.
+        """
+        from .date_index import can_prune
+
+        with self._lock:
+            with stage("compile"):
+                plan = self.view(accounts=accounts, window=window).compile(statement)
+            if not (can_prune(statement) and _is_row_by_row(plan)):
+                return None
+            with stage("execute"):
+                return plan()
+
+    def windows(self, query, size):
+        """
+        Run a query window by window, each window scanning the next `size`
+        entries within the date bounds of the query. Yields the rows of each
+        window; together, they are the rows of the whole query, in the same
+        order. beanquery has no OFFSET, and its LIMIT applies after the
+        whole table is scanned, so the windows are ranges of entries.
+
+        The query is parsed once. A query which needs all the rows at once
+        is run whole, as a single window.
+        """
+        statement, accounts, (lo, hi) = self._prepare_windows(query)
+        for start in range(lo, hi, size):
+            result = self._run_window(statement, accounts, (start, start + size))
+            if result is None:
+                logger.debug("Query cannot run in windows: {}", query)
+                yield self.execute(query)[1]
+                return
+            yield result[1]
+
+    def tail(self, query, count):
+        """
+        Run a query on the last entries only: the windows are read back from
+        the end, each twice as large as the previous one, until they hold at
+        least `count` rows.
+        Returns the position of the first entry read, the result columns, as
+        (name, datatype) tuples, and the rows of the entries from there on,
+        in the order of the query. A query which needs all the rows at once
+        is run whole, from the first entry.
+        """
+        statement, accounts, (lo, hi) = self._prepare_windows(query)
+        rows = []
+        description = None
+        start = hi
+        size = TAIL_WINDOW_SIZE
+        while start > lo and len(rows) < count:
+            stop, start = start, max(lo, start - size)
+            result = self._run_window(statement, accounts, (start, stop))
+            if result is None:
+                logger.debug("Query cannot run in windows: {}", query)
+                return (0, *self.execute(query))
+            description, window_rows = result
+            rows = window_rows + rows
+            size *= 2
+        if description is None:
+            # No entries within the date bounds.
+            return (0, *self.execute(query))
+        columns = [(column.name, column.datatype) for column in description]
+        return start, columns, rows
+
+    def is_current(self):
+        """
+        Check that none of the ledger files changed since it was loaded, and
+        that the include globs match no new files.
+        """
+        return stat_signature(
+            self.options_map["include"]
+        ) == self.signature and are_includes_current(self.includes)
+
+    def get_query_entries(self):
+        """Get the Query directives from the ledger."""
+        import beancount.core.data
+
+        return [
+            entry
+            for entry in self.entries
+            if isinstance(entry, beancount.core.data.Query)
+        ]
+
+
+def _is_row_by_row(plan):
+    """Check that each row of a compiled query depends only on its posting."""
+    return (
+        getattr(plan, "group_indexes", True) is None
+        and plan.order_spec is None
+        and plan.limit is None
+        and not plan.distinct
+    )
+
+
+def get_ledger(book) -> Ledger:
+    """
+    Get the loaded ledger for the given file.
+    The ledger is loaded once and reused for as long as its files do not change.
+    """
+    key = os.path.abspath(book)
+    with _load_lock:
+        ledger = _ledgers.get(key)
+        if ledger is not None and ledger.is_current():
+            return ledger
+
+        logger.debug("Loading ledger {}", key)
+        with stage("load"):
+            entries, errors, options_map = load_ledger(book)
+        ledger = Ledger(key, entries, errors, options_map)
+        _ledgers[key] = ledger
+        return ledger
@@ -1,62 +1,177 @@
 """
 Logging utilities for ledger2bql using loguru for beautiful, structured logging.
+
+Every module gets a named logger from get_logger(). The loggers do nothing
+until setup_logging() enables them with --verbose, and loguru is imported
+only then.
+
+The messages are formatted lazily, only when logging is enabled:
+- arguments are substituted into the message with str.format(), i.e.
+  logger.debug("Query returned {} rows", len(rows));
+- lambdas without parameters, as arguments or as the message, are called
+  first, i.e. logger.debug("Arguments: {}", lambda: vars(args)). Other
+  callables, i.e. functions or classes, are formatted as they are.
 """
 
+import json
 import sys
+from types import LambdaType
 from typing import Optional, Any
 
+# The log backend (loguru, or the standard logging module as a fallback).
+# None while logging is disabled.
+_backend = None
+
+# The named loggers, by name.
+_loggers = {}
+
+
+def _is_deferred(value):
+    """Only lambdas without parameters are deferred parts of a message."""
+    return (
+        isinstance(value, LambdaType)
+        and value.__name__ == "<lambda>"
+        and value.__code__.co_argcount == 0
+    )
+
+
+def _render(message, args):
+    """Build the message text, evaluating the deferred parts."""
+    if _is_deferred(message):
+        message = message()
+    if args:
+        message = message.format(*(arg() if _is_deferred(arg) else arg for arg in args))
+    return message
+
+
+class Logger:
+    """
+    A named logger. While logging is disabled, a call costs one check and
+    nothing is formatted.
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def _log(self, level: str, message: Any, args: tuple, exception: bool = False):
+        # The caller of debug(), info(), ... is three frames up.
+        _backend.log(
+            self.name, level, _render(message, args), depth=3, exception=exception
+        )
+
+    def debug(self, message: Any, *args):
+        if _backend is not None:
+            self._log("DEBUG", message, args)
+
+    def info(self, message: Any, *args):
+        if _backend is not None:
+            self._log("INFO", message, args)
+
+    def warning(self, message: Any, *args):
+        if _backend is not None:
+            self._log("WARNING", message, args)
+
+    def error(self, message: Any, *args):
+        if _backend is not None:
+            self._log("ERROR", message, args)
+
+    def exception(self, message: Any, *args):
+        """Log an error with the traceback of the exception being handled."""
+        if _backend is not None:
+            self._log("ERROR", message, args, exception=True)
+
+    def critical(self, message: Any, *args):
+        if _backend is not None:
+            self._log("CRITICAL", message, args)
+
+    def event(self, event: str, **fields):
+        """Log a structured event as a JSON object."""
+        if _backend is not None:
+            record = {"event": event, "logger": self.name}
+            record.update(fields)
+            _backend.log(self.name, "DEBUG", json.dumps(record, default=str), depth=2)
+
+    def timing(self, stage: str, seconds: float, **fields):
+        """Log the duration of a stage as a JSON timing event."""
+        if _backend is not None:
+            record = {
+                "event": "timing",
+                "logger": self.name,
+                "stage": stage,
+                "seconds": round(seconds, 6),
+            }
+            record.update(fields)
+            _backend.log(self.name, "DEBUG", json.dumps(record, default=str), depth=2)
+
+    def is_enabled(self) -> bool:
+        return _backend is not None
 
-class _NullLogger:
-    """A null logger that does nothing - used when logging is disabled."""
-    
-    def debug(self, *args, **kwargs):
-        pass
-    
-    def info(self, *args, **kwargs):
-        pass
-    
-    def warning(self, *args, **kwargs):
-        pass
-    
-    def error(self, *args, **kwargs):
-        pass
-    
-    def exception(self, *args, **kwargs):
-        pass
-    
-    def critical(self, *args, **kwargs):
-        pass
-    
     def bind(self, **kwargs):
         return self
 
 
+class _LoguruBackend:
+    def __init__(self, logger):
+        self.logger = logger
+
+    def log(self, name, level, message, depth, exception=False):
+        # Report the location of the code that called the ledger2bql logger.
+        self.logger.opt(depth=depth, exception=exception).log(level, message)
+
+
+class _StandardBackend:
+    def __init__(self, logging):
+        self.logging = logging
+
+    def log(self, name, level, message, depth, exception=False):
+        logger = self.logging.getLogger(name)
+        logger.log(
+            getattr(self.logging, level),
+            message,
+            exc_info=exception,
+            stacklevel=depth + 1,
+        )
+
+
+def is_logging_enabled() -> bool:
+    """Check whether setup_logging() enabled the loggers."""
+    return _backend is not None
+
+
 def setup_logging(verbose: bool = False, log_file: Optional[str] = None):
     """
     Set up logging using loguru with beautiful formatting.
-    
+
     Args:
         verbose: Enable verbose debug logging
         log_file: Optional path to log file for file logging
+
+    Returns:
+        The logger of the main module
     """
-    # If not verbose, return a null logger immediately - no loguru import
+    global _backend
+
+    # If not verbose, disable the loggers - no loguru import
     if not verbose:
-        return _NullLogger()
-    
+        _backend = None
+        return get_logger("ledger2bql.main")
+
     # Only import loguru when verbose mode is enabled
     try:
         from loguru import logger
-        
+
         # Remove default handler to customize
         logger.remove()
-        
+
         # Add console handler with beautiful formatting
         console_format = (
             "<level>{level: <8}</level> | "
             "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
             "<level>{message}</level>"
         )
-        
+
         logger.add(
             sys.stderr,
             level="DEBUG",
@@ -64,7 +179,7 @@ def setup_logging(verbose: bool = False, log_file: Optional[str] = None):
             colorize=True,
             diagnose=False  # Disable slow diagnostics for performance
         )
-        
+
         # Add file handler if log file is specified
         if log_file:
             file_format = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}"
@@ -76,10 +191,12 @@ def setup_logging(verbose: bool = False, log_file: Optional[str] = None):
                 rotation="10 MB",  # Rotate logs at 10MB
                 retention="7 days"  # Keep logs for 7 days
             )
-        
-        logger.debug("Logging initialized")
-        return logger
-        
+
+        _backend = _LoguruBackend(logger)
+        main_logger = get_logger("ledger2bql.main")
+        main_logger.debug("Logging initialized")
+        return main_logger
+
     except ImportError:
         # Fallback to standard logging if loguru is not available
         import logging
@@ -88,32 +205,34 @@ def setup_logging(verbose: bool = False, log_file: Optional[str] = None):
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
             stream=sys.stderr
         )
-        
+
         if log_file:
             file_handler = logging.FileHandler(log_file)
             file_handler.setLevel(logging.DEBUG)
             formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
             file_handler.setFormatter(formatter)
             logging.getLogger().addHandler(file_handler)
-        
-        logger = logging.getLogger(__name__)
-        logger.debug("Logging initialized (fallback to standard logging)")
-        return logger
+
+        _backend = _StandardBackend(logging)
+        main_logger = get_logger("ledger2bql.main")
+        main_logger.debug("Logging initialized (fallback to standard logging)")
+        return main_logger
 
 
-def get_logger(name: str = __name__):
+def get_logger(name: str = __name__) -> Logger:
     """
     Get a logger instance with the specified name.
-    
+
     Args:
         name: Name for the logger
-    
+
     Returns:
-        Logger instance (or null logger if logging is disabled)
+        The named logger. It is disabled until setup_logging() enables it.
     """
-    # Always return a null logger from get_logger()
-    # The main module will have the real logger when verbose is enabled
-    return _NullLogger()
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = Logger(name)
+    return logger
 
 
 def log_environment_info():
@@ -122,15 +241,15 @@ def log_environment_info():
     """
     import os
     logger = get_logger(__name__)
-    
+
     logger.debug("=== Environment Information ===")
-    logger.debug(f"BEANCOUNT_FILE: {os.getenv('BEANCOUNT_FILE')}")
-    logger.debug(f"Current working directory: {os.getcwd()}")
-    logger.debug(f"Python version: {sys.version}")
-    logger.debug(f"Platform: {sys.platform}")
-    
+    logger.debug("BEANCOUNT_FILE: {}", os.getenv('BEANCOUNT_FILE'))
+    logger.debug("Current working directory: {}", lambda: os.getcwd())
+    logger.debug("Python version: {}", sys.version)
+    logger.debug("Platform: {}", sys.platform)
+
     # Log all environment variables that start with common prefixes
-    env_vars = {k: v for k, v in os.environ.items() 
+    env_vars = {k: v for k, v in os.environ.items()
                 if k.startswith(('BEAN', 'LEDGER', 'BQL')) or 'FILE' in k}
     for key, value in env_vars.items():
-        logger.debug(f"ENV {key}: {value}")
\ No newline at end of file
+        logger.debug("ENV {}: {}", key, value)
@@ -5,6 +5,8 @@ into a Beanquery (BQL) query.
 
 import click
 from decimal import Decimal
+from .amount_format import format_amount
+from .models import CommandArgs
 from .date_parser import parse_date, parse_date_range
 from .utils import (
     add_common_click_arguments,
@@ -44,18 +46,14 @@ from .utils import (
 def lots_command(account_regex, sort_by, average, active, show_all, **kwargs):
     """Translate ledger-cli lots command arguments to a Beanquery (BQL) query."""
 
-    # Package arguments in a way compatible with the existing code
-    class Args:
-        def __init__(self, account_regex, sort_by, average, active, show_all, **kwargs):
-            self.account_regex = account_regex
-            self.sort_by = sort_by
-            self.average = average
-            self.active = active
-            self.show_all = show_all
-            for key, value in kwargs.items():
-                setattr(self, key, value)
-
-    args = Args(account_regex, sort_by, average, active, show_all, **kwargs)
+    args = CommandArgs(
+        account_regex=account_regex,
+        sort_by=sort_by,
+        average=average,
+        active=active,
+        show_all=show_all,
+        **kwargs,
+    )
 
     # Determine headers for the table
     if average:
@@ -240,6 +238,11 @@ def parse_query(args):
     return query
 
 
+def format_quantity(quantity):
+    """Format a quantity of units, as an integer if it is a whole number."""
+    return "{:,}".format(int(quantity) if quantity == int(quantity) else quantity)
+
+
 def format_output(output: list, args) -> list:
     """Formats the raw output from the BQL query into a pretty-printable list."""
     formatted_output = []
@@ -299,9 +302,9 @@ def format_output(output: list, args) -> list:
                 )
 
             # Format the output
-            formatted_quantity = "{:,.2f}".format(quantity_number)
-            formatted_avg_price = "{:,.2f} {}".format(avg_price_decimal, cost_currency)
-            formatted_total_cost = "{:,.2f} {}".format(
+            formatted_quantity = format_quantity(quantity_number)
+            formatted_avg_price = format_amount(avg_price_decimal, cost_currency)
+            formatted_total_cost = format_amount(
                 total_cost_decimal, cost_currency
             )
 
@@ -314,11 +317,11 @@ def format_output(output: list, args) -> list:
                     pos = positions[0]
                     value_number = pos.units.number
                     value_currency = pos.units.currency
-                    value_str = "{:,.2f} {}".format(value_number, value_currency)
+                    value_str = format_amount(value_number, value_currency)
             elif hasattr(value, "number") and hasattr(value, "currency"):
                 value_number = value.number
                 value_currency = value.currency
-                value_str = "{:,.2f} {}".format(value_number, value_currency)
+                value_str = format_amount(value_number, value_currency)
             elif (
                 hasattr(value, "units")
                 and hasattr(value.units, "number")
@@ -327,7 +330,7 @@ def format_output(output: list, args) -> list:
                 # Position object with units
                 value_number = value.units.number
                 value_currency = value.units.currency
-                value_str = "{:,.2f} {}".format(value_number, value_currency)
+                value_str = format_amount(value_number, value_currency)
             elif value is not None:
                 # Try to convert to string directly and format properly
                 value_str = str(value)
@@ -413,11 +416,11 @@ def format_output(output: list, args) -> list:
                     pos = positions[0]
                     value_number = pos.units.number
                     value_currency = pos.units.currency
-                    value_str = "{:,.2f} {}".format(value_number, value_currency)
+                    value_str = format_amount(value_number, value_currency)
             elif hasattr(value, "number") and hasattr(value, "currency"):
                 value_number = value.number
                 value_currency = value.currency
-                value_str = "{:,.2f} {}".format(value_number, value_currency)
+                value_str = format_amount(value_number, value_currency)
             elif (
                 hasattr(value, "units")
                 and hasattr(value.units, "number")
@@ -426,16 +429,12 @@ def format_output(output: list, args) -> list:
                 # Position object with units
                 value_number = value.units.number
                 value_currency = value.units.currency
-                value_str = "{:,.2f} {}".format(value_number, value_currency)
+                value_str = format_amount(value_number, value_currency)
             elif value is not None:
                 value_str = str(value)
 
-            formatted_quantity = "{:,}".format(
-                int(quantity_number)
-                if quantity_number == int(quantity_number)
-                else quantity_number
-            )  # Show as integer if whole number
-            formatted_price = "{:,.2f} {}".format(
+            formatted_quantity = format_quantity(quantity_number)
+            formatted_price = format_amount(
                 price_decimal,
                 # Extract currency from cost if available
                 cost.currency
@@ -3,34 +3,52 @@ CLI runner for Ledger2BQL utility.
 """
 
 import sys
+from importlib import import_module
 from importlib.metadata import PackageNotFoundError
 from dotenv import find_dotenv, load_dotenv
 import click
 from .logging_utils import setup_logging, log_environment_info
-
-from .balance import bal_command
-from .register import reg_command
-from .query import query_command
-from .lots import lots_command
-from .assert_command import assert_command
-from .price import price_command
+from . import profiling
+
+# The subcommands, as name -> (module, command object). The modules are
+# imported only when the command is needed, so that i.e. `--version` does not
+# pay for importing the whole query engine.
+LAZY_COMMANDS = {
+    "bal": (".balance", "bal_command"),
+    "reg": (".register", "reg_command"),
+    "query": (".query", "query_command"),
+    "lots": (".lots", "lots_command"),
+    "assert": (".assert_command", "assert_command"),
+    "price": (".price", "price_command"),
+    "serve": (".daemon", "serve_command"),
+    "cache": (".result_cache", "cache_command"),
+    "batch": (".batch", "batch_command"),
+}
+
+# Command aliases
+ALIASES = {"b": "bal", "r": "reg", "q": "query", "l": "lots", "a": "assert", "p": "price"}
 
 
 class AliasedGroup(click.Group):
-    """A click Group that supports command aliases."""
+    """A click Group that supports command aliases and lazy loading of commands."""
+
+    def list_commands(self, ctx):
+        """List the names of all the commands, without loading them."""
+        return sorted(set(super().list_commands(ctx)) | set(LAZY_COMMANDS))
 
     def get_command(self, ctx, cmd_name):
         """Get the command by name or alias."""
+        cmd_name = ALIASES.get(cmd_name, cmd_name)
+
         # Try the normal way first
         rv = click.Group.get_command(self, ctx, cmd_name)
         if rv is not None:
             return rv
 
-        # Check for aliases
-        aliases = {"b": "bal", "r": "reg", "q": "query", "l": "lots", "a": "assert", "p": "price"}
-
-        if cmd_name in aliases:
-            return click.Group.get_command(self, ctx, aliases[cmd_name])
+        if cmd_name in LAZY_COMMANDS:
+            module_name, command_name = LAZY_COMMANDS[cmd_name]
+            module = import_module(module_name, __package__)
+            return getattr(module, command_name)
 
         return None
 
@@ -38,8 +56,28 @@ class AliasedGroup(click.Group):
 @click.group(cls=AliasedGroup, invoke_without_command=True)
 @click.option("--version", is_flag=True, help="Show the version and exit.")
 @click.option("--verbose", "-v", is_flag=True, help="Enable verbose debug output.")
+@click.option(
+    "--profile",
+    is_flag=True,
+    help=(
+        "Print the time and peak memory of each stage of the command to stderr. "
+        "Tracing the memory slows the command down, so the times are inflated."
+    ),
+)
+@click.option(
+    "--profile-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="With --profile, also write cProfile statistics to this file.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    help="Parse the included ledger files in this many processes "
+    "(default: LEDGER2BQL_JOBS, or 1).",
+)
 @click.pass_context
-def cli(ctx, version, verbose):
+def cli(ctx, version, verbose, profile, profile_file, jobs):
     """Translate Ledger CLI query syntax into BQL"""
     if version:
         try:
@@ -51,10 +89,20 @@ def cli(ctx, version, verbose):
         click.echo(f"ledger2bql v{v}")
         sys.exit(0)
 
+    if profile or profile_file:
+        profiling.start_profiling(profile_file)
+        ctx.call_on_close(profiling.stop_profiling)
+
+    if jobs:
+        from .incremental import set_jobs
+
+        set_jobs(jobs)
+
     # Initialize environment variables by loading .env files in the
     # parent directories.
-    dotenv_path = find_dotenv()
-    load_dotenv(dotenv_path, override=True)
+    with profiling.stage("env"):
+        dotenv_path = find_dotenv()
+        load_dotenv(dotenv_path, override=True)
 
     # Set up logging (only imports loguru if verbose mode is enabled)
     logger = setup_logging(verbose=verbose)
@@ -78,15 +126,6 @@ def cli(ctx, version, verbose):
         sys.exit(0)
 
 
-# Add the subcommands
-cli.add_command(bal_command)
-cli.add_command(reg_command)
-cli.add_command(query_command)
-cli.add_command(lots_command)
-cli.add_command(assert_command)
-cli.add_command(price_command)
-
-
 def main():
     """main entry point"""
     cli()
@@ -0,0 +1,105 @@
+"""
+Compact types shared by the commands.
+
+The types use __slots__, so that the instances have no per-instance
+dictionary. This keeps the per-row memory low and the attribute access fast
+in the reports with many rows.
+"""
+
+from decimal import Decimal
+
+
+class CommandArgs:
+    """
+    The parsed options of a command.
+    Options that the command does not have are None.
+    """
+
+    __slots__ = (
+        # Command arguments
+        "account_regex",
+        "symbol_filter",
+        "query_name",
+        # Common options
+        "begin",
+        "end",
+        "date_range",
+        "empty",
+        "sort",
+        "limit",
+        "amount",
+        "currency",
+        "exchange",
+        "total",
+        "no_pager",
+        "no_cache",
+        "output_format",
+        # bal
+        "depth",
+        "zero",
+        "hierarchy",
+        "period",
+        # lots
+        "sort_by",
+        "average",
+        "active",
+        "show_all",
+        # reg
+        "tail",
+        # Set while the query is built
+        "amount_filters",
+        "actual_query_name",
+        "opening",
+    )
+
+    def __init__(self, **options):
+        for name in self.__slots__:
+            setattr(self, name, options.pop(name, None))
+        if options:
+            raise TypeError(f"Unknown command options: {', '.join(options)}")
+
+    def __repr__(self):
+        options = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for name in self.__slots__
+            if getattr(self, name) is not None
+        )
+        return f"CommandArgs({options})"
+
+
+class AccountBalance:
+    """
+    One row of the balance report.
+    units: {currency: number} dictionary.
+    converted: the balance in the exchange currency, if any.
+    """
+
+    __slots__ = ("account", "depth", "units", "converted")
+
+    def __init__(self, account, depth, units, converted=None):
+        self.account = account
+        self.depth = depth
+        self.units = units
+        self.converted = converted
+
+    def is_empty(self):
+        return not self.units
+
+    def __repr__(self):
+        return (
+            f"AccountBalance({self.account!r}, {self.depth}, "
+            f"{self.units!r}, {self.converted!r})"
+        )
+
+
+class ConvertedAmount:
+    """An amount converted into the exchange currency."""
+
+    __slots__ = ("number", "currency")
+
+    def __init__(self, number: Decimal, currency: str):
+        self.number = number
+        self.currency = currency
+
+    def __repr__(self):
+        return f"ConvertedAmount({self.number!r}, {self.currency!r})"
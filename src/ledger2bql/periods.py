@@ -0,0 +1,74 @@
+"""
+Report periods of the multi-period balance report, `bal --period monthly`.
+
+Each period is identified by the date it starts on. The balance query groups
+the postings by the columns of the period, i.e. `year, month`, and the rows
+are then pivoted into one column per period.
+"""
+
+import datetime
+
+PERIODS = ("daily", "weekly", "monthly", "quarterly", "yearly")
+
+# The columns the postings are grouped by, for each period.
+PERIOD_COLUMNS = {
+    "daily": ["date"],
+    "weekly": ["date_trunc('week', date) as week"],
+    "monthly": ["year", "month"],
+    "quarterly": ["date_trunc('quarter', date) as quarter"],
+    "yearly": ["year"],
+}
+
+
+def period_start(period, date):
+    """The first day of the period which holds the date."""
+    if period == "daily":
+        return date
+    if period == "weekly":
+        return date - datetime.timedelta(days=date.weekday())
+    if period == "monthly":
+        return datetime.date(date.year, date.month, 1)
+    if period == "quarterly":
+        return datetime.date(date.year, date.month - (date.month - 1) % 3, 1)
+    return datetime.date(date.year, 1, 1)
+
+
+def next_period(period, start):
+    """The first day of the period after the one starting on start."""
+    if period == "daily":
+        return start + datetime.timedelta(days=1)
+    if period == "weekly":
+        return start + datetime.timedelta(days=7)
+    months = {"monthly": 1, "quarterly": 3}.get(period, 12)
+    month = start.month - 1 + months
+    return datetime.date(start.year + month // 12, month % 12 + 1, 1)
+
+
+def key_start(period, key):
+    """The first day of the period of a row, from the values of its period columns."""
+    if period == "monthly":
+        return datetime.date(key[0], key[1], 1)
+    if period == "yearly":
+        return datetime.date(key[0], 1, 1)
+    return key[0]
+
+
+def period_label(period, start):
+    """The column header of the period starting on start."""
+    if period == "monthly":
+        return f"{start.year}-{start.month:02d}"
+    if period == "quarterly":
+        return f"{start.year}-Q{(start.month - 1) // 3 + 1}"
+    if period == "yearly":
+        return str(start.year)
+    return start.isoformat()
+
+
+def period_starts(period, begin, end):
+    """The first days of the periods from the one of begin, up to end (exclusive)."""
+    starts = []
+    start = period_start(period, begin)
+    while start < end:
+        starts.append(start)
+        start = next_period(period, start)
+    return starts
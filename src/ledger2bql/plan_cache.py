@@ -0,0 +1,78 @@
+"""
+LRU cache of the compiled beanquery plans.
+
+Parsing and compiling a BQL query costs more than running it on a small
+ledger: the query parser alone takes tens of milliseconds. The daemon and
+the batch mode run the same report queries again and again, so the compiled
+plans are kept and run again as they are.
+
+Every loaded ledger has its own cache, which goes away when the ledger is
+reloaded, so a plan never outlives the entries it is bound to. The queries
+are keyed by their normalized text; a plan is bound to its date and account
+view of the ledger, which are derived from that text.
+"""
+
+import os
+import re
+from collections import OrderedDict
+from . import profiling
+
+DEFAULT_PLAN_CACHE_SIZE = 256
+
+# A string literal, or a run of whitespace.
+_TOKEN = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|\s+""")
+
+
+def normalize_query(query):
+    """
+    Normalize the text of a query: collapse the whitespace outside of the
+    string literals, and drop a trailing semicolon.
+    """
+    normalized = _TOKEN.sub(lambda match: match.group(1) or " ", query).strip()
+    return normalized.rstrip(";").rstrip()
+
+
+def get_plan_cache_size():
+    """LEDGER2BQL_PLAN_CACHE_SIZE sets the number of plans kept; 0 disables the cache."""
+    try:
+        return int(os.getenv("LEDGER2BQL_PLAN_CACHE_SIZE", DEFAULT_PLAN_CACHE_SIZE))
+    except ValueError:
+        return DEFAULT_PLAN_CACHE_SIZE
+
+
+class PlanCache:
+    """The compiled plans of a ledger, by normalized query text."""
+
+    def __init__(self, maxsize=None):
+        self.maxsize = get_plan_cache_size() if maxsize is None else maxsize
+        self.plans = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query, compile_plan):
+        """
+        Get the compiled plan of the query, compiling it with
+        compile_plan(query) on a cache miss.
+        """
+        key = normalize_query(query)
+        plan = self.plans.get(key)
+        if plan is not None:
+            self.plans.move_to_end(key)
+            self.hits += 1
+            profiling.count("plan cache hits")
+            return plan
+
+        self.misses += 1
+        profiling.count("plan cache misses")
+        plan = compile_plan(query)
+        if self.maxsize > 0:
+            self.plans[key] = plan
+            if len(self.plans) > self.maxsize:
+                self.plans.popitem(last=False)
+        return plan
+
+    def clear(self):
+        self.plans.clear()
+
+    def __len__(self):
+        return len(self.plans)
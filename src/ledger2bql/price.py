@@ -4,6 +4,8 @@ into a Beanquery (BQL) query.
 """
 
 import click
+from .amount_format import amount_format
+from .models import CommandArgs
 from .date_parser import parse_date, parse_date_range
 from .utils import (
     add_common_click_arguments,
@@ -11,6 +13,9 @@ from .utils import (
     parse_amount_filter,
 )
 
+# Prices are shown with six decimal places.
+format_price = amount_format(6)
+
 
 @click.command(name="price", short_help="[p] Show price history")
 @click.argument("symbol_filter", nargs=-1, required=False)
@@ -27,14 +32,7 @@ def price_command(symbol_filter, **kwargs):
         ledger2bql price -a ">1.2EUR"       # Show EUR prices greater than 1.2
     """
     
-    # Package arguments in a way compatible with the existing code
-    class Args:
-        def __init__(self, symbol_filter, **kwargs):
-            self.symbol_filter = symbol_filter
-            for key, value in kwargs.items():
-                setattr(self, key, value)
-
-    args = Args(symbol_filter, **kwargs)
+    args = CommandArgs(symbol_filter=symbol_filter, **kwargs)
 
     # Determine headers for the table
     headers = ["Date", "Symbol", "Price"]
@@ -142,7 +140,7 @@ def format_output(output: list, args) -> list:
 
         # Format the amount
         if hasattr(amount_obj, 'number') and hasattr(amount_obj, 'currency'):
-            formatted_amount = "{:,.6f} {}".format(amount_obj.number, amount_obj.currency)
+            formatted_amount = format_price(amount_obj.number, amount_obj.currency)
         else:
             formatted_amount = str(amount_obj)
 
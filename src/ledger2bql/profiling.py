@@ -0,0 +1,196 @@
+"""
+Per-stage timing of the command pipeline, enabled with `ledger2bql --profile`.
+
+Each stage of a command (environment, ledger load, query compile and
+execute, formatting, rendering, pager) records its wall time and its peak
+memory. The peak of a stage includes the peaks of the stages nested in it.
+Memory is traced with tracemalloc, which slows the allocations down, so the
+times are inflated, mostly for allocation-heavy stages like the ledger
+load; compare them with a run without --profile. tracemalloc has a single
+peak for the whole process, so the memory is not traced while stages run on
+several threads at once, i.e. in `batch --workers N`.
+
+The breakdown is printed to stderr when the command finishes. Optionally,
+the whole run is also profiled with cProfile and the statistics are written
+to a file, for use with pstats or snakeviz.
+
+With --verbose, every stage is also logged as a JSON timing event.
+Without either, stage() returns a shared no-op context manager, so the
+instrumentation costs nothing.
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from .logging_utils import get_logger, is_logging_enabled
+
+logger = get_logger(__name__)
+
+# The active profiler, when --profile is given.
+_profiler = None
+
+_NO_STAGE = nullcontext()
+
+
+class Profiler:
+    """Collects the wall time and peak memory of the pipeline stages."""
+
+    def __init__(self, stats_file=None):
+        import tracemalloc
+
+        self._tracemalloc = tracemalloc
+        self.stats_file = stats_file
+        # Stage name -> [calls, seconds, peak bytes], in the order of first use.
+        # The peak is None for a stage which only ran without memory tracing.
+        self.stages = {}
+        # Counters, i.e. cache hits, shown with the breakdown.
+        self.counters = {}
+        # The highest peak seen within each open stage, outermost (the whole
+        # run) first. tracemalloc has a single peak, which each stage resets,
+        # so the peak of a nested stage is folded into its parent's.
+        self._peaks = [0]
+        # Why the memory is no longer traced, once it is stopped.
+        self.memory_note = None
+        self._lock = threading.Lock()
+        self._profile = None
+        tracemalloc.start()
+        if stats_file:
+            import cProfile
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._start = time.perf_counter()
+
+    def stop_memory_tracing(self, reason):
+        """
+        Stop tracing the memory for the rest of the run, before stages run on
+        several threads at once. Their peaks would reset each other's.
+        """
+        if self.memory_note is None:
+            _, peak = self._tracemalloc.get_traced_memory()
+            self._peaks[0] = max(*self._peaks, peak)
+            self.memory_note = reason
+            self._tracemalloc.stop()
+
+    def _record(self, name, elapsed, memory):
+        with self._lock:
+            record = self.stages.setdefault(name, [0, 0.0, None])
+            record[0] += 1
+            record[1] += elapsed
+            if memory is not None:
+                record[2] = max(record[2] or 0, memory)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage. A stage that runs several times is accumulated."""
+        tracemalloc = self._tracemalloc
+        peaks = self._peaks
+        traced = self.memory_note is None
+        if traced:
+            base, outer_peak = tracemalloc.get_traced_memory()
+            peaks[-1] = max(peaks[-1], outer_peak)
+            peaks.append(0)
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            memory = None
+            if traced:
+                inner_peak = peaks.pop()
+                # The tracing may have been stopped while the stage ran.
+                if self.memory_note is None:
+                    _, peak = tracemalloc.get_traced_memory()
+                    peak = max(peak, inner_peak)
+                    peaks[-1] = max(peaks[-1], peak)
+                    memory = peak - base
+            self._record(name, elapsed, memory)
+            if memory is None:
+                logger.timing(name, elapsed)
+            else:
+                logger.timing(name, elapsed, peak_memory=memory)
+
+    def count(self, name, increment=1):
+        """Increment a counter."""
+        self.counters[name] = self.counters.get(name, 0) + increment
+
+    def report(self):
+        """The compact text breakdown of the stages."""
+        total = time.perf_counter() - self._start
+        _, peak = self._tracemalloc.get_traced_memory()
+        peak = max(peak, self._peaks[0])
+        lines = [f"{'stage':<16}{'time':>10}{'%':>7}{'peak mem':>12}"]
+        for name, (calls, seconds, memory) in self.stages.items():
+            label = name if calls == 1 else f"{name} (x{calls})"
+            lines.append(
+                f"{label:<16}{seconds * 1000:>8.1f}ms"
+                f"{seconds / total * 100 if total else 0:>6.1f}%"
+                + (f"{memory / 1e6:>10.1f}MB" if memory is not None else f"{'-':>12}")
+            )
+        lines.append(f"{'total':<16}{total * 1000:>8.1f}ms{'':>7}{peak / 1e6:>10.1f}MB")
+        if self.memory_note is not None:
+            lines.append(f"Peak memory not traced {self.memory_note}.")
+        for name, value in self.counters.items():
+            lines.append(f"{name}: {value}")
+        return "\n".join(lines)
+
+    def finish(self):
+        """Stop profiling and print the breakdown to stderr."""
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.stats_file)
+        sys.stderr.write(self.report() + "\n")
+        if self.stats_file:
+            sys.stderr.write(f"Profile statistics written to {self.stats_file}\n")
+        self._tracemalloc.stop()
+
+
+def start_profiling(stats_file=None):
+    """Enable the stage timing for the rest of the process."""
+    global _profiler
+    _profiler = Profiler(stats_file)
+    return _profiler
+
+
+def stop_profiling():
+    """Print the breakdown and disable the stage timing."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.finish()
+
+
+def stop_memory_tracing(reason):
+    """Stop tracing the memory when profiling, i.e. before running stages in threads."""
+    if _profiler is not None:
+        _profiler.stop_memory_tracing(reason)
+
+
+def is_profiling():
+    return _profiler is not None
+
+
+@contextmanager
+def _logged_stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        logger.timing(name, time.perf_counter() - start)
+
+
+def stage(name):
+    """Context manager timing a pipeline stage, when profiling or logging."""
+    if _profiler is not None:
+        return _profiler.stage(name)
+    if is_logging_enabled():
+        return _logged_stage(name)
+    return _NO_STAGE
+
+
+def count(name, increment=1):
+    """Increment a profile counter, when profiling."""
+    if _profiler is not None:
+        _profiler.count(name, increment)
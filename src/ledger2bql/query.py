@@ -3,24 +3,31 @@ A command-line tool to execute named queries from the Beancount ledger file.
 """
 
 import click
-import beancount.loader
-import beancount.core.data
-from .utils import get_beancount_file_path, execute_bql_command_with_click
+from . import daemon
+from .ledger import get_ledger
+from .models import CommandArgs
+from .utils import (
+    get_beancount_file_path,
+    execute_bql_command_with_click,
+    no_cache_option,
+    output_format_option,
+)
 
 
 @click.command(name="query", short_help="[q] Execute a named query from the ledger")
 @click.argument("query_name")
 @click.option("--no-pager", is_flag=True, help="Disable automatic paging of output.")
-def query_command(query_name, no_pager):
+@no_cache_option
+@output_format_option
+def query_command(query_name, no_pager, no_cache, output_format):
     """Execute a named query from the ledger file."""
 
-    # Package arguments in a way compatible with the existing code
-    class Args:
-        def __init__(self, query_name, no_pager):
-            self.query_name = query_name
-            self.no_pager = no_pager
-
-    args = Args(query_name, no_pager)
+    args = CommandArgs(
+        query_name=query_name,
+        no_pager=no_pager,
+        no_cache=no_cache,
+        output_format=output_format,
+    )
 
     # Execute the command
     execute_bql_command_with_click(
@@ -32,32 +39,34 @@ def parse_query(args):
     """Parse the query name and retrieve the actual BQL query from the ledger."""
     beancount_file = get_beancount_file_path()
 
-    # Load the beancount file using the beancount library
-    entries, errors, options_map = beancount.loader.load_file(beancount_file)
-
-    # Look for query entries
-    query_entries = [
-        entry for entry in entries if isinstance(entry, beancount.core.data.Query)
-    ]
+    # Look for query entries, as (name, query string) pairs. A running query
+    # daemon has them in memory. Otherwise, the loaded ledger is shared with
+    # the query execution, so the file is loaded only once.
+    queries = daemon.get_named_queries(beancount_file)
+    if queries is None:
+        queries = [
+            (entry.name, entry.query_string)
+            for entry in get_ledger(beancount_file).get_query_entries()
+        ]
 
     # Try to find an exact match first
-    for query_entry in query_entries:
-        if query_entry.name == args.query_name:
-            return query_entry.query_string
+    for name, query_string in queries:
+        if name == args.query_name:
+            return query_string
 
     # Try case-insensitive match
-    for query_entry in query_entries:
-        if query_entry.name.lower() == args.query_name.lower():
+    for name, query_string in queries:
+        if name.lower() == args.query_name.lower():
             # Store the actual query name for display
-            args.actual_query_name = query_entry.name
-            return query_entry.query_string
+            args.actual_query_name = name
+            return query_string
 
     # Try partial matching - look for queries that contain the search term
-    for query_entry in query_entries:
-        if args.query_name.lower() in query_entry.name.lower():
+    for name, query_string in queries:
+        if args.query_name.lower() in name.lower():
             # Store the actual query name for display
-            args.actual_query_name = query_entry.name
-            return query_entry.query_string
+            args.actual_query_name = name
+            return query_string
 
     # If no match found, raise an error
     raise ValueError(f"Query '{args.query_name}' not found in the ledger file.")
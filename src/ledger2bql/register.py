@@ -4,33 +4,46 @@ into a Beanquery (BQL) query.
 """
 
 import click
+from collections.abc import Sequence
 from decimal import Decimal
-from collections import defaultdict
+from itertools import accumulate
+from .amount_format import format_amount
+from .logging_utils import get_logger
+from .models import CommandArgs
 from .date_parser import parse_date, parse_date_range
+from . import daemon
+from .ledger import get_ledger
 from .utils import (
     add_common_click_arguments,
     execute_bql_command_with_click,
     parse_account_params,
     parse_account_pattern,
     parse_amount_filter,
+    run_bql_query_with_columns,
 )
 
+logger = get_logger(__name__)
+
 
 @click.command(name="reg", short_help="[r] Show transaction register")
 @click.argument("account_regex", nargs=-1)
 @add_common_click_arguments
+@click.option(
+    "--tail",
+    type=click.IntRange(min=1),
+    help="Show only the last N postings, with the running totals carried over from the earlier ones.",
+)
 @click.pass_context
 def reg_command(ctx, account_regex, **kwargs):
     """Translate ledger-cli register command arguments to a Beanquery (BQL) query."""
 
-    # Package arguments in a way compatible with the existing code
-    class Args:
-        def __init__(self, account_regex, **kwargs):
-            self.account_regex = account_regex
-            for key, value in kwargs.items():
-                setattr(self, key, value)
+    args = CommandArgs(account_regex=account_regex, **kwargs)
 
-    args = Args(account_regex, **kwargs)
+    if args.tail:
+        if args.sort and args.sort != "account":
+            raise click.UsageError("--tail cannot be used with --sort.")
+        if args.limit:
+            raise click.UsageError("--tail cannot be used with --limit.")
 
     # Determine headers and alignments for the table
     headers = ["Date", "Account", "Payee", "Narration", "Amount"]
@@ -38,15 +51,20 @@ def reg_command(ctx, account_regex, **kwargs):
 
     # Execute the command
     execute_bql_command_with_click(
-        parse_query, format_output, headers, alignments, args, command_type="reg"
+        parse_query,
+        format_output,
+        headers,
+        alignments,
+        args,
+        command_type="reg",
+        format_windows_func=format_windows,
+        run_query_func=run_tail_query if args.tail else None,
     )
 
 
-def parse_query(args):
+def get_where_clauses(args):
+    """The conditions of the register query, from the filters of the command."""
     where_clauses = []
-    account_regexes = []
-    excluded_account_regexes = []
-
     # Handle account regular expressions and payee filters
     account_regexes, excluded_account_regexes, payee_where_clauses = (
         parse_account_params(args.account_regex)
@@ -96,6 +114,12 @@ def parse_query(args):
         else:
             where_clauses.append(f"currency = '{args.currency}'")
 
+    return where_clauses
+
+
+def parse_query(args):
+    where_clauses = get_where_clauses(args)
+
     # Build the final query
     if hasattr(args, "exchange") and args.exchange:
         # When exchange currency is specified, convert positions to that currency
@@ -126,89 +150,197 @@ def parse_query(args):
     return query
 
 
-def format_output(output: list, args) -> list:
-    """Formats the raw output from the BQL query into a pretty-printable list."""
-    formatted_output = []
-    running_total = defaultdict(Decimal)
-    converted_running_total = Decimal("0")
-
-    for row in output:
-        if args.exchange:
-            # When exchange currency is specified, we have an additional column with converted position
-            date, account, payee, narration, position, converted_position = row
-
-            # Access the amount from the position object
-            transaction_amount = position.units.number.normalize()
-            transaction_currency = position.units.currency
-
-            # Calculate running total
-            running_total[transaction_currency] += transaction_amount
-
-            # Format the transaction amount
-            formatted_transaction_amount = "{:,.2f} {}".format(
-                transaction_amount, transaction_currency
-            )
-
-            # Format the converted amount
-            converted_amount = converted_position
-            formatted_converted_amount = "{:,.2f} {}".format(
-                converted_amount.number, converted_amount.currency
-            )
-
-            # Calculate converted running total
-            # Only add to the converted running total if the conversion was successful
-            if converted_amount.currency == args.exchange:
-                converted_running_total += converted_amount.number
-
-            # Format the running totals
-            formatted_running_total = "{:,.2f} {}".format(
-                running_total[transaction_currency], transaction_currency
-            )
-            formatted_converted_running_total = "{:,.2f} {}".format(
-                converted_running_total, args.exchange
-            )
-
-            # Assemble the row
-            new_row = [date, account, payee, narration, formatted_transaction_amount]
+ZERO = Decimal(0)
 
-            # Add running total if total is requested
-            if args.total:
-                new_row.append(formatted_running_total)
 
-            # Add converted amount if exchange is requested
-            if args.exchange:
-                new_row.append(formatted_converted_amount)
+def running_totals(numbers, currencies, balances=None):
+    """
+    The running total of each row, in the currency of that row.
+    balances: the totals before the first row, by currency. It is updated
+    with the totals after the last row, to carry them to the next rows.
+    The totals are exact Decimal sums. With a single currency, which is the
+    common case, they are computed in one pass of accumulate().
+    """
+    if balances is None:
+        balances = {}
 
-            # Add converted running total if both exchange and total are requested
-            if args.exchange and args.total:
-                new_row.append(formatted_converted_running_total)
+    if len(set(currencies)) == 1:
+        currency = currencies[0]
+        opening = balances.get(currency)
+        if opening is None:
+            totals = list(accumulate(numbers))
         else:
-            date, account, payee, narration, position = row
-
-            # Access the amount from the position object
-            transaction_amount = position.units.number.normalize()
-            transaction_currency = position.units.currency
-
-            # Calculate running total
-            running_total[transaction_currency] += transaction_amount
-
-            # Format the transaction amount
-            formatted_transaction_amount = "{:,.2f} {}".format(
-                transaction_amount, transaction_currency
-            )
+            totals = list(accumulate(numbers, initial=opening))[1:]
+        balances[currency] = totals[-1]
+        return totals
+
+    totals = []
+    for number, currency in zip(numbers, currencies):
+        total = balances[currency] = balances.get(currency, ZERO) + number
+        totals.append(total)
+    return totals
+
+
+class RegisterRows(Sequence):
+    """
+    The rows of the register report, formatted when they are accessed.
+
+    The running totals are computed up front, column by column, but the
+    amounts are formatted only for the rows which are displayed, and only
+    once, as the table renderer reads the rows more than once.
+
+    balances and converted_balance are the running totals before the first
+    row; after the rows are created, they hold the totals after the last row.
+    """
+
+    __slots__ = (
+        "rows",
+        "exchange",
+        "totals",
+        "converted_totals",
+        "balances",
+        "converted_balance",
+        "_formatted",
+        "_pending",
+    )
 
-            # Format the running total
-            formatted_running_total = "{:,.2f} {}".format(
-                running_total[transaction_currency], transaction_currency
+    def __init__(self, rows, exchange=None, total=False, balances=None, converted_balance=ZERO):
+        self.rows = rows
+        self.exchange = exchange
+        self.totals = None
+        self.converted_totals = None
+        self.balances = {} if balances is None else balances
+        self.converted_balance = converted_balance
+        if total:
+            units = [row[4].units for row in rows]
+            self.totals = running_totals(
+                [amount.number for amount in units],
+                [amount.currency for amount in units],
+                self.balances,
             )
-
-            # Assemble the row
-            new_row = [date, account, payee, narration, formatted_transaction_amount]
-
-            # Add running total if total is requested
-            if args.total:
-                new_row.append(formatted_running_total)
-
-        formatted_output.append(new_row)
-
-    return formatted_output
+            if exchange:
+                # Only the converted amounts count towards the converted total.
+                self.converted_totals = list(
+                    accumulate(
+                        (
+                            converted.number if converted.currency == exchange else ZERO
+                            for converted in (row[5] for row in rows)
+                        ),
+                        initial=converted_balance,
+                    )
+                )[1:]
+                if self.converted_totals:
+                    self.converted_balance = self.converted_totals[-1]
+        self._formatted = [None] * len(rows)
+        self._pending = len(rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        # Reading all the rows formats all of them, once.
+        if self._pending:
+            formatted = self._formatted
+            for index, row in enumerate(formatted):
+                if row is None:
+                    formatted[index] = self.format_row(index)
+            self._pending = 0
+        return iter(self._formatted)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.rows)))]
+        formatted = self._formatted[index]
+        if formatted is None:
+            formatted = self._formatted[index] = self.format_row(index)
+            self._pending -= 1
+        return formatted
+
+    def format_row(self, index):
+        """Format the row with the given index."""
+        row = self.rows[index]
+        units = row[4].units
+        currency = units.currency
+        formatted = [row[0], row[1], row[2], row[3], format_amount(units.number, currency)]
+        if self.totals is not None:
+            formatted.append(format_amount(self.totals[index], currency))
+        if self.exchange:
+            converted = row[5]
+            formatted.append(format_amount(converted.number, converted.currency))
+            if self.converted_totals is not None:
+                formatted.append(
+                    format_amount(self.converted_totals[index], self.exchange)
+                )
+        return formatted
+
+
+def format_output(output: list, args) -> Sequence:
+    """
+    Formats the raw output from the BQL query into a pretty-printable
+    sequence of rows. The rows are formatted as they are read.
+    """
+    return RegisterRows(output, args.exchange, args.total, *(args.opening or ()))
+
+
+def format_windows(windows, args):
+    """
+    Format the rows of a register which is read window by window, carrying
+    the running totals from each window to the next. Yields the rows.
+    """
+    balances = {}
+    converted_balance = ZERO
+    for rows in windows:
+        formatted = RegisterRows(rows, args.exchange, args.total, balances, converted_balance)
+        converted_balance = formatted.converted_balance
+        yield from formatted
+
+
+def opening_balances(ledger, args, start):
+    """
+    The running totals of the register before the entry at position start,
+    from a single aggregate query on the earlier entries.
+    Returns the balances by currency and the converted balance.
+    """
+    targets = "currency, sum(number)"
+    if args.exchange:
+        targets += f", sum(convert(position, '{args.exchange}'))"
+    query = f"SELECT {targets}"
+    where_clauses = get_where_clauses(args)
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+    query += " GROUP BY currency"
+    logger.debug("Opening balance query: {}", query)
+
+    _, rows = ledger.execute(query, window=(0, start))
+    balances = {row[0]: row[1] for row in rows}
+    converted_balance = ZERO
+    if args.exchange:
+        for row in rows:
+            converted_balance += row[2].get_currency_units(args.exchange).number
+    return balances, converted_balance
+
+
+def run_tail_query(query, book, args, use_cache=True):
+    """
+    Run the register query for the last args.tail postings only. The
+    postings are read from the last entries back, and the running totals
+    before them are computed by an aggregate query rather than by reading
+    the whole history. On a query daemon, the whole register is queried.
+    Returns the columns and the rows.
+    """
+    if daemon.is_daemon_running(book):
+        start = 0
+        columns, rows = run_bql_query_with_columns(query, book, use_cache)
+    else:
+        ledger = get_ledger(book)
+        start, columns, rows = ledger.tail(query, args.tail)
+    before, rows = rows[: -args.tail], rows[-args.tail :]
+
+    if args.total:
+        balances, converted_balance = {}, ZERO
+        if start:
+            balances, converted_balance = opening_balances(ledger, args, start)
+        # Add the postings read before the last ones to the opening totals.
+        carried = RegisterRows(before, args.exchange, True, balances, converted_balance)
+        args.opening = carried.balances, carried.converted_balance
+    return columns, rows
@@ -0,0 +1,144 @@
+"""
+Streaming table renderer.
+
+Produces the same layout as tabulate's "psql" format, but yields the table
+line by line instead of building one big string. The output can be handed to
+the pager as the rows are produced, and the memory use does not depend on the
+size of the report.
+
+Cells are rendered as text. Unlike tabulate, numeric-looking strings are not
+re-formatted.
+"""
+
+from collections.abc import Sequence
+from itertools import chain, islice
+
+try:
+    from wcwidth import wcswidth as _wcswidth  # optional wide-character support
+except ImportError:
+    _wcswidth = None
+
+# Extra width of the header cells, as in tabulate.
+MIN_PADDING = 2
+
+# Number of rows used to compute the column widths when the rows are not
+# available up front, i.e. when they come from a generator.
+SAMPLE_SIZE = 1000
+
+# Number of lines that are joined into one chunk of output.
+CHUNK_LINES = 500
+
+
+def _text(value):
+    """The text of a table cell."""
+    if value is None:
+        return ""
+    return f"{value}".strip()
+
+
+def _width(text):
+    if _wcswidth is not None:
+        width = _wcswidth(text)
+        if width >= 0:
+            return width
+    return len(text)
+
+
+def _pad(text, width, alignment):
+    padding = width - _width(text)
+    if padding <= 0:
+        return text
+    if alignment == "right":
+        return " " * padding + text
+    if alignment == "center":
+        left = padding // 2
+        return " " * left + text + " " * (padding - left)
+    return text + " " * padding
+
+
+def _format_row(cells, widths, alignments):
+    return (
+        "| "
+        + " | ".join(
+            _pad(cell, width, alignment)
+            for cell, width, alignment in zip(cells, widths, alignments)
+        )
+        + " |\n"
+    )
+
+
+def has_multiline_cells(rows):
+    """Multi-line cells are not supported by the streaming renderer."""
+    return any(
+        "\n" in cell
+        for row in rows
+        for cell in row
+        if isinstance(cell, str)
+    )
+
+
+def iter_table_lines(rows, headers, alignments, sample_size=SAMPLE_SIZE):
+    """
+    Yield the lines of a psql-style table.
+
+    When `rows` is a sequence, the column widths come from a first pass over
+    all the rows. Otherwise, they are computed from the first `sample_size`
+    rows, and a later, wider cell only widens its own row.
+    """
+    alignments = list(alignments) + ["left"] * (len(headers) - len(alignments))
+
+    if isinstance(rows, Sequence):
+        # The widths pass does not keep the cell texts, so that no copy of
+        # the table is held in memory.
+        sample = rows
+        rest = ()
+    else:
+        rows = iter(rows)
+        sample = list(islice(rows, sample_size))
+        rest = rows
+
+    widths = [_width(header) + MIN_PADDING for header in headers]
+    for row in sample:
+        for i, value in enumerate(row):
+            width = _width(_text(value))
+            if width > widths[i]:
+                widths[i] = width
+
+    yield "+" + "+".join("-" * (width + 2) for width in widths) + "+\n"
+    yield _format_row(headers, widths, alignments)
+    yield "|" + "+".join("-" * (width + 2) for width in widths) + "|\n"
+
+    for row in chain(sample, rest):
+        yield _format_row([_text(value) for value in row], widths, alignments)
+
+    yield "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+
+
+def iter_table_chunks(rows, headers, alignments, chunk_lines=CHUNK_LINES):
+    """Yield the table in chunks of several lines, for efficient output."""
+    lines = iter_table_lines(rows, headers, alignments)
+    while True:
+        chunk = "".join(islice(lines, chunk_lines))
+        if not chunk:
+            return
+        yield chunk
+
+
+def render_table(rows, headers, alignments):
+    """
+    Render the rows as a table. Returns an iterable of text chunks.
+    Tables with multi-line cells are rendered by tabulate.
+    """
+    if isinstance(rows, Sequence) and has_multiline_cells(rows):
+        from tabulate import tabulate
+
+        return [
+            tabulate(
+                rows,
+                headers=headers,
+                tablefmt="psql",
+                colalign=alignments,
+                disable_numparse=True,
+            )
+        ]
+    return iter_table_chunks(rows, headers, alignments)
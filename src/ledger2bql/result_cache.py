@@ -0,0 +1,280 @@
+"""
+Persistent on-disk cache of the query results.
+
+Dashboards and scripts run the same reports many times a day, while the
+ledger changes only a few times. The result of every query is stored in the
+cache directory, keyed by the normalized query text, the ledger file and the
+versions of the query engine. Like the ledger cache, each result carries the
+manifest of the ledger files, which is its fingerprint: the result is reused
+as long as none of the files changed. A hit skips both loading the ledger
+and running the query.
+
+The results are compressed pickles. The cache is bounded in size, and the
+least recently used results are evicted first.
+
+`ledger2bql cache stats` and `ledger2bql cache clear` show and clear the
+caches; --no-cache bypasses the result cache for a single command.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import zlib
+import click
+from . import profiling
+from .cache import (
+    build_manifest,
+    get_cache_dir,
+    is_cache_enabled,
+    is_manifest_current,
+)
+from .logging_utils import get_logger
+from .plan_cache import normalize_query
+
+logger = get_logger(__name__)
+
+# Bump this whenever the layout of the result files changes.
+RESULT_CACHE_FORMAT_VERSION = 2
+
+DEFAULT_RESULT_CACHE_SIZE_MB = 64
+
+# The query engine and the ledger parser define what a query returns.
+_VERSIONED_PACKAGES = ("ledger2bql", "beanquery", "beancount")
+
+_versions = None
+
+
+def get_result_cache_dir():
+    return os.path.join(get_cache_dir(), "results")
+
+
+def get_max_size():
+    """
+    The maximum size of the result cache, in bytes.
+    LEDGER2BQL_RESULT_CACHE_SIZE sets it in MB; 0 disables the result cache.
+    """
+    try:
+        size = float(
+            os.getenv("LEDGER2BQL_RESULT_CACHE_SIZE", DEFAULT_RESULT_CACHE_SIZE_MB)
+        )
+    except ValueError:
+        size = DEFAULT_RESULT_CACHE_SIZE_MB
+    return int(size * 1024 * 1024)
+
+
+def is_result_cache_enabled():
+    return is_cache_enabled() and get_max_size() > 0
+
+
+def _get_versions():
+    global _versions
+    if _versions is None:
+        from importlib.metadata import PackageNotFoundError, version
+
+        _versions = {}
+        for package in _VERSIONED_PACKAGES:
+            try:
+                _versions[package] = version(package)
+            except PackageNotFoundError:
+                _versions[package] = "local"
+    return _versions
+
+
+def get_result_path(query, book):
+    """Get the path of the cached result of the query on the given ledger file."""
+    key = json.dumps(
+        [
+            RESULT_CACHE_FORMAT_VERSION,
+            normalize_query(query),
+            os.path.abspath(book),
+            _get_versions(),
+        ],
+        sort_keys=True,
+    )
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(get_result_cache_dir(), f"{digest}.result")
+
+
+def read_result(query, book):
+    """
+    Read the cached result of the query.
+    Returns the (columns, rows) pair, or None on a cache miss.
+    """
+    result_path = get_result_path(query, book)
+    try:
+        with open(result_path, "rb") as file:
+            header = pickle.load(file)
+            if header.get("version") != RESULT_CACHE_FORMAT_VERSION:
+                return None
+            if not is_manifest_current(header["manifest"]):
+                logger.debug("Cached result is stale")
+                return None
+            result = pickle.loads(zlib.decompress(file.read()))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Could not read cached result {}: {}", result_path, e)
+        return None
+
+    # The modification time orders the results for the LRU eviction.
+    try:
+        os.utime(result_path)
+    except OSError:
+        pass
+    logger.debug("Loaded query result from cache {}", result_path)
+    return result
+
+
+def write_result(query, book, columns, rows, filenames):
+    """
+    Store the result of the query, with the manifest of the ledger files,
+    then evict the least recently used results over the size limit.
+    """
+    result_path = get_result_path(query, book)
+    header = {
+        "version": RESULT_CACHE_FORMAT_VERSION,
+        "manifest": build_manifest(filenames),
+    }
+
+    try:
+        # A result that cannot be stored, i.e. a value that cannot be
+        # pickled, is only not cached.
+        payload = zlib.compress(
+            pickle.dumps((columns, rows), protocol=pickle.HIGHEST_PROTOCOL), 1
+        )
+        os.makedirs(os.path.dirname(result_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(result_path))
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+                file.write(payload)
+            os.replace(tmp_path, result_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        logger.warning("Could not write cached result {}: {}", result_path, e)
+        return
+
+    evict(get_max_size())
+
+
+def _result_files():
+    """The cached results, as (path, size, mtime), least recently used first."""
+    files = []
+    for path in glob.glob(os.path.join(get_result_cache_dir(), "*.result")):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((path, stat.st_size, stat.st_mtime_ns))
+    files.sort(key=lambda file: file[2])
+    return files
+
+
+def evict(max_size):
+    """Remove the least recently used results until the cache fits in max_size."""
+    files = _result_files()
+    total = sum(size for _, size, _ in files)
+    for path, size, _ in files:
+        if total <= max_size:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        logger.debug("Evicted cached result {}", path)
+
+
+def run_cached(query, book, run_query):
+    """
+    Get the result of the query from the cache, or run it with
+    run_query(query, book), which returns the (columns, rows, filenames)
+    of the result, and store it. A result without filenames is not stored.
+    Returns the (columns, rows) pair.
+    """
+    result = read_result(query, book)
+    if result is not None:
+        profiling.count("result cache hits")
+        return result
+
+    profiling.count("result cache misses")
+    columns, rows, filenames = run_query(query, book)
+    if filenames:
+        write_result(query, book, columns, rows, filenames)
+    return columns, rows
+
+
+def get_cache_stats():
+    """The number of files and the size of each kind of cache."""
+
+    def summarize(paths):
+        sizes = [os.path.getsize(path) for path in paths if os.path.exists(path)]
+        return {"files": len(sizes), "size": sum(sizes)}
+
+    cache_dir = get_cache_dir()
+    return {
+        "directory": cache_dir,
+        "ledgers": summarize(glob.glob(os.path.join(cache_dir, "*.ledger.pickle"))),
+        "parsed files": summarize(glob.glob(os.path.join(cache_dir, "*.parse.pickle"))),
+        "snapshots": summarize(glob.glob(os.path.join(cache_dir, "*.snapshots.pickle"))),
+        "results": summarize(glob.glob(os.path.join(get_result_cache_dir(), "*.result"))),
+        "result limit": get_max_size(),
+    }
+
+
+def clear_cache(results_only=False):
+    """Remove the cached files. Returns the number of files removed."""
+    cache_dir = get_cache_dir()
+    patterns = [os.path.join(get_result_cache_dir(), "*.result")]
+    if not results_only:
+        patterns += [
+            os.path.join(cache_dir, "*.ledger.pickle"),
+            os.path.join(cache_dir, "*.parse.pickle"),
+            os.path.join(cache_dir, "*.snapshots.pickle"),
+        ]
+    removed = 0
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            removed += 1
+    return removed
+
+
+def _format_size(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+@click.group(name="cache", short_help="Show or clear the caches")
+def cache_command():
+    """Show or clear the ledger, parse, balance snapshot and query result caches."""
+
+
+@cache_command.command(name="stats")
+def stats_command():
+    """Show the number of files and the size of each cache."""
+    stats = get_cache_stats()
+    click.echo(f"Cache directory: {stats['directory']}")
+    for name in ("ledgers", "parsed files", "snapshots", "results"):
+        click.echo(
+            f"{name.capitalize() + ':':<14}{stats[name]['files']:>6} files"
+            f"{_format_size(stats[name]['size']):>12}"
+        )
+    click.echo(f"Result cache limit: {_format_size(stats['result limit'])}")
+
+
+@cache_command.command(name="clear")
+@click.option(
+    "--results", "results_only", is_flag=True, help="Clear only the query results."
+)
+def clear_command(results_only):
+    """Remove the cached ledgers, parsed files, balance snapshots and query results."""
+    removed = clear_cache(results_only)
+    click.echo(f"Removed {removed} cached files.")
@@ -0,0 +1,303 @@
+"""
+Monthly balance snapshots, to answer the balances at a date without summing
+the whole history.
+
+`bal --end 2025-06` sums every posting from the beginning of the ledger up
+to the end date, and a month-end workflow runs it for every month. The
+balances of every account at the start of every month are computed once,
+in a single pass over the ledger, and stored next to the ledger cache. A
+balance query with only an end date then runs on one summary entry, which
+holds the balances at the start of the month of the end date, followed by
+the entries of that month up to the end date only.
+
+The summary entry has one posting per position of the inventory of each
+account, so that the query engine sums, converts and filters them exactly
+as the postings they replace: the accounts come in the order of their first
+posting, and the positions in the order of the inventories. An account
+whose postings in a currency add up to zero gets a zero posting in that
+currency, so that it is still listed.
+
+Only the queries which depend on nothing but the account, the currency and
+the sum of the positions are answered from the snapshots.
+"""
+
+import datetime
+import hashlib
+import os
+import pickle
+import tempfile
+from bisect import bisect_right
+from decimal import Decimal
+from .cache import (
+    build_manifest,
+    get_cache_dir,
+    is_cache_enabled,
+    is_manifest_current,
+)
+from .logging_utils import get_logger
+from .profiling import stage
+
+logger = get_logger(__name__)
+
+# Bump this whenever the layout of the snapshot files changes.
+SNAPSHOT_FORMAT_VERSION = 2
+
+# The columns and functions of the queries answered from the snapshots.
+SNAPSHOT_COLUMNS = {"account", "position"}
+SNAPSHOT_FILTER_COLUMNS = {"account", "currency"}
+SNAPSHOT_FUNCTIONS = {"sum", "units", "convert", "cost"}
+
+
+def is_snapshots_enabled():
+    """
+    The snapshots are stored with the ledger cache, and can be switched off
+    with the LEDGER2BQL_DISABLE_SNAPSHOTS variable.
+    """
+    return is_cache_enabled() and not os.getenv("LEDGER2BQL_DISABLE_SNAPSHOTS")
+
+
+def month_after(date):
+    """The first day of the month after the given date."""
+    if date.month == 12:
+        return datetime.date(date.year + 1, 1, 1)
+    return datetime.date(date.year, date.month + 1, 1)
+
+
+class BalanceSnapshots:
+    """The postings which sum up to the balances at the start of each month."""
+
+    __slots__ = ("months", "postings")
+
+    def __init__(self, months, postings):
+        # The first days of the months, and the postings before each of them.
+        self.months = months
+        self.postings = postings
+
+    @classmethod
+    def build(cls, entries):
+        """Compute the snapshots of the date-sorted entries, in one pass."""
+        from beancount.core import data
+        from beancount.core.inventory import Inventory
+        from beancount.core.position import Position
+
+        # The accounts are kept in the order of their first posting.
+        inventories = {}
+        currencies = {}
+        months = []
+        postings = []
+        snapshot = ()
+        changed = False
+        next_month = None
+
+        def take_snapshot():
+            snapshot = []
+            zero = Decimal(0)
+            for account, inventory in inventories.items():
+                for position in inventory:
+                    snapshot.append(
+                        data.Posting(account, position.units, position.cost, None, None, None)
+                    )
+                held = {position.units.currency for position in inventory}
+                for currency in currencies[account]:
+                    if currency not in held:
+                        snapshot.append(
+                            data.Posting(
+                                account,
+                                data.Amount(zero, currency),
+                                None,
+                                None,
+                                None,
+                                None,
+                            )
+                        )
+            return tuple(snapshot)
+
+        for entry in entries:
+            if not isinstance(entry, data.Transaction):
+                continue
+            if next_month is None:
+                next_month = month_after(entry.date)
+            while entry.date >= next_month:
+                if changed:
+                    snapshot = take_snapshot()
+                    changed = False
+                months.append(next_month)
+                postings.append(snapshot)
+                next_month = month_after(next_month)
+
+            for posting in entry.postings:
+                inventory = inventories.get(posting.account)
+                if inventory is None:
+                    inventory = inventories[posting.account] = Inventory()
+                    currencies[posting.account] = {}
+                inventory.add_position(Position(posting.units, posting.cost))
+                currencies[posting.account][posting.units.currency] = None
+                changed = True
+
+        if next_month is not None:
+            # The balances after the last entry.
+            months.append(next_month)
+            postings.append(take_snapshot() if changed else snapshot)
+
+        return cls(months, postings)
+
+    def find(self, end):
+        """
+        The latest snapshot at or before the end date, as the first day of
+        its month and the summary entry of the balances before that day, or
+        None when the end date is before the first snapshot.
+        """
+        from beancount.core import data, flags
+
+        index = bisect_right(self.months, end) - 1
+        if index < 0:
+            return None
+        month = self.months[index]
+        entry = data.Transaction(
+            data.new_metadata("<snapshot>", 0),
+            month - datetime.timedelta(days=1),
+            flags.FLAG_SUMMARIZE,
+            None,
+            f"Balances before {month}",
+            frozenset(),
+            frozenset(),
+            list(self.postings[index]),
+        )
+        return month, entry
+
+
+def query_snapshot_end(statement):
+    """
+    Check that a parsed query can be answered from the snapshots: it sums
+    the positions by account, and its WHERE clause has only an end date
+    and conditions on the account and the currency.
+    Returns the end date, as date < end, or None.
+    """
+    from beanquery.parser import ast
+    from .date_index import can_prune, conjuncts, date_value
+
+    if not can_prune(statement) or not isinstance(statement.targets, list):
+        return None
+    if statement.pivot_by is not None:
+        return None
+
+    end = None
+    for condition in conjuncts(statement.where_clause):
+        columns = {
+            node.name for node in condition.walk() if isinstance(node, ast.Column)
+        }
+        if "date" not in columns:
+            if not columns <= SNAPSHOT_FILTER_COLUMNS or any(
+                isinstance(node, ast.Function) for node in condition.walk()
+            ):
+                return None
+            continue
+        if not isinstance(condition, (ast.Less, ast.LessEq)):
+            return None
+        if not (isinstance(condition.left, ast.Column) and condition.left.name == "date"):
+            return None
+        value = date_value(condition.right)
+        if value is None:
+            return None
+        if isinstance(condition, ast.LessEq):
+            value += datetime.timedelta(days=1)
+        end = value if end is None else min(end, value)
+    if end is None:
+        return None
+
+    # The targets, groups and order depend only on the account and on sums
+    # of the positions.
+    names = {target.name for target in statement.targets if target.name}
+    nodes = [
+        node
+        for part in (statement.targets, statement.group_by, statement.order_by)
+        for node in ast.walk(part)
+    ]
+    summed = set()
+    for node in nodes:
+        if isinstance(node, ast.Function):
+            if node.fname not in SNAPSHOT_FUNCTIONS:
+                return None
+            if node.fname == "sum":
+                summed.update(id(child) for child in node.walk())
+        elif isinstance(node, ast.Column):
+            if node.name not in SNAPSHOT_COLUMNS and node.name not in names:
+                return None
+    if not summed:
+        return None
+    for node in nodes:
+        if isinstance(node, ast.Column) and node.name == "position":
+            if id(node) not in summed:
+                return None
+    return end
+
+
+def get_snapshot_path(book):
+    """Get the path of the snapshot file for the given ledger file."""
+    digest = hashlib.sha256(os.path.abspath(book).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(get_cache_dir(), f"{digest}.snapshots.pickle")
+
+
+def read_snapshots(book):
+    """Read the stored snapshots of the ledger, or None on a cache miss."""
+    cache_path = get_snapshot_path(book)
+    if not os.path.exists(cache_path):
+        return None
+
+    try:
+        with open(cache_path, "rb") as file:
+            header = pickle.load(file)
+            if header.get("version") != SNAPSHOT_FORMAT_VERSION:
+                return None
+            if header.get("book") != os.path.abspath(book):
+                return None
+            if not is_manifest_current(header["manifest"]):
+                logger.debug("Balance snapshots are stale")
+                return None
+            months, postings = pickle.load(file)
+    except Exception as e:
+        logger.warning("Could not read balance snapshots {}: {}", cache_path, e)
+        return None
+    return BalanceSnapshots(months, postings)
+
+
+def write_snapshots(book, snapshots, filenames):
+    """Store the snapshots of the ledger, valid as long as its files do not change."""
+    cache_path = get_snapshot_path(book)
+    header = {
+        "version": SNAPSHOT_FORMAT_VERSION,
+        "book": os.path.abspath(book),
+        "manifest": build_manifest(filenames),
+    }
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path))
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(
+                    (snapshots.months, snapshots.postings),
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        logger.warning("Could not write balance snapshots {}: {}", cache_path, e)
+
+
+def get_snapshots(ledger):
+    """Get the snapshots of a loaded ledger, from the cache or built anew."""
+    snapshots = read_snapshots(ledger.book)
+    if snapshots is not None:
+        logger.debug("Loaded balance snapshots of {}", ledger.book)
+        return snapshots
+
+    with stage("snapshots"):
+        snapshots = BalanceSnapshots.build(ledger.entries)
+    logger.debug("Built {} balance snapshots of {}", len(snapshots.months), ledger.book)
+    write_snapshots(ledger.book, snapshots, ledger.options_map["include"])
+    return snapshots
@@ -4,20 +4,50 @@ Shared utilities.
 
 import os
 import re
+import sys
+import threading
+from contextlib import contextmanager
 from decimal import Decimal
-import beanquery
-from tabulate import tabulate
+from itertools import chain
 import click
+from . import daemon
+from .ledger import get_ledger
 from .logging_utils import get_logger
+from . import profiling, result_cache
+from .export import OUTPUT_FORMATS, export_rows
+from .render import render_table
 
 # Use get_logger() which will return a null logger if logging is not enabled
 logger = get_logger(__name__)
 
+# The number of entries read at once by an interactively paged report.
+DEFAULT_PAGE_SIZE = 2000
+
+# The output stream of the report running in this thread, i.e. a file of the
+# batch mode. The reports are written to stdout when it is not set.
+_output = threading.local()
+
+
+def get_output_stream():
+    """The output stream of the current thread, or None for stdout."""
+    return getattr(_output, "stream", None)
+
+
+@contextmanager
+def redirect_output(stream):
+    """Write the reports run by the current thread to the given text stream."""
+    previous = get_output_stream()
+    _output.stream = stream
+    try:
+        yield stream
+    finally:
+        _output.stream = previous
+
 
 def get_beancount_file_path():
     """Get the path to the beancount file from environment variable."""
     beancount_file = os.getenv("BEANCOUNT_FILE")
-    logger.debug(f"BEANCOUNT_FILE from environment: {beancount_file}")
+    logger.debug("BEANCOUNT_FILE from environment: {}", beancount_file)
     
     if not beancount_file:
         logger.error("BEANCOUNT_FILE environment variable not set.")
@@ -25,10 +55,10 @@ def get_beancount_file_path():
     
     # Check if file exists
     if not os.path.exists(beancount_file):
-        logger.error(f"Beancount file not found: {beancount_file}")
+        logger.error("Beancount file not found: {}", beancount_file)
         raise FileNotFoundError(f"Beancount file not found: {beancount_file}")
     
-    logger.debug(f"Using beancount file: {beancount_file}")
+    logger.debug("Using beancount file: {}", beancount_file)
     return beancount_file
 
 
@@ -216,30 +246,81 @@ def add_common_click_arguments(func):
     func = click.option(
         "--no-pager", is_flag=True, help="Disable automatic paging of output."
     )(func)
+    func = no_cache_option(func)
+    func = output_format_option(func)
     return func
 
 
-def run_bql_query(query: str, book: str) -> list:
+def no_cache_option(func):
+    """Decorator to add the --no-cache option to a Click command."""
+    return click.option(
+        "--no-cache",
+        is_flag=True,
+        help="Run the query, instead of reusing the cached result of the same report.",
+    )(func)
+
+
+def output_format_option(func):
+    """Decorator to add the --output-format option to a Click command."""
+    return click.option(
+        "--output-format",
+        "-o",
+        type=click.Choice(OUTPUT_FORMATS, case_sensitive=False),
+        help="Write the raw query results in a machine-readable format, instead of a table.",
+    )(func)
+
+
+def run_bql_query(query: str, book: str, use_cache: bool = True) -> list:
     """
     Run the BQL query and return results
     book: Path to beancount file.
+    use_cache: Reuse the cached result of the same query, when it is current.
+    """
+    _, rows = run_bql_query_with_columns(query, book, use_cache)
+    return rows
+
+
+def _execute_query(query: str, book: str) -> tuple:
     """
-    logger.debug(f"Running BQL query: {query}")
-    logger.debug(f"Using beancount file: {book}")
+    Run the BQL query, on the query daemon or on the loaded ledger.
+    Returns the columns, the rows and the ledger files the result depends
+    on, or None for the latter when the daemon ran the query.
+    """
+    # Use the query daemon, if one is running for this ledger.
+    with profiling.stage("daemon"):
+        result = daemon.execute_query(query, book)
+    if result is not None:
+        return result[0], result[1], None
+
+    # Run the query on the already loaded ledger. The ledger is
+    # shared with the other stages of the command, i.e. query lookup.
+    ledger = get_ledger(book)
+    columns, rows = ledger.execute(query)
+    return columns, rows, ledger.options_map["include"]
+
+
+def run_bql_query_with_columns(query: str, book: str, use_cache: bool = True) -> tuple:
+    """
+    Run the BQL query and return the result columns, as (name, datatype)
+    tuples, and the rows.
+    book: Path to beancount file.
+    use_cache: Reuse the cached result of the same query, when it is current.
+    """
+    logger.debug("Running BQL query: {}", query)
+    logger.debug("Using beancount file: {}", book)
     
     try:
-        # Create the connection. Pre-load the beanquery data.
-        connection = beanquery.connect("beancount:" + book)
+        if use_cache and result_cache.is_result_cache_enabled():
+            result = result_cache.run_cached(query, book, _execute_query)
+        else:
+            columns, rows, _ = _execute_query(query, book)
+            result = columns, rows
 
-        # Run the query
-        cursor = connection.execute(query)
-        result = cursor.fetchall()
-        
-        logger.debug(f"Query returned {len(result)} records")
+        logger.debug("Query returned {} records", len(result[1]))
         return result
         
     except Exception as e:
-        logger.error(f"Error executing BQL query: {e}")
+        logger.error("Error executing BQL query: {}", e)
         raise
 
 
@@ -297,7 +378,27 @@ def execute_bql_command(
     # Print the BQL query
     print(f"\nYour BQL query is:\n{query}\n")
 
-    # Determine headers and alignments for the table based on args
+    add_report_columns(headers, alignments, args, command_type)
+
+    # Generate the table output
+    from tabulate import tabulate
+
+    table_output = tabulate(
+        formatted_output, headers=headers, tablefmt="psql", colalign=alignments
+    )
+
+    # Use pager unless explicitly disabled with --no-pager
+    use_pager = not getattr(args, "no_pager", False)
+
+    # With UTF-8 encoding configured globally, we can simplify output handling
+    if use_pager:
+        click.echo_via_pager(table_output)
+    else:
+        click.echo(table_output)
+
+
+def add_report_columns(headers, alignments, args, command_type):
+    """Add the headers and alignments of the columns requested by the options."""
     # For register command with --total, add a Running Total column
     if hasattr(args, "total") and args.total and command_type == "reg":
         headers.append("Running Total")
@@ -316,30 +417,59 @@ def execute_bql_command(
                 headers.append(f"Total ({args.exchange})")
                 alignments.append("right")
 
-    # Generate the table output
-    table_output = tabulate(
-        formatted_output, headers=headers, tablefmt="psql", colalign=alignments
-    )
 
-    # Use pager unless explicitly disabled with --no-pager
-    use_pager = not getattr(args, "no_pager", False)
+def get_page_size():
+    """
+    The number of entries of each window of an interactively paged report.
+    LEDGER2BQL_PAGE_SIZE sets it; 0 reads the whole report at once.
+    """
+    try:
+        return int(os.getenv("LEDGER2BQL_PAGE_SIZE", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
 
-    # With UTF-8 encoding configured globally, we can simplify output handling
-    if use_pager:
-        click.echo_via_pager(table_output)
-    else:
-        click.echo(table_output)
+
+def is_interactive():
+    """Check that the output goes to a terminal, where the pager is shown."""
+    return sys.stdout.isatty()
+
+
+def can_page_in_windows(args, book):
+    """
+    Check that the report can be read window by window while it is paged:
+    the pager is shown on a terminal, and the ledger is loaded here rather
+    than queried on a daemon.
+    """
+    return (
+        not getattr(args, "no_pager", False)
+        and get_output_stream() is None
+        and get_page_size() > 0
+        and is_interactive()
+        and not daemon.is_daemon_running(book)
+    )
 
 
 def execute_bql_command_with_click(
-    parse_query_func, format_output_func, headers, alignments, args, command_type=None
+    parse_query_func,
+    format_output_func,
+    headers,
+    alignments,
+    args,
+    command_type=None,
+    format_windows_func=None,
+    run_query_func=None,
 ):
     """
     Executes a BQL command with Click arguments, constructing a query, running it,
     and formatting output.
+    format_windows_func: formats the rows of the query read window by window,
+    i.e. for a register shown in the pager. Returns an iterable of rows.
+    run_query_func: runs the query in place of run_bql_query_with_columns,
+    i.e. on part of the ledger only, with the query, the book, the args and
+    use_cache. Returns the columns and the rows.
     """
-    logger.debug(f"Executing command: {command_type}")
-    logger.debug(f"Command arguments: {vars(args)}")
+    logger.debug("Executing command: {}", command_type)
+    logger.debug("Command arguments: {!r}", args)
     
     # Process the currency argument
     if hasattr(args, "currency") and args.currency:
@@ -356,56 +486,96 @@ def execute_bql_command_with_click(
     book = get_beancount_file_path()
 
     query = parse_query_func(args)
-    logger.debug(f"Generated BQL query: {query}")
-    
-    output = run_bql_query(query, book)
-    logger.debug(f"Raw query results: {len(output)} rows")
+    logger.debug("Generated BQL query: {}", query)
+    use_cache = not getattr(args, "no_cache", False)
+
+    def run_query():
+        if run_query_func is not None:
+            return run_query_func(query, book, args, use_cache)
+        return run_bql_query_with_columns(query, book, use_cache)
+
+    # Machine-readable output bypasses the formatting and the table.
+    output_format = getattr(args, "output_format", None)
+    if output_format:
+        if getattr(args, "amount_filters", None):
+            raise click.UsageError(
+                "The --amount filter of the balance report cannot be used with --output-format."
+            )
+        columns, output = run_query()
+        output_format = output_format.lower()
+        stream = get_output_stream()
+        if stream is not None and output_format in ("arrow", "parquet"):
+            stream.flush()
+            stream = stream.buffer
+        with profiling.stage("export"):
+            export_rows(columns, output, output_format, stream)
+        return
 
-    # Pass kwargs to format_output_func
-    formatted_output = format_output_func(output, args)
-    logger.debug(f"Formatted output: {len(formatted_output)} rows")
+    stream = get_output_stream()
+    if (
+        format_windows_func is not None
+        and run_query_func is None
+        and can_page_in_windows(args, book)
+    ):
+        # The pager shows the first rows of the report as soon as they are
+        # read, and the next windows are read as the user scrolls.
+        windows = get_ledger(book).windows(query, get_page_size())
+        windows = (rows for rows in windows if rows)
+        first = next(windows, None)
+        formatted_output = (
+            format_windows_func(chain([first], windows), args) if first else None
+        )
+    else:
+        _, output = run_query()
+        logger.debug("Raw query results: {} rows", len(output))
+
+        # Pass kwargs to format_output_func
+        with profiling.stage("format"):
+            formatted_output = format_output_func(output, args)
+        logger.debug("Formatted output: {} rows", lambda: len(formatted_output))
 
     if not formatted_output:  # Handle empty output
         logger.warning("No records found after formatting")
-        click.echo("No records found.")
+        click.echo("No records found.", file=stream)
         return
 
     # Display the actual query name if it's different from the provided one
-    if hasattr(args, "actual_query_name") and args.actual_query_name != args.query_name:
-        click.echo(f"Running query: {args.actual_query_name}")
+    if args.actual_query_name and args.actual_query_name != args.query_name:
+        click.echo(f"Running query: {args.actual_query_name}", file=stream)
 
     # Print the BQL query
-    click.echo(f"\nYour BQL query is:\n{query}\n")
-
-    # Determine headers and alignments for the table based on args
-    # For register command with --total, add a Running Total column
-    if hasattr(args, "total") and args.total and command_type == "reg":
-        headers.append("Running Total")
-        alignments.append("right")
-
-    # For commands with --exchange, add a Converted column
-    if hasattr(args, "exchange") and args.exchange:
-        if command_type == "bal":
-            headers.append(f"Total ({args.exchange})")
-            alignments.append("right")
-        elif command_type == "reg":
-            headers.append(f"Amount ({args.exchange})")
-            alignments.append("right")
-            # If total is also requested, add a converted total column
-            if hasattr(args, "total") and args.total:
-                headers.append(f"Total ({args.exchange})")
-                alignments.append("right")
+    click.echo(f"\nYour BQL query is:\n{query}\n", file=stream)
 
-    # Generate the table output
-    table_output = tabulate(
-        formatted_output, headers=headers, tablefmt="psql", colalign=alignments
-    )
+    add_report_columns(headers, alignments, args, command_type)
 
-    # Use pager unless explicitly disabled with --no-pager
-    use_pager = not getattr(args, "no_pager", False)
+    # Generate the table output. Named queries have no headers and are
+    # rendered by tabulate. The other reports are streamed to the output,
+    # chunk by chunk, without building the whole table in memory first.
+    with profiling.stage("render"):
+        if headers:
+            table_output = render_table(formatted_output, headers, alignments)
+        else:
+            from tabulate import tabulate
+
+            table_output = [
+                tabulate(
+                    formatted_output, headers=headers, tablefmt="psql", colalign=alignments
+                )
+            ]
+        if profiling.is_profiling():
+            # The table is rendered lazily, while it is written. Render it
+            # up front, so that the time is not counted as output time.
+            table_output = list(table_output)
+
+    # Use pager unless explicitly disabled with --no-pager, or the report
+    # is written to a file.
+    use_pager = not getattr(args, "no_pager", False) and stream is None
 
     # With UTF-8 encoding configured globally, we can simplify output handling
-    if use_pager:
-        click.echo_via_pager(table_output)
-    else:
-        click.echo(table_output)
\ No newline at end of file
+    with profiling.stage("pager" if use_pager else "output"):
+        if use_pager:
+            click.echo_via_pager(table_output)
+        else:
+            for chunk in table_output:
+                click.echo(chunk, nl=False, file=stream)
+            click.echo(file=stream)
\ No newline at end of file
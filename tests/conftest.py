@@ -0,0 +1,37 @@
+"""
+Shared test setup.
+"""
+
+import os
+
+import pytest
+
+from ledger2bql import ledger
+
+SAMPLE_LEDGER = os.path.join(os.path.dirname(__file__), "sample_ledger.bean")
+
+
+@pytest.fixture(autouse=True)
+def isolated_environment(tmp_path, monkeypatch):
+    """
+    Keep the caches in the temp directory of the test, away from the real
+    cache directory, and ignore a query daemon the developer may be running.
+    The cache, incremental and daemon tests override these where needed.
+    """
+    monkeypatch.setenv("LEDGER2BQL_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("LEDGER2BQL_NO_DAEMON", "1")
+
+
+@pytest.fixture
+def sample_env(monkeypatch):
+    """Run the commands on the sample ledger, loaded afresh, without the cache."""
+    monkeypatch.setenv("BEANCOUNT_FILE", SAMPLE_LEDGER)
+    monkeypatch.setenv("LEDGER2BQL_DISABLE_CACHE", "1")
+    monkeypatch.setattr(ledger, "_ledgers", {})
+    return SAMPLE_LEDGER
+
+
+@pytest.fixture
+def sample(sample_env):
+    """The loaded sample ledger."""
+    return ledger.get_ledger(sample_env)
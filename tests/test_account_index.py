@@ -0,0 +1,111 @@
+"""
+Tests for the account index, which prunes the queries on accounts.
+"""
+
+import beanquery
+import pytest
+
+from ledger2bql import account_index
+
+
+def accounts(sample, where):
+    statement = beanquery.connect("").parse(f"SELECT account WHERE {where}")
+    return account_index.query_accounts(statement, sample)
+
+
+def test_accounts_include_open_directives(sample):
+    index = sample.account_index
+    assert "Assets:Bank:Checking" in index.accounts
+    assert index.accounts == sorted(index.accounts)
+
+
+def test_anchored_and_exact_patterns(sample):
+    assert accounts(sample, "account ~ '^Assets:Bank'") == {
+        "Assets:Bank:Checking",
+        "Assets:Bank:Savings",
+        "Assets:Bank:Bank03581",
+    }
+    assert accounts(sample, "account ~ '^Expenses:Food$'") == {"Expenses:Food"}
+    assert accounts(sample, "account = 'Expenses:Food'") == {"Expenses:Food"}
+
+
+def test_patterns_are_case_insensitive(sample):
+    # Like the ~ operator of beanquery.
+    assert accounts(sample, "account ~ '^assets:bank:checking$'") == {
+        "Assets:Bank:Checking"
+    }
+
+
+def test_exclusions_and_combinations(sample):
+    all_accounts = set(sample.account_index.accounts)
+    expenses = {a for a in all_accounts if a.startswith("Expenses")}
+
+    assert accounts(sample, "NOT (account ~ 'Expenses')") == all_accounts - expenses
+    assert accounts(sample, "account !~ 'Expenses'") == all_accounts - expenses
+    assert accounts(
+        sample, "account ~ '^Expenses' AND NOT (account ~ 'Transport')"
+    ) == {"Expenses:Accommodation", "Expenses:Food", "Expenses:Sweets"}
+    assert accounts(sample, "account ~ 'Sweets' OR account ~ ':Bus$'") == {
+        "Expenses:Sweets",
+        "Expenses:Transport:Bus",
+    }
+
+
+def test_no_account_set_without_account_conditions(sample):
+    assert accounts(sample, "payee ~ 'Holiday'") is None
+    assert accounts(sample, "account ~ 'Food' OR payee ~ 'Holiday'") is None
+    # An invalid pattern is left for beanquery to report.
+    assert accounts(sample, "account ~ '('") is None
+
+
+def test_index_is_built_only_for_account_conditions(sample):
+    sample.execute("SELECT date, position WHERE payee ~ 'Holiday'")
+    assert sample._account_index is None
+
+    sample.execute("SELECT date, position WHERE account ~ 'Food'")
+    assert sample._account_index is not None
+
+
+def test_entry_positions_within_range(sample):
+    index = sample.account_index
+    positions = index.entry_positions({"Expenses:Food", "Expenses:Sweets"})
+
+    assert positions == sorted(set(positions))
+    assert all(
+        any(
+            posting.account in ("Expenses:Food", "Expenses:Sweets")
+            for posting in sample.entries[position].postings
+        )
+        for position in positions
+    )
+    assert index.entry_positions({"Expenses:Food"}, positions[1], positions[1]) == []
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT date, account, payee, narration, position "
+        "WHERE account ~ '^Assets:Bank' ORDER BY date, account",
+        "SELECT date, account, position WHERE account ~ 'exp' "
+        "AND NOT (account ~ 'food') AND date >= date(\"2025-06-01\")",
+        "SELECT account, sum(position) WHERE NOT (account ~ '^Equity') GROUP BY account",
+        "SELECT date, account, position, convert(position, 'EUR') "
+        "WHERE account ~ '^Assets:Bank:Bank03581$'",
+        "SELECT date, account WHERE account ~ 'Nothing:Like:This'",
+    ],
+)
+def test_indexed_query_matches_full_scan(sample, monkeypatch, query):
+    columns, rows = sample.execute(query)
+
+    monkeypatch.setattr(account_index, "query_accounts", lambda statement, ledger: None)
+    sample.plans.clear()
+    assert sample.execute(query) == (columns, rows)
+
+
+def test_view_feeds_only_the_postings_of_the_accounts(sample):
+    view = sample.view(accounts={"Expenses:Sweets"})
+    # The table reuses a single row object.
+    accounts = [row.posting.account for row in view.tables[None]]
+
+    assert accounts
+    assert set(accounts) == {"Expenses:Sweets"}
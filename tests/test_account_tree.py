@@ -0,0 +1,78 @@
+"""
+Tests for the account tree used by the balance report.
+"""
+
+from decimal import Decimal
+
+from ledger2bql.account_tree import AccountTree
+from tests.test_utils import run_bal_command, extract_table_data
+
+
+def test_tree_aggregates_subtree_totals():
+    tree = AccountTree()
+    tree.add("Assets:Bank:Checking", {"EUR": Decimal("100")})
+    tree.add("Assets:Bank:Savings", {"EUR": Decimal("50"), "CHF": Decimal("10")})
+    tree.add("Assets:Cash", {"USD": Decimal("-7")})
+    tree.add("Assets:Bank", {"BAM": Decimal("5")})
+    tree.aggregate()
+
+    assert list(tree.roots) == ["Assets"]
+    assert tree.nodes["Assets:Bank"].depth == 2
+    # Children first, then the account's own balance.
+    assert tree.nodes["Assets:Bank"].total == {
+        "EUR": Decimal("150"),
+        "CHF": Decimal("10"),
+        "BAM": Decimal("5"),
+    }
+    assert tree.nodes["Assets"].total == {
+        "EUR": Decimal("150"),
+        "CHF": Decimal("10"),
+        "BAM": Decimal("5"),
+        "USD": Decimal("-7"),
+    }
+    # Only the accounts with a balance, in the order they were added.
+    assert [node.name for node in tree.accounts] == [
+        "Assets:Bank:Checking",
+        "Assets:Bank:Savings",
+        "Assets:Cash",
+        "Assets:Bank",
+    ]
+
+
+def test_tree_aggregates_converted_totals():
+    tree = AccountTree()
+    tree.add("Assets:Bank", {"EUR": Decimal("10")}, Decimal("11"))
+    tree.add("Assets:Cash", {"EUR": Decimal("5")}, Decimal("5.5"))
+    tree.aggregate()
+
+    assert tree.nodes["Assets"].total_converted == Decimal("16.5")
+
+
+def test_tree_is_linear_in_deep_and_wide_trees():
+    tree = AccountTree()
+    for i in range(20000):
+        tree.add(f"Assets:Group{i % 100}:Account{i}", {"EUR": Decimal(1)})
+    tree.aggregate()
+
+    assert len(tree.nodes) == 1 + 100 + 20000
+    assert tree.nodes["Assets"].total == {"EUR": Decimal(20000)}
+    assert tree.nodes["Assets:Group7"].total == {"EUR": Decimal(200)}
+
+
+def test_bal_hierarchy_with_depth_does_not_double_count():
+    result = run_bal_command(["--hierarchy", "--depth", "2"])
+
+    assert result.exit_code == 0
+    table_output = "\n".join(extract_table_data(result.output.splitlines()))
+    assert (
+        "| Assets:Bank             |                      3,000.00 CHF 1,869.80 EUR |"
+        in table_output
+    )
+    assert "Assets:Bank:Checking" not in table_output
+
+
+def test_bal_hierarchy_zero_filter_with_exchange():
+    result = run_bal_command(["--hierarchy", "--zero", "--exchange", "EUR"])
+
+    assert result.exit_code == 0
+    assert "| Assets:Bank " in result.output
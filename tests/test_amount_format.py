@@ -0,0 +1,73 @@
+"""
+Tests for the shared amount formatters.
+"""
+
+import random
+from decimal import Decimal
+
+import pytest
+
+from ledger2bql.amount_format import (
+    amount_format,
+    format_amount,
+    format_number,
+    number_format,
+)
+
+EDGE_CASES = [
+    "0",
+    "-0",
+    "-0.00",
+    "0.001",
+    "-0.001",
+    "0.005",
+    "0.015",
+    "999.99",
+    "-999.99",
+    "999.995",
+    "1000",
+    "-1000.00",
+    "12",
+    "12.5",
+    "0.10000",
+    "1E+1",
+    "1E+3",
+    "1.2E-7",
+    "0E-10",
+    "123456789.1",
+    "NaN",
+    "Infinity",
+    "-Infinity",
+]
+
+
+def sample_numbers():
+    rng = random.Random(7)
+    numbers = [Decimal(case) for case in EDGE_CASES]
+    for _ in range(5000):
+        numbers.append(
+            Decimal(rng.randint(-(10**9), 10**9)).scaleb(rng.randint(-8, 2))
+        )
+    return numbers
+
+
+@pytest.mark.parametrize("places", [0, 2, 6])
+def test_same_output_as_str_format(places):
+    expected = "{:,.%df}" % places
+    formatter = number_format(places)
+    for number in sample_numbers():
+        assert formatter(number) == expected.format(number), number
+
+
+def test_amounts_and_other_number_types():
+    assert format_amount(Decimal("-45.00"), "EUR") == "-45.00 EUR"
+    assert format_amount(Decimal("3194.1"), "EUR") == "3,194.10 EUR"
+    assert amount_format(6)(Decimal("1.5"), "USD") == "1.500000 USD"
+    assert format_number(2) == "2.00"
+    assert format_number(1234.5) == "1,234.50"
+
+
+def test_formatters_are_shared():
+    assert number_format(2) is format_number
+    assert amount_format(2) is format_amount
+    assert amount_format(6) is amount_format(6)
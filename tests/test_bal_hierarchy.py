@@ -125,10 +125,10 @@ def test_bal_with_collapse_level_2():
 
     # Check that the accounts are collapsed to level 2
     assert (
-        "| Assets:Bank             |       3,000.00 CHF 1,869.80 EUR |" in table_output
+        "| Assets:Bank             |       1,869.80 EUR 3,000.00 CHF |" in table_output
     )
     assert (
-        "| Assets:Cash             | -25.00 BAM -45.00 EUR -7.00 USD |" in table_output
+        "| Assets:Cash             | -45.00 EUR -25.00 BAM -7.00 USD |" in table_output
     )  # Updated Pocket-Money balance
     assert (
         "| Equity:Opening-Balances |                   -1,000.00 EUR |" in table_output
@@ -172,7 +172,7 @@ def test_bal_with_collapse_level_1():
 
     # Check that the accounts are collapsed to level 1
     assert (
-        "| Assets    | 3,000.00 CHF 1,824.80 EUR -25.00 BAM -7.00 USD |" in table_output
+        "| Assets    | 1,824.80 EUR -25.00 BAM -7.00 USD 3,000.00 CHF |" in table_output
     )  # Updated total (1839.65 - 25 = 1814.65)
     assert (
         "| Equity    |                         -1,000.00 EUR 4.00 ABC |" in table_output
@@ -181,10 +181,29 @@ def test_bal_with_collapse_level_1():
         "| Expenses  |                  170.00 EUR 25.00 BAM 7.00 USD |" in table_output
     )  # Updated total (145 + 25 = 170)
     assert (
-        "| Income    |                    -3,000.00 CHF -1,000.00 EUR |" in table_output
+        "| Income    |                    -1,000.00 EUR -3,000.00 CHF |" in table_output
     )
 
     # Check that individual accounts are not present (they should be collapsed)
     assert "Assets:Bank:Checking" not in table_output
     assert "Assets:Cash:Pocket-Money" not in table_output
     assert "Expenses:Sweets" not in table_output
+
+
+def test_bal_depth_is_collapsed_by_the_query():
+    # Act
+    result = run_bal_command(["--depth", "2"])
+
+    # Assert
+    assert result.exit_code == 0
+    assert "SELECT root(account, 2) as account" in result.output
+    assert "GROUP BY account" in result.output
+
+
+def test_bal_hierarchy_depth_is_collapsed_in_python():
+    # Act
+    result = run_bal_command(["--hierarchy", "--depth", "2"])
+
+    # Assert
+    assert result.exit_code == 0
+    assert "root(account" not in result.output
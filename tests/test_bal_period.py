@@ -0,0 +1,103 @@
+"""
+Tests for the multi-period balance report, `bal --period`.
+"""
+
+import datetime
+
+import pytest
+from click.testing import CliRunner
+
+from ledger2bql.main import cli
+from ledger2bql.periods import next_period, period_label, period_start, period_starts
+from tests.test_utils import extract_table_data, extract_table_headers, split_table_row
+
+D = datetime.date
+
+pytestmark = pytest.mark.usefixtures("sample_env")
+
+
+def table(output):
+    """The headers and the cells of the rows of the report table."""
+    lines = output.splitlines()
+    rows = [split_table_row(line) for line in extract_table_data(lines)]
+    return extract_table_headers(lines), rows
+
+
+def bal(*options):
+    result = CliRunner().invoke(cli, ["bal", "--no-pager", "--no-cache", *options])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+@pytest.mark.parametrize(
+    "period, date, start, label",
+    [
+        ("daily", D(2025, 8, 15), D(2025, 8, 15), "2025-08-15"),
+        ("weekly", D(2025, 8, 15), D(2025, 8, 11), "2025-08-11"),
+        ("monthly", D(2025, 8, 15), D(2025, 8, 1), "2025-08"),
+        ("quarterly", D(2025, 8, 15), D(2025, 7, 1), "2025-Q3"),
+        ("yearly", D(2025, 8, 15), D(2025, 1, 1), "2025"),
+    ],
+)
+def test_period_start_and_label(period, date, start, label):
+    assert period_start(period, date) == start
+    assert period_label(period, start) == label
+    assert period_start(period, next_period(period, start)) == next_period(period, start)
+
+
+def test_period_starts():
+    assert period_starts("quarterly", D(2025, 2, 10), D(2026, 1, 1)) == [
+        D(2025, 1, 1),
+        D(2025, 4, 1),
+        D(2025, 7, 1),
+        D(2025, 10, 1),
+    ]
+    assert period_starts("monthly", D(2025, 12, 5), D(2026, 2, 1)) == [
+        D(2025, 12, 1),
+        D(2026, 1, 1),
+    ]
+
+
+@pytest.mark.parametrize("options", [[], ["-X", "EUR"], ["-D", "2"]])
+def test_each_month_matches_its_own_balance_report(options):
+    headers, rows = table(bal("--period", "monthly", *options))
+
+    assert headers[1:] == [f"2025-{month:02d}" for month in range(1, 10)]
+    for column, month in enumerate(headers[1:], start=1):
+        _, month_rows = table(bal("-d", month, *options))
+        column_index = 2 if options[:1] == ["-X"] else 1
+        expected = {row[0]: row[column_index] for row in month_rows}
+        actual = {row[0]: row[column] for row in rows if row[column]}
+        assert actual == expected, month
+
+
+def test_outer_bounds_from_the_date_range():
+    headers, rows = table(bal("--period", "quarterly", "-d", "2025", "Expenses"))
+
+    assert headers == ["Account", "2025-Q1", "2025-Q2", "2025-Q3", "2025-Q4"]
+    assert rows[0] == ["Expenses:Accommodation", "", "", "25.00 EUR", ""]
+
+
+def test_period_totals():
+    headers, rows = table(bal("--period", "yearly", "-T", "Expenses"))
+
+    assert headers == ["Account", "2025"]
+    assert rows[-2] == ["-------------------", "-------------------"]
+    assert rows[-1] == ["Total", "170.00 EUR 25.00 BAM 7.00 USD"]
+
+
+def test_accounts_are_sorted():
+    _, rows = table(bal("--period", "yearly", "-S", "-account", "Expenses"))
+
+    accounts = [row[0] for row in rows]
+    assert accounts == sorted(accounts, reverse=True)
+
+
+@pytest.mark.parametrize(
+    "options", [["-H"], ["--amount", ">10"], ["-S", "balance"]]
+)
+def test_unsupported_options_are_rejected(options):
+    result = CliRunner().invoke(cli, ["bal", "--period", "monthly", *options])
+
+    assert result.exit_code == 2
+    assert "--period" in result.output
@@ -0,0 +1,85 @@
+"""
+Tests for the batch mode, which runs many reports against one loaded ledger.
+"""
+
+import pytest
+from click.testing import CliRunner
+
+from ledger2bql import batch, ledger
+from ledger2bql.main import cli
+
+BATCH = """\
+# Nightly reports
+bal ^Assets -X EUR > assets.txt
+ledger2bql reg Expenses --total
+
+q holidays -o csv
+"""
+
+
+@pytest.fixture
+def run_batch(tmp_path, sample_env):
+
+    def run(text, *options):
+        return CliRunner().invoke(
+            cli, ["batch", "-d", str(tmp_path), *options], input=text
+        )
+
+    return run
+
+
+def test_split_line():
+    assert batch.split_line("bal Assets -X EUR > out.txt") == (
+        ["bal", "Assets", "-X", "EUR"],
+        "out.txt",
+    )
+    assert batch.split_line("ledger2bql reg -a '>50'") == (["reg", "-a", ">50"], None)
+    assert batch.split_line("  # comment") is None
+
+
+@pytest.mark.parametrize("workers", ["1", "3"])
+def test_reports_are_written_to_their_files(run_batch, tmp_path, monkeypatch, workers):
+    loads = []
+    load_ledger = ledger.load_ledger
+    monkeypatch.setattr(
+        ledger, "load_ledger", lambda book: loads.append(book) or load_ledger(book)
+    )
+
+    result = run_batch(BATCH, "--workers", workers)
+
+    assert result.exit_code == 0, result.output
+    assert len(loads) == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "03-reg.txt",
+        "05-query.csv",
+        "assets.txt",
+    ]
+    assets = (tmp_path / "assets.txt").read_text()
+    assert "Assets:Bank:Checking" in assets
+    assert "Total (EUR)" in assets
+    assert "Running Total" in (tmp_path / "03-reg.txt").read_text()
+    assert (tmp_path / "05-query.csv").read_text().startswith("date,flag,payee")
+
+
+def test_reports_match_the_single_commands(run_batch, tmp_path):
+    result = run_batch("bal -H > bal.txt\n")
+    assert result.exit_code == 0, result.output
+
+    single = CliRunner().invoke(cli, ["bal", "-H", "--no-pager"])
+    assert (tmp_path / "bal.txt").read_text() == single.output
+
+
+def test_invalid_line_stops_before_running(run_batch, tmp_path):
+    result = run_batch("bal\nbal --bogus\n")
+
+    assert result.exit_code == 2
+    assert "Line 2" in result.output
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_report_does_not_stop_the_others(run_batch, tmp_path):
+    result = run_batch("q nosuchquery\nbal\n")
+
+    assert result.exit_code == 1
+    assert "Line 1: Query 'nosuchquery' not found" in result.stderr
+    assert (tmp_path / "02-bal.txt").exists()
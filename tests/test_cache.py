@@ -0,0 +1,124 @@
+"""
+Tests for the on-disk ledger cache.
+"""
+
+import os
+import shutil
+
+import beancount.loader
+import pytest
+from click.testing import CliRunner
+
+from ledger2bql import cache, snapshots
+from ledger2bql import ledger as ledger_module
+from ledger2bql.main import cli
+
+SAMPLE_LEDGER = os.path.join(os.path.dirname(__file__), "sample_ledger.bean")
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    """A private copy of the sample ledger, with the cache in a temp directory."""
+    monkeypatch.delenv("LEDGER2BQL_DISABLE_CACHE", raising=False)
+    book = tmp_path / "ledger.bean"
+    shutil.copy(SAMPLE_LEDGER, book)
+    return str(book)
+
+
+def fail_load(*args, **kwargs):
+    raise AssertionError("The ledger should have been loaded from the cache.")
+
+
+def test_cache_is_written_and_reused(ledger, monkeypatch):
+    entries, errors, options_map = cache.load_ledger(ledger)
+    assert os.path.exists(cache.get_cache_path(ledger))
+
+    monkeypatch.setattr(beancount.loader, "load_file", fail_load)
+    cached_entries, cached_errors, cached_options = cache.load_ledger(ledger)
+
+    assert len(cached_entries) == len(entries)
+    assert cached_options["include"] == options_map["include"]
+
+
+def test_touched_file_keeps_cache(ledger, monkeypatch):
+    cache.load_ledger(ledger)
+    stat = os.stat(ledger)
+    os.utime(ledger, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    monkeypatch.setattr(beancount.loader, "load_file", fail_load)
+    entries, _, _ = cache.load_ledger(ledger)
+    assert entries
+
+
+def test_modified_file_invalidates_cache(ledger):
+    entries, _, _ = cache.load_ledger(ledger)
+
+    with open(ledger, "a", encoding="utf-8") as file:
+        file.write('\n2025-12-01 price ABC 1.50 EUR\n')
+
+    assert cache.read_cache(ledger) is None
+    new_entries, _, _ = cache.load_ledger(ledger)
+    assert len(new_entries) == len(entries) + 1
+
+
+def test_cache_can_be_disabled(ledger, monkeypatch):
+    monkeypatch.setenv("LEDGER2BQL_DISABLE_CACHE", "1")
+    cache.load_ledger(ledger)
+    assert not os.path.exists(cache.get_cache_path(ledger))
+
+
+@pytest.fixture
+def globbed(tmp_path, monkeypatch):
+    """A ledger which includes its transactions with a glob."""
+    monkeypatch.delenv("LEDGER2BQL_DISABLE_CACHE", raising=False)
+    monkeypatch.delenv("LEDGER2BQL_DISABLE_SNAPSHOTS", raising=False)
+    monkeypatch.setattr(ledger_module, "_ledgers", {})
+    book = tmp_path / "main.bean"
+    book.write_text(
+        '2020-01-01 open Assets:Cash\n'
+        '2020-01-01 open Expenses:Food\n'
+        'include "y/*.bean"\n',
+        encoding="utf-8",
+    )
+    (tmp_path / "y").mkdir()
+    add_year(tmp_path, 2020, "10.00")
+    monkeypatch.setenv("BEANCOUNT_FILE", str(book))
+    return str(book)
+
+
+def add_year(tmp_path, year, amount):
+    (tmp_path / "y" / f"{year}.bean").write_text(
+        f'{year}-03-01 * "Food"\n'
+        f"  Expenses:Food  {amount} EUR\n"
+        "  Assets:Cash\n",
+        encoding="utf-8",
+    )
+
+
+def cash_balance(*options):
+    result = CliRunner().invoke(cli, ["bal", "--no-pager", "Assets", *options])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_new_file_matching_an_include_glob_invalidates_cache(globbed, tmp_path):
+    entries, _, _ = cache.load_ledger(globbed)
+
+    add_year(tmp_path, 2021, "5.00")
+
+    assert cache.read_cache(globbed) is None
+    new_entries, _, _ = cache.load_ledger(globbed)
+    assert len(new_entries) == len(entries) + 1
+
+
+def test_new_file_matching_an_include_glob_reaches_the_reports(globbed, tmp_path):
+    assert "-10.00 EUR" in cash_balance()
+    assert "-10.00 EUR" in cash_balance("-e", "2030-01-01")
+    loaded = ledger_module.get_ledger(globbed)
+
+    add_year(tmp_path, 2021, "5.00")
+
+    assert not loaded.is_current()
+    assert snapshots.read_snapshots(globbed) is None
+    assert "-15.00 EUR" in cash_balance()
+    assert "-15.00 EUR" in cash_balance("-e", "2030-01-01")
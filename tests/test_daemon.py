@@ -0,0 +1,148 @@
+"""
+Tests for the query daemon and the client mode of the commands.
+"""
+
+import datetime
+import json
+import os
+import socket
+import threading
+from decimal import Decimal
+
+import pytest
+from beancount.core.amount import A
+from beancount.core.inventory import Inventory
+from beancount.core.position import Cost, Position
+
+from ledger2bql import daemon
+from ledger2bql.ledger import get_ledger
+from ledger2bql.utils import get_beancount_file_path
+from tests.test_utils import run_bal_command, extract_table_data
+
+pytestmark = pytest.mark.skipif(
+    not daemon.is_supported(), reason="Unix domain sockets are not available."
+)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """Run a query daemon for the sample ledger in a background thread."""
+    socket_path = str(tmp_path / "daemon.sock")
+    monkeypatch.setenv("LEDGER2BQL_SOCKET", socket_path)
+    monkeypatch.delenv("LEDGER2BQL_NO_DAEMON", raising=False)
+
+    server = daemon.QueryServer(get_beancount_file_path(), socket_path)
+    handled = []
+    original_handle = server.handle
+
+    def recording_handle(message):
+        handled.append(message["op"])
+        return original_handle(message)
+
+    server.handle = recording_handle
+    server.handled = handled
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    assert server.ready.wait(10)
+    yield server
+    server.shutdown()
+    thread.join(10)
+
+
+def test_bal_uses_running_daemon(server):
+    result = run_bal_command(["--no-pager", "--no-cache"])
+
+    assert result.exit_code == 0, result.output
+    assert server.handled == ["execute"]
+    table_output = "\n".join(extract_table_data(result.output.splitlines()))
+    assert "Assets:Cash:Pocket-Money" in table_output
+    assert "-45.00 EUR" in table_output
+
+
+def test_named_queries_from_daemon(server):
+    queries = daemon.get_named_queries(get_beancount_file_path())
+
+    assert ("holidays", "select * where payee ~ 'holiday' and account ~ 'expenses'") in [
+        (name, query.strip()) for name, query in queries
+    ]
+
+
+def test_no_daemon_falls_back(tmp_path, monkeypatch):
+    monkeypatch.setenv("LEDGER2BQL_SOCKET", str(tmp_path / "missing.sock"))
+
+    assert daemon.execute_query("SELECT account", get_beancount_file_path()) is None
+    result = run_bal_command(["--no-pager"])
+    assert result.exit_code == 0
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT date, account, position, cost(position), tags, number, meta",
+        "SELECT account, units(sum(position)), sum(position) GROUP BY account",
+    ],
+)
+def test_values_survive_the_wire_format(server, query):
+    book = get_beancount_file_path()
+
+    assert daemon.execute_query(query, book) == get_ledger(book).execute(query)
+
+
+def test_encoded_values_are_decoded_back():
+    cost = Cost(Decimal("1.50"), "EUR", datetime.date(2025, 1, 2), "lot")
+    position = Position(A("10 ABC"), cost)
+    values = [
+        Decimal("0.10"),
+        datetime.date(2025, 1, 2),
+        A("3.00 USD"),
+        position,
+        Inventory([position, Position(A("1 EUR"), None)]),
+        {"tag"},
+        {"filename": "x.bean", "lineno": 3},
+        Decimal,
+    ]
+
+    decoded = json.loads(
+        json.dumps(daemon.encode_value(values)), object_hook=daemon.decode_value
+    )
+    assert decoded == values
+
+
+def test_unknown_tags_are_rejected():
+    with pytest.raises(ValueError):
+        daemon.decode_value({"$": "pickle", "v": "..."})
+
+
+def test_open_socket_dir_is_refused(tmp_path, monkeypatch):
+    socket_dir = tmp_path / "shared"
+    socket_dir.mkdir(mode=0o777)
+    os.chmod(socket_dir, 0o777)
+    socket_path = str(socket_dir / "daemon.sock")
+    monkeypatch.setenv("LEDGER2BQL_SOCKET", socket_path)
+    monkeypatch.delenv("LEDGER2BQL_NO_DAEMON", raising=False)
+    open(socket_path, "w").close()
+
+    with pytest.raises(PermissionError):
+        daemon.check_socket_dir(str(socket_dir))
+    assert daemon.execute_query("SELECT account", get_beancount_file_path()) is None
+    with pytest.raises(PermissionError):
+        daemon.QueryServer(get_beancount_file_path(), socket_path).serve_forever()
+
+
+def test_symlinked_socket_dir_is_refused(tmp_path):
+    target = tmp_path / "target"
+    target.mkdir(mode=0o700)
+    link = tmp_path / "link"
+    link.symlink_to(target)
+
+    with pytest.raises(PermissionError):
+        daemon.check_socket_dir(str(link))
+
+
+def test_peer_of_the_same_user_is_accepted(server):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(server.socket_path)
+        daemon.check_peer(sock)
+        if hasattr(socket, "SO_PEERCRED"):
+            assert daemon.get_peer_uid(sock) == os.getuid()
@@ -0,0 +1,88 @@
+"""
+Tests for the date index, which prunes the queries with date bounds.
+"""
+
+import datetime
+
+import beanquery
+import pytest
+
+from ledger2bql import date_index
+from ledger2bql.date_index import DateIndex, query_date_bounds
+
+D = datetime.date
+
+
+def bounds(query):
+    return query_date_bounds(beanquery.connect("").parse(query))
+
+
+@pytest.mark.parametrize(
+    "where, expected",
+    [
+        ('date >= date("2025-08-01") AND date < date("2025-09-01")', (D(2025, 8, 1), D(2025, 9, 1))),
+        ("date > 2025-08-01 AND date <= 2025-08-31", (D(2025, 8, 2), D(2025, 9, 1))),
+        ("2025-08-01 <= date", (D(2025, 8, 1), None)),
+        ("date = 2025-08-15", (D(2025, 8, 15), D(2025, 8, 16))),
+        ("date < 2025-09-01 AND account ~ 'exp' AND date < 2025-08-01", (None, D(2025, 8, 1))),
+        ("date >= 2025-08-01 OR account ~ 'exp'", None),
+        ("account ~ 'exp'", None),
+        ("date >= date(year)", None),
+    ],
+)
+def test_query_date_bounds(where, expected):
+    assert bounds(f"SELECT date, account WHERE {where}") == expected
+
+
+def test_no_bounds_for_other_tables_and_subqueries():
+    assert bounds("SELECT date FROM OPEN ON 2025-01-01 WHERE date >= 2025-08-01") is None
+    assert bounds("SELECT * FROM #prices WHERE date >= 2025-08-01") is None
+    assert (
+        bounds(
+            "SELECT date WHERE date >= 2025-08-01 "
+            "AND account IN (SELECT account WHERE date < 2025-01-01)"
+        )
+        is None
+    )
+
+
+def test_slice_by_bisection():
+    class Entry:
+        def __init__(self, date):
+            self.date = date
+
+    entries = [Entry(D(2025, month, 1)) for month in range(1, 13)]
+    index = DateIndex(entries)
+
+    assert index.slice() is entries
+    assert [e.date.month for e in index.slice(D(2025, 3, 1), D(2025, 5, 1))] == [3, 4]
+    assert [e.date.month for e in index.slice(D(2025, 11, 15))] == [12]
+    assert [e.date.month for e in index.slice(end=D(2025, 2, 1))] == [1]
+    assert index.slice(D(2025, 6, 1), D(2025, 5, 1)) == []
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT date, account, position WHERE date >= date(\"2025-08-01\") "
+        "AND date < date(\"2025-09-01\") ORDER BY date, account",
+        "SELECT account, sum(position) WHERE date < date(\"2025-04-01\") GROUP BY account",
+        "SELECT account, sum(convert(position, 'EUR')) WHERE date >= 2025-04-01 "
+        "GROUP BY account ORDER BY account",
+    ],
+)
+def test_indexed_query_matches_full_scan(sample, monkeypatch, query):
+    columns, rows = sample.execute(query)
+
+    monkeypatch.setattr(date_index, "query_date_bounds", lambda statement: None)
+    sample.plans.clear()
+    assert sample.execute(query) == (columns, rows)
+
+
+def test_indexed_query_scans_only_the_slice(sample):
+    view = sample.view(D(2025, 8, 1), D(2025, 9, 1))
+    postings = view.tables[None]
+
+    assert {entry.date.month for entry in postings.entries} == {8}
+    # The prices still cover the whole ledger, for the conversions.
+    assert view.tables["prices"] is sample.connection.tables["prices"]
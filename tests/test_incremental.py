@@ -0,0 +1,177 @@
+"""
+Tests for the incremental load, which parses only the changed files.
+"""
+
+import os
+
+import beancount.loader
+import pytest
+from beancount.parser import parser
+
+from ledger2bql import cache, incremental
+
+MAIN = """option "operating_currency" "EUR"
+
+2024-01-01 open Assets:Bank EUR
+2024-01-01 open Expenses:Food EUR
+
+include "2024.bean"
+include "2025.bean"
+"""
+
+YEAR = """{year}-03-01 * "Shop" "Groceries"
+  Expenses:Food  {amount} EUR
+  Assets:Bank
+"""
+
+# A ledger with options, plugins, a glob include, an option in an included
+# file (ignored by beancount), and a failing balance assertion.
+PLUGINS_MAIN = """option "title" "Household"
+option "operating_currency" "EUR"
+option "inferred_tolerance_default" "EUR:0.005"
+plugin "beancount.plugins.auto_accounts"
+plugin "beancount.plugins.implicit_prices"
+
+include "years/*.bean"
+"""
+
+PLUGINS_2024 = """2024-03-01 * "Shop" "Groceries"
+  Expenses:Food  10 EUR
+  Assets:Bank
+
+2024-04-01 * "Broker" "Buy"
+  Assets:Stock  2 ABC {5.00 EUR}
+  Assets:Bank
+"""
+
+PLUGINS_2025 = """option "booking_method" "FIFO"
+
+2025-03-01 * "Shop" "Groceries"
+  Expenses:Food  20 EUR
+  Assets:Bank
+
+2025-05-01 balance Assets:Bank 0 EUR
+"""
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    """A ledger with one file per year, with the cache in a temp directory."""
+    monkeypatch.delenv("LEDGER2BQL_DISABLE_CACHE", raising=False)
+    monkeypatch.setenv("LEDGER2BQL_INCREMENTAL", "1")
+    (tmp_path / "main.bean").write_text(MAIN)
+    (tmp_path / "2024.bean").write_text(YEAR.format(year=2024, amount=10))
+    (tmp_path / "2025.bean").write_text(YEAR.format(year=2025, amount=20))
+    return str(tmp_path / "main.bean")
+
+
+@pytest.fixture
+def parsed_files(monkeypatch):
+    """Record the files that are actually parsed."""
+    parsed = []
+    parse_file = parser.parse_file
+
+    def recording_parse_file(filename, *args, **kwargs):
+        parsed.append(os.path.basename(filename))
+        return parse_file(filename, *args, **kwargs)
+
+    monkeypatch.setattr(parser, "parse_file", recording_parse_file)
+    return parsed
+
+
+def comparable_options(options_map):
+    """The options map, with the display context, which has no equality, as text."""
+    return {**options_map, "dcontext": str(options_map["dcontext"])}
+
+
+def test_matches_beancount_loader(tmp_path, monkeypatch):
+    """The incremental load, fresh and from the parse cache, matches beancount."""
+    monkeypatch.delenv("LEDGER2BQL_DISABLE_CACHE", raising=False)
+    monkeypatch.setenv("LEDGER2BQL_INCREMENTAL", "1")
+    (tmp_path / "main.bean").write_text(PLUGINS_MAIN)
+    (tmp_path / "years").mkdir()
+    (tmp_path / "years" / "2024.bean").write_text(PLUGINS_2024)
+    (tmp_path / "years" / "2025.bean").write_text(PLUGINS_2025)
+    book = str(tmp_path / "main.bean")
+
+    expected_entries, expected_errors, expected_options = beancount.loader.load_file(book)
+    assert expected_errors
+    for _ in range(2):
+        entries, errors, options_map = incremental.load_ledger_incremental(book)
+
+        assert entries == expected_entries
+        assert errors == expected_errors
+        assert comparable_options(options_map) == comparable_options(expected_options)
+
+
+def test_only_changed_file_is_parsed(ledger, parsed_files):
+    incremental.load_ledger_incremental(ledger)
+    assert sorted(parsed_files) == ["2024.bean", "2025.bean", "main.bean"]
+
+    parsed_files.clear()
+    with open(os.path.join(os.path.dirname(ledger), "2025.bean"), "a") as file:
+        file.write("\n" + YEAR.format(year=2025, amount=5).replace("03-01", "04-01"))
+
+    entries, errors, _ = cache.load_ledger(ledger)
+    assert parsed_files == ["2025.bean"]
+    assert not errors
+    assert len([e for e in entries if e.date.year == 2025]) == 2
+
+
+def test_booking_sees_the_whole_ledger(ledger):
+    with open(os.path.join(os.path.dirname(ledger), "2024.bean"), "a") as file:
+        file.write("\n2024-12-31 balance Assets:Bank -10 EUR\n")
+    incremental.load_ledger_incremental(ledger)
+
+    # A failing balance assertion in the unchanged file is still reported.
+    with open(os.path.join(os.path.dirname(ledger), "2025.bean"), "a") as file:
+        file.write("\n2025-12-31 balance Assets:Bank 0 EUR\n")
+    _, errors, _ = incremental.load_ledger_incremental(ledger)
+    assert len(errors) == 1
+
+
+def test_missing_include_is_an_error(ledger):
+    os.unlink(os.path.join(os.path.dirname(ledger), "2025.bean"))
+    _, errors, options_map = incremental.load_ledger_incremental(ledger)
+
+    assert len(errors) == 1
+    assert "does not match any files" in errors[0].message
+    assert len(options_map["include"]) == 2
+
+
+def test_incremental_is_off_by_default(ledger, monkeypatch):
+    monkeypatch.delenv("LEDGER2BQL_INCREMENTAL")
+    cache.load_ledger(ledger)
+    main = os.path.abspath(ledger)
+    assert not os.path.exists(incremental.get_parse_cache_path(main))
+
+
+def test_parallel_parse_matches_sequential(ledger, monkeypatch):
+    monkeypatch.setenv("LEDGER2BQL_DISABLE_CACHE", "1")
+    expected_entries, _, expected_options = incremental.load_ledger_incremental(ledger)
+
+    incremental.set_jobs(2)
+    try:
+        entries, errors, options_map = cache.load_ledger(ledger)
+    finally:
+        incremental.set_jobs(None)
+
+    assert entries == expected_entries
+    assert not errors
+    assert options_map["include"] == expected_options["include"]
+
+
+def test_jobs_option_and_variable(monkeypatch):
+    monkeypatch.delenv("LEDGER2BQL_JOBS", raising=False)
+    assert incremental.get_jobs() == 1
+
+    monkeypatch.setenv("LEDGER2BQL_JOBS", "4")
+    assert incremental.get_jobs() == 4
+    monkeypatch.setenv("LEDGER2BQL_JOBS", "many")
+    assert incremental.get_jobs() == 1
+
+    incremental.set_jobs(3)
+    try:
+        assert incremental.get_jobs() == 3
+    finally:
+        incremental.set_jobs(None)
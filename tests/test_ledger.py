@@ -0,0 +1,44 @@
+"""
+Tests for the shared, once-per-process ledger.
+"""
+
+from click.testing import CliRunner
+
+from ledger2bql import ledger
+from ledger2bql.main import cli
+import tests.test_utils  # noqa: F401 - loads the test .env
+
+
+def test_query_command_loads_ledger_once(monkeypatch):
+    calls = []
+    original_load = ledger.load_ledger
+
+    def counting_load(book):
+        calls.append(book)
+        return original_load(book)
+
+    monkeypatch.setattr(ledger, "load_ledger", counting_load)
+    monkeypatch.setattr(ledger, "_ledgers", {})
+
+    result = CliRunner().invoke(cli, ["query", "holidays", "--no-pager"])
+
+    assert result.exit_code == 0, result.output
+    assert "Holiday" in result.output
+    assert len(calls) == 1
+
+
+def test_ledger_is_reloaded_when_changed(tmp_path, monkeypatch):
+    monkeypatch.setenv("LEDGER2BQL_DISABLE_CACHE", "1")
+    book = tmp_path / "ledger.bean"
+    book.write_text("2025-01-01 open Assets:Cash\n", encoding="utf-8")
+
+    first = ledger.get_ledger(str(book))
+    assert ledger.get_ledger(str(book)) is first
+
+    book.write_text(
+        "2025-01-01 open Assets:Cash\n2025-01-01 open Assets:Bank\n",
+        encoding="utf-8",
+    )
+    second = ledger.get_ledger(str(book))
+    assert second is not first
+    assert len(second.entries) == 2
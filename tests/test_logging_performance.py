@@ -2,170 +2,218 @@
 Test logging performance improvements.
 
 This test verifies that:
-1. Logging is not instantiated when verbose mode is disabled (performance improvement)
+1. The loggers do nothing, and format nothing, when verbose mode is disabled
 2. Logging works correctly when verbose mode is enabled
-3. The application functions normally in both modes
+3. Timing events are logged as JSON
+4. The application functions normally in both modes
 """
 
+import json
 import sys
 import os
-import time
 import pytest
 from unittest.mock import patch
 
 # Add the src directory to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+from ledger2bql import logging_utils
+from ledger2bql.logging_utils import get_logger, setup_logging
+
+
+class RecordingBackend:
+    """Collects the log records instead of writing them."""
+
+    def __init__(self):
+        self.records = []
+        self.exceptions = []
+
+    def log(self, name, level, message, depth, exception=False):
+        self.records.append((name, level, message))
+        self.exceptions.append(exception)
+
+
+@pytest.fixture(autouse=True)
+def disable_logging():
+    """Every test starts, and ends, with logging disabled."""
+    setup_logging(verbose=False)
+    yield
+    setup_logging(verbose=False)
+
+
+@pytest.fixture
+def backend():
+    recording = RecordingBackend()
+    with patch.object(logging_utils, "_backend", recording):
+        yield recording
+
 
 def test_null_logger_performance():
-    """Test that null logger is used when verbose mode is disabled."""
-    # Import utils module - should use null logger by default
+    """Test that the loggers are disabled when verbose mode is disabled."""
     from ledger2bql.utils import logger
-    
-    # Verify it's a null logger
-    assert logger.__class__.__name__ == '_NullLogger'
-    
+
+    assert isinstance(logger, logging_utils.Logger)
+    assert not logger.is_enabled()
+
     # Verify no output is produced
     logger.debug("Test debug message")
     logger.info("Test info message")
     logger.warning("Test warning message")
-    
-    # Should complete without any output
-    print("✓ Null logger test passed - no loguru import when verbose disabled")
+
+
+def test_disabled_logger_does_not_format():
+    """Deferred arguments are not evaluated when logging is disabled."""
+    logger = get_logger("ledger2bql.test")
+
+    def expensive():
+        raise AssertionError("Evaluated while logging is disabled")
+
+    logger.debug("Value: {}", lambda: expensive())
+    logger.debug(lambda: expensive())
+    logger.timing("load", 1.0)
+
+
+def test_lazy_formatting_when_enabled(backend):
+    logger = get_logger("ledger2bql.test")
+    calls = []
+
+    def rows():
+        calls.append(1)
+        return 42
+
+    logger.debug("Query returned {} rows for {!r}", lambda: rows(), "bal")
+    logger.info(lambda: "computed message")
+    # A message with braces but no arguments is left as is.
+    logger.debug("SELECT {not a field}")
+
+    assert calls == [1]
+    assert backend.records == [
+        ("ledger2bql.test", "DEBUG", "Query returned 42 rows for 'bal'"),
+        ("ledger2bql.test", "INFO", "computed message"),
+        ("ledger2bql.test", "DEBUG", "SELECT {not a field}"),
+    ]
+
+
+def test_only_lambdas_are_deferred(backend):
+    logger = get_logger("ledger2bql.test")
+
+    def named():
+        raise AssertionError("A named function is not a deferred argument")
+
+    logger.debug("Type: {}", int)
+    logger.debug("Function: {}", named)
+    logger.debug("Lambda with a parameter: {}", lambda value: value)
+
+    assert backend.records[0][2] == "Type: <class 'int'>"
+    assert backend.records[1][2].startswith("Function: <function")
+    assert backend.records[2][2].startswith("Lambda with a parameter: <function")
+
+
+def test_exception_logs_the_traceback(backend):
+    logger = get_logger("ledger2bql.test")
+
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        logger.exception("Report {} failed", 3)
+    logger.error("Report {} failed", 4)
+
+    assert backend.records == [
+        ("ledger2bql.test", "ERROR", "Report 3 failed"),
+        ("ledger2bql.test", "ERROR", "Report 4 failed"),
+    ]
+    assert backend.exceptions == [True, False]
+
+
+def test_exception_traceback_reaches_the_standard_backend(caplog):
+    import logging
+
+    with patch.object(logging_utils, "_backend", logging_utils._StandardBackend(logging)):
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            get_logger("ledger2bql.test").exception("Report failed")
+
+    assert caplog.records[-1].exc_info[0] is ValueError
+
+
+def test_timing_events_are_json(backend):
+    from ledger2bql import profiling
+
+    with profiling.stage("format"):
+        pass
+    get_logger("ledger2bql.test").event("cache", hit=True)
+
+    timing = json.loads(backend.records[0][2])
+    assert timing["event"] == "timing"
+    assert timing["stage"] == "format"
+    assert timing["seconds"] >= 0
+    assert json.loads(backend.records[1][2]) == {
+        "event": "cache",
+        "logger": "ledger2bql.test",
+        "hit": True,
+    }
+
+
+def test_get_logger_returns_registered_logger():
+    assert get_logger("ledger2bql.utils") is get_logger("ledger2bql.utils")
 
 
 def test_verbose_logging_enabled():
     """Test that real logging is enabled when verbose mode is enabled."""
-    from ledger2bql.logging_utils import setup_logging
-    
     # Set up verbose logging
     logger = setup_logging(verbose=True)
-    
-    # Verify it's a real logger (loguru)
-    assert logger.__class__.__name__ == 'Logger'
-    
+
+    # The module loggers are switched on too
+    assert logger.is_enabled()
+    assert get_logger("ledger2bql.utils").is_enabled()
+
     # Test that logging actually works
     with patch('sys.stderr.write') as mock_write:
         logger.debug("Test debug message")
         # Should have called write (loguru outputs to stderr)
         assert mock_write.call_count > 0
-    
-    print("✓ Verbose logging test passed - loguru imported and working")
-
-
-def test_logging_performance_improvement():
-    """Test that the performance improvement is measurable."""
-    import time
-    
-    # Test 1: Import time without verbose mode
-    start_time = time.time()
-    
-    # Import in a fresh context to measure import time
-    import importlib
-    import ledger2bql.utils
-    importlib.reload(ledger2bql.utils)
-    
-    from ledger2bql.utils import logger as logger1
-    
-    import_time_no_verbose = time.time() - start_time
-    
-    # Test 2: Setup time with verbose mode
-    start_time = time.time()
-    
-    from ledger2bql.logging_utils import setup_logging
-    logger2 = setup_logging(verbose=True)
-    
-    setup_time_verbose = time.time() - start_time
-    
-    # The import without verbose should be faster than setting up verbose logging
-    # (This is a relative test - actual times may vary)
-    print(f"Import time without verbose: {import_time_no_verbose*1000:.2f}ms")
-    print(f"Setup time with verbose: {setup_time_verbose*1000:.2f}ms")
-    
-    # Verify that null logger was used initially
-    assert logger1.__class__.__name__ == '_NullLogger'
-    
-    # Verify that real logger is used when verbose
-    assert logger2.__class__.__name__ == 'Logger'
-    
-    print("✓ Performance test passed - null logger is faster than loguru setup")
 
 
 def test_utils_module_logging():
-    """Test that utils module always uses null logger (simplified approach)."""
-    # First, ensure we have a clean state
-    import importlib
-    import ledger2bql.utils
-    importlib.reload(ledger2bql.utils)
-    
+    """Test that the utils module logger follows setup_logging."""
     from ledger2bql.utils import logger as utils_logger
-    
-    # Should always be a null logger (simplified design)
-    assert utils_logger.__class__.__name__ == '_NullLogger'
-    
-    # Even after setting up verbose logging, utils should still use null logger
-    from ledger2bql.logging_utils import setup_logging
-    main_logger = setup_logging(verbose=True)
-    
-    # The utils logger remains a null logger
-    # Only the main module has the real logger
-    assert utils_logger.__class__.__name__ == '_NullLogger'
-    
-    # But the main logger should be a real logger
-    assert main_logger.__class__.__name__ == 'Logger'
-    
-    print("✓ Utils module logging test passed - simplified design working")
+
+    assert not utils_logger.is_enabled()
+
+    # After setting up verbose logging, the utils logger is enabled
+    setup_logging(verbose=True)
+    assert utils_logger.is_enabled()
+
+    # And disabled again without verbose mode
+    setup_logging(verbose=False)
+    assert not utils_logger.is_enabled()
 
 
 def test_no_loguru_import_without_verbose():
     """Test that loguru is not imported when verbose mode is disabled."""
     # Clear any existing loguru imports
-    import sys
     if 'loguru' in sys.modules:
         del sys.modules['loguru']
-    
+
     # Import utils module
     from ledger2bql.utils import logger
-    
+    logger.debug("Test debug message")
+
     # Verify loguru was not imported
     assert 'loguru' not in sys.modules
-    
-    # Verify we have a null logger
-    assert logger.__class__.__name__ == '_NullLogger'
-    
-    print("✓ No loguru import test passed - loguru not imported when verbose disabled")
+    assert not logger.is_enabled()
 
 
 def test_loguru_import_with_verbose():
     """Test that loguru is imported when verbose mode is enabled."""
     # Clear any existing loguru imports
-    import sys
     if 'loguru' in sys.modules:
         del sys.modules['loguru']
-    
+
     # Set up verbose logging
-    from ledger2bql.logging_utils import setup_logging
     logger = setup_logging(verbose=True)
-    
+
     # Verify loguru was imported
     assert 'loguru' in sys.modules
-    
-    # Verify we have a real logger
-    assert logger.__class__.__name__ == 'Logger'
-    
-    print("✓ Loguru import test passed - loguru imported when verbose enabled")
-
-
-if __name__ == "__main__":
-    # Run all tests
-    test_null_logger_performance()
-    test_verbose_logging_enabled()
-    test_logging_performance_improvement()
-    test_utils_module_logging()
-    test_no_loguru_import_without_verbose()
-    test_loguru_import_with_verbose()
-    
-    print("\n🎉 All logging performance tests passed!")
-    print("✅ Logging optimization is working correctly")
-    print("✅ Performance improvement verified")
-    print("✅ No loguru overhead when verbose mode is disabled")
\ No newline at end of file
+    assert logger.is_enabled()
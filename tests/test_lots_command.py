@@ -2,7 +2,7 @@
 Tests for the Lots command.
 """
 
-from tests.test_utils import run_lots_command, extract_table_data
+from tests.test_utils import run_lots_command, extract_table_data, split_table_row
 
 
 def test_lots_no_args():
@@ -161,3 +161,15 @@ def test_lots_active():
     # Should not show any rows with 0 quantity (which would indicate sold lots)
     # Just check that we have exactly one row with quantity 4
     assert table_output.count("4") >= 1  # At least one occurrence of "4"
+
+
+def test_lots_average_whole_quantity_is_an_integer():
+    result = run_lots_command(["--average"])
+
+    assert result.exit_code == 0
+    rows = [
+        split_table_row(line)
+        for line in extract_table_data(result.output.splitlines())
+        if "Equity:Stocks" in line
+    ]
+    assert rows[0][2] == "4"
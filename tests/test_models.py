@@ -0,0 +1,36 @@
+"""
+Tests for the shared command types.
+"""
+
+from decimal import Decimal
+
+import pytest
+
+from ledger2bql.models import AccountBalance, CommandArgs
+
+
+def test_command_args_defaults_to_none():
+    args = CommandArgs(account_regex=("Assets",), total=True)
+
+    assert args.account_regex == ("Assets",)
+    assert args.total is True
+    assert args.exchange is None
+    assert not hasattr(args, "__dict__")
+
+
+def test_command_args_rejects_unknown_options():
+    with pytest.raises(TypeError, match="bogus"):
+        CommandArgs(bogus=1)
+
+
+def test_command_args_repr_lists_set_options():
+    assert repr(CommandArgs(limit=5)) == "CommandArgs(limit=5)"
+
+
+def test_account_balance_is_slotted():
+    balance = AccountBalance("Assets:Bank", 2, {"EUR": Decimal("1.50")})
+
+    assert not balance.is_empty()
+    assert AccountBalance("Assets", 1, {}).is_empty()
+    with pytest.raises(AttributeError):
+        balance.extra = 1
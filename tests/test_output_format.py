@@ -0,0 +1,84 @@
+"""
+Tests for the machine-readable output formats.
+"""
+
+import csv
+import importlib.util
+import io
+import json
+from decimal import Decimal
+
+import click
+import pytest
+
+from ledger2bql import export
+from tests.test_utils import run_bal_command, run_reg_command
+
+
+def test_reg_csv_output():
+    result = run_reg_command(["exp", "--output-format", "csv"])
+
+    assert result.exit_code == 0, result.output
+    assert "Your BQL query is" not in result.output
+    rows = list(csv.reader(io.StringIO(result.output)))
+    assert rows[0] == ["date", "account", "payee", "narration", "position"]
+    assert ["2025-02-01", "Expenses:Sweets", "Ice Cream Shop", "Ice Cream", "20 EUR"] in rows
+
+
+def test_bal_jsonl_output():
+    result = run_bal_command(["Expenses:Food", "-o", "jsonl"])
+
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert records[0]["account"] == "Expenses:Food"
+    balance = {item["units"]["currency"]: item["units"]["number"] for item in records[0]["balance"]}
+    # Exact numbers, as strings.
+    assert balance == {"EUR": "100", "BAM": "25"}
+
+
+def test_bal_amount_filter_is_rejected():
+    result = run_bal_command(["-a", ">50", "-o", "csv"])
+    assert result.exit_code != 0
+    assert "--output-format" in result.output
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("pyarrow") is not None, reason="pyarrow is installed."
+)
+def test_arrow_requires_pyarrow():
+    result = run_reg_command(["-o", "arrow"])
+    assert result.exit_code != 0
+    assert "pyarrow" in result.output
+
+
+def test_decimal_precision_is_derived_from_the_numbers():
+    numbers = [Decimal("20.00"), None, Decimal("1E+2"), Decimal("0.001")]
+    assert export.decimal_precision("number", numbers) == (38, 3)
+    # More digits than decimal128 holds.
+    assert export.decimal_precision("number", [Decimal("1" * 30 + ".1234567890")]) == (76, 10)
+    with pytest.raises(click.ClickException, match="number"):
+        export.decimal_precision("number", [Decimal("1" * 80)])
+
+
+def test_decimals_are_not_rounded():
+    fitted = export.fit_decimals("number", [Decimal("1.5"), Decimal("1.500"), None], 38, 2)
+    assert fitted == [Decimal("1.50"), Decimal("1.50"), None]
+
+    with pytest.raises(click.ClickException, match="1.234"):
+        export.fit_decimals("number", [Decimal("1.234")], 38, 2)
+    with pytest.raises(click.ClickException, match="does not fit"):
+        export.fit_decimals("number", [Decimal("1" * 37)], 38, 2)
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("pyarrow") is None, reason="pyarrow is not installed."
+)
+def test_arrow_keeps_the_exact_numbers():
+    import pyarrow
+
+    numbers = [Decimal("0.123456789012345678901"), Decimal("12345678901234567890123.5")]
+    stream = io.BytesIO()
+    export.write_arrow([("number", Decimal)], [(number,) for number in numbers], stream)
+
+    table = pyarrow.ipc.open_stream(stream.getvalue()).read_all()
+    assert table.column("number").to_pylist() == numbers
@@ -0,0 +1,90 @@
+"""
+Tests for the cache of the compiled query plans.
+"""
+
+from click.testing import CliRunner
+
+from ledger2bql import ledger, profiling
+from ledger2bql.main import cli
+from ledger2bql.plan_cache import PlanCache, normalize_query
+import tests.test_utils  # noqa: F401 - loads the test .env
+
+
+def test_normalize_query_keeps_string_literals():
+    assert (
+        normalize_query("SELECT  account\n  WHERE payee ~ 'two  spaces' ;")
+        == "SELECT account WHERE payee ~ 'two  spaces'"
+    )
+    assert normalize_query('SELECT "a  b"') == 'SELECT "a  b"'
+
+
+def test_same_query_is_compiled_once(sample, monkeypatch):
+    compiled = []
+    compile_query = sample.compile
+
+    def counting_compile(query):
+        compiled.append(query)
+        return compile_query(query)
+
+    monkeypatch.setattr(sample, "compile", counting_compile)
+
+    query = "SELECT account, sum(position) WHERE account ~ 'Expenses' GROUP BY account"
+    first = sample.execute(query)
+    second = sample.execute("  " + query.replace(" GROUP", "\n  GROUP"))
+
+    assert first == second
+    assert len(compiled) == 1
+    assert (sample.plans.hits, sample.plans.misses) == (1, 1)
+
+
+def test_least_recently_used_plan_is_evicted():
+    plans = PlanCache(maxsize=2)
+    plans.get("a", lambda query: "plan a")
+    plans.get("b", lambda query: "plan b")
+    plans.get("a", lambda query: "new plan a")
+    plans.get("c", lambda query: "plan c")
+
+    assert list(plans.plans) == ["a", "c"]
+    assert plans.get("a", lambda query: "new plan a") == "plan a"
+
+
+def test_plan_cache_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("LEDGER2BQL_PLAN_CACHE_SIZE", "0")
+    plans = PlanCache()
+    plans.get("a", lambda query: "plan a")
+    assert len(plans) == 0
+
+
+def test_reloaded_ledger_has_a_new_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("LEDGER2BQL_DISABLE_CACHE", "1")
+    book = tmp_path / "ledger.bean"
+    book.write_text("2025-01-01 open Assets:Cash\n", encoding="utf-8")
+    first = ledger.get_ledger(str(book))
+    first.execute("SELECT account")
+
+    book.write_text("2025-01-01 open Assets:Cash\n2025-01-02 open Assets:Bank\n", encoding="utf-8")
+    second = ledger.get_ledger(str(book))
+    assert second is not first
+    assert len(second.plans) == 0
+
+
+def test_profile_shows_plan_cache_counters(monkeypatch):
+    monkeypatch.setattr(ledger, "_ledgers", {})
+    result = CliRunner().invoke(cli, ["--profile", "bal", "--no-pager", "--no-cache"])
+
+    assert result.exit_code == 0
+    assert "plan cache misses: 1" in result.stderr
+
+
+def test_profile_counts_plan_cache_hits(sample, monkeypatch):
+    profiler = profiling.Profiler()
+    monkeypatch.setattr(profiling, "_profiler", profiler)
+    try:
+        sample.execute("SELECT account")
+        sample.execute("SELECT account")
+        report = profiler.report()
+    finally:
+        profiler._tracemalloc.stop()
+
+    assert "plan cache misses: 1" in report
+    assert "plan cache hits: 1" in report
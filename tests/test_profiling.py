@@ -0,0 +1,118 @@
+"""
+Tests for the per-stage timing with --profile.
+"""
+
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+
+from click.testing import CliRunner
+
+from ledger2bql import profiling
+from ledger2bql.main import cli
+
+
+def test_profile_prints_the_stage_breakdown(sample_env):
+    result = CliRunner().invoke(cli, ["--profile", "bal", "--no-pager", "--no-cache"])
+
+    assert result.exit_code == 0
+    for stage in ("env", "execute", "format", "render", "output", "total"):
+        assert stage in result.stderr
+    # The breakdown does not end up in the report itself.
+    assert "peak mem" not in result.stdout
+    assert not profiling.is_profiling()
+
+
+def test_profile_file_writes_pstats(tmp_path, sample_env):
+    stats_file = tmp_path / "bal.prof"
+
+    result = CliRunner().invoke(
+        cli, ["--profile-file", str(stats_file), "bal", "--no-pager"]
+    )
+
+    assert result.exit_code == 0
+    assert stats_file.exists()
+    assert pstats.Stats(str(stats_file)).total_calls > 0
+
+
+def test_stage_is_a_no_op_without_profile():
+    assert not profiling.is_profiling()
+    with profiling.stage("load"):
+        pass
+    profiling.count("hits")
+
+
+def test_profiler_accumulates_repeated_stages():
+    profiler = profiling.Profiler()
+    try:
+        for _ in range(2):
+            with profiler.stage("load"):
+                data = [0] * 100000
+        profiler.count("query cache hits")
+        report = profiler.report()
+    finally:
+        profiler._tracemalloc.stop()
+
+    assert "load (x2)" in report
+    assert "query cache hits: 1" in report
+    assert profiler.stages["load"][2] >= 800000
+    del data
+
+
+def test_nested_stage_keeps_the_peak_of_the_outer_stage():
+    profiler = profiling.Profiler()
+    try:
+        with profiler.stage("outer"):
+            data = [0] * 1000000
+            del data
+            with profiler.stage("inner"):
+                small = [0] * 1000
+            with profiler.stage("inner"):
+                data = [0] * 200000
+            del data
+        report = profiler.report()
+    finally:
+        profiler._tracemalloc.stop()
+
+    outer, inner = profiler.stages["outer"][2], profiler.stages["inner"][2]
+    assert outer >= 8000000
+    assert 1600000 <= inner < outer
+    assert "outer" in report
+    del small
+
+
+def test_memory_is_not_traced_while_stages_run_in_threads():
+    profiler = profiling.Profiler()
+
+    def report(_):
+        with profiler.stage("report"):
+            return [0] * 1000
+
+    try:
+        with profiler.stage("load"):
+            data = [0] * 100000
+        with profiler.stage("batch"):
+            profiler.stop_memory_tracing("with --workers 3")
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                list(executor.map(report, range(6)))
+        breakdown = profiler.report()
+    finally:
+        profiler._tracemalloc.stop()
+
+    assert profiler.stages["load"][2] >= 800000
+    assert profiler.stages["batch"][2] is None
+    assert profiler.stages["report"][0] == 6
+    assert profiler.stages["report"][2] is None
+    assert "Peak memory not traced with --workers 3." in breakdown
+    del data
+
+
+def test_batch_with_workers_stops_the_memory_tracing(tmp_path, sample_env):
+    batch_file = tmp_path / "reports.txt"
+    batch_file.write_text("bal\nreg\n")
+
+    result = CliRunner().invoke(
+        cli, ["--profile", "batch", str(batch_file), "-d", str(tmp_path), "-w", "2"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Peak memory not traced with --workers 2." in result.stderr
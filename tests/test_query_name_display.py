@@ -0,0 +1,28 @@
+"""
+Tests for the name of the named query shown by the query command, run in
+process.
+"""
+
+import pytest
+from click.testing import CliRunner
+
+from ledger2bql.main import cli
+
+pytestmark = pytest.mark.usefixtures("sample_env")
+
+
+@pytest.mark.parametrize("command", ["query", "q"])
+def test_exact_name_does_not_show_the_query_name(command):
+    result = CliRunner().invoke(cli, [command, "holidays", "--no-pager"])
+
+    assert result.exit_code == 0, result.output
+    assert "select * where payee ~ 'holiday'" in result.output
+    assert "Holiday" in result.output
+    assert "Running query:" not in result.output
+
+
+def test_partial_name_shows_the_query_name():
+    result = CliRunner().invoke(cli, ["q", "holi", "--no-pager"])
+
+    assert result.exit_code == 0, result.output
+    assert "Running query: holidays" in result.output
@@ -63,3 +63,62 @@ def test_reg_with_total_flag_short():
 
     # Check that the Running Total column header is present
     assert "Running Total" in table_output
+
+
+def make_rows(amounts, exchange=None):
+    """Register query rows for the given (number, currency) amounts."""
+    from decimal import Decimal
+
+    from beancount.core.amount import Amount
+    from beancount.core.position import Position
+
+    rows = []
+    for number, currency in amounts:
+        units = Amount(Decimal(number), currency)
+        row = ("2025-01-01", "Assets:Cash", "Payee", "", Position(units, None))
+        if exchange:
+            converted = units if currency == exchange else Amount(Decimal(number) * 2, exchange)
+            row += (converted,)
+        rows.append(row)
+    return rows
+
+
+def test_running_totals_per_currency():
+    from ledger2bql.models import CommandArgs
+    from ledger2bql.register import format_output
+
+    rows = make_rows([("10.50", "EUR"), ("1000", "USD"), ("-0.50", "EUR"), ("0.25", "USD")])
+    output = format_output(rows, CommandArgs(total=True))
+
+    assert [row[4:] for row in output] == [
+        ["10.50 EUR", "10.50 EUR"],
+        ["1,000.00 USD", "1,000.00 USD"],
+        ["-0.50 EUR", "10.00 EUR"],
+        ["0.25 USD", "1,000.25 USD"],
+    ]
+
+
+def test_converted_running_totals():
+    from ledger2bql.models import CommandArgs
+    from ledger2bql.register import format_output
+
+    rows = make_rows([("10", "EUR"), ("5", "USD")], exchange="EUR")
+    output = format_output(rows, CommandArgs(total=True, exchange="EUR"))
+
+    assert list(output[1][4:]) == ["5.00 USD", "5.00 USD", "10.00 EUR", "20.00 EUR"]
+
+
+def test_rows_are_formatted_when_read(monkeypatch):
+    from ledger2bql import register
+    from ledger2bql.models import CommandArgs
+
+    formatted = []
+    monkeypatch.setattr(register, "format_amount", lambda *amount: formatted.append(amount) or "")
+    output = register.format_output(make_rows([("1", "EUR")] * 1000), CommandArgs(total=True))
+
+    assert len(output) == 1000
+    assert formatted == []
+
+    output[-2:]
+    output[-1]
+    assert len(formatted) == 4
@@ -0,0 +1,81 @@
+"""
+Tests for the register read window by window, as it is paged.
+"""
+
+import pytest
+from click.testing import CliRunner
+
+from ledger2bql import utils
+from ledger2bql.main import cli
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT date, account, position",
+        "SELECT date, account, position, convert(position, 'EUR') "
+        "WHERE account ~ '^Expenses' AND date >= 2025-03-01",
+        "SELECT date, account WHERE account ~ 'Nothing:Like:This'",
+    ],
+)
+def test_windows_add_up_to_the_query(sample, query):
+    windows = list(sample.windows(query, 3))
+
+    assert [row for rows in windows for row in rows] == sample.execute(query)[1]
+    assert len(windows) > 1
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT date, account ORDER BY account",
+        "SELECT date, account LIMIT 5",
+        "SELECT account, sum(position) GROUP BY account",
+    ],
+)
+def test_queries_needing_all_rows_run_whole(sample, query):
+    windows = list(sample.windows(query, 3))
+
+    assert windows == [sample.execute(query)[1]]
+
+
+@pytest.fixture
+def paged(sample_env, monkeypatch):
+    """Run the reports as if they were paged on a terminal."""
+    monkeypatch.setenv("LEDGER2BQL_PAGE_SIZE", "4")
+    monkeypatch.setattr(utils, "is_interactive", lambda: True)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [["-T"], ["-T", "-X", "EUR"], ["Expenses", "-T"], ["Nothing:Like:This"]],
+)
+def test_paged_register_matches_the_whole_report(paged, options):
+    whole = CliRunner().invoke(cli, ["reg", "--no-pager", *options])
+    windowed = CliRunner().invoke(cli, ["reg", *options])
+
+    assert windowed.exit_code == 0, windowed.output
+    assert windowed.output == whole.output
+
+
+def test_windows_are_read_as_the_rows_are_shown(sample):
+    from ledger2bql.models import CommandArgs
+    from ledger2bql.register import format_output, format_windows
+
+    query = "SELECT date, account, payee, narration, position"
+    args = CommandArgs(total=True)
+    windows = list(sample.windows(query, 4))
+    read = []
+
+    def read_windows():
+        for rows in windows:
+            read.append(rows)
+            yield rows
+
+    rows = format_windows(read_windows(), args)
+    next(rows)
+    assert len(read) < len(windows)
+
+    # The running totals are carried over from each window to the next.
+    whole = format_output(sample.execute(query)[1], args)
+    assert [list(row) for row in format_windows(windows, args)] == list(whole)
@@ -0,0 +1,87 @@
+"""
+Tests for the register of the last postings only, with --tail.
+"""
+
+import pytest
+from click.testing import CliRunner
+
+from ledger2bql import ledger
+from ledger2bql.main import cli
+from tests.test_utils import extract_table_data, split_table_row
+
+
+@pytest.fixture(autouse=True)
+def small_windows(sample_env, monkeypatch):
+    # Read small windows back, so that the opening balances are needed.
+    monkeypatch.setattr(ledger, "TAIL_WINDOW_SIZE", 2)
+
+
+def table_rows(output):
+    """The cells of the rows of the report table, without the headers."""
+    return [split_table_row(line) for line in extract_table_data(output.splitlines())]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ["-T"],
+        ["-T", "-X", "EUR"],
+        ["Assets", "-T"],
+        ["Expenses", "-T", "-X", "EUR", "-b", "2025-03"],
+        ["not", "Equity", "-T", "-e", "2025-08"],
+        [],
+    ],
+)
+@pytest.mark.parametrize("count", [1, 3, 10])
+def test_tail_is_the_end_of_the_whole_register(options, count):
+    whole = CliRunner().invoke(cli, ["reg", "--no-pager", *options])
+    tail = CliRunner().invoke(cli, ["reg", "--no-pager", "--tail", str(count), *options])
+
+    assert tail.exit_code == 0, tail.output
+    assert table_rows(whole.output)
+    assert table_rows(tail.output) == table_rows(whole.output)[-count:]
+
+
+def test_tail_longer_than_the_register():
+    whole = CliRunner().invoke(cli, ["reg", "--no-pager", "Expenses", "-T"])
+    tail = CliRunner().invoke(cli, ["reg", "--no-pager", "Expenses", "-T", "--tail", "1000"])
+
+    assert table_rows(tail.output) == table_rows(whole.output)
+
+
+def test_tail_of_nothing():
+    result = CliRunner().invoke(cli, ["reg", "--no-pager", "Nothing:Like:This", "--tail", "5"])
+
+    assert result.exit_code == 0
+    assert "No records found." in result.output
+
+
+def test_ledger_tail_reads_only_the_last_entries(sample):
+    book = sample
+    query = "SELECT date, account, position"
+
+    start, columns, rows = book.tail(query, 3)
+
+    assert 0 < start < len(book.entries)
+    assert [name for name, _ in columns] == ["date", "account", "position"]
+    assert rows == book.execute(query)[1][-len(rows) :]
+    assert len(rows) >= 3
+
+
+@pytest.mark.parametrize("options", [["--sort", "date"], ["--limit", "5"]])
+def test_tail_with_sort_or_limit_is_rejected(options):
+    result = CliRunner().invoke(cli, ["reg", "--tail", "5", *options])
+
+    assert result.exit_code == 2
+    assert "--tail cannot be used" in result.output
+
+
+@pytest.mark.parametrize("options", [[], ["-T"], ["Assets"]])
+def test_tail_is_exported(options):
+    whole = CliRunner().invoke(cli, ["reg", "-o", "csv", *options])
+    tail = CliRunner().invoke(cli, ["reg", "-o", "csv", "--tail", "2", *options])
+
+    assert tail.exit_code == 0, tail.output
+    header, *lines = tail.output.splitlines()
+    assert header == whole.output.splitlines()[0]
+    assert lines == whole.output.splitlines()[-2:]
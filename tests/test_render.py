@@ -0,0 +1,58 @@
+"""
+Tests for the streaming table renderer.
+"""
+
+import datetime
+
+from tabulate import tabulate
+
+from ledger2bql.render import iter_table_lines, render_table
+
+HEADERS = ["Date", "Account", "Payee", "Amount"]
+ALIGNMENTS = ["left", "left", "left", "right"]
+ROWS = [
+    [datetime.date(2025, 1, 1), "Assets:Bank:Checking", None, "1,000.00 EUR"],
+    [datetime.date(2025, 2, 1), "Expenses:Sweets", "Ice Cream Shop", "20.00 EUR"],
+    ("-------------------", "-------------------", "", ""),
+    ["Total", "", " padded ", "-1,020.00 EUR"],
+]
+
+
+def expected_table(rows):
+    return tabulate(
+        rows,
+        headers=HEADERS,
+        tablefmt="psql",
+        colalign=ALIGNMENTS,
+        disable_numparse=True,
+    )
+
+
+def test_matches_tabulate_psql():
+    output = "".join(render_table(ROWS, HEADERS, ALIGNMENTS))
+    assert output == expected_table(ROWS)
+
+
+def test_generator_rows_are_streamed():
+    produced = []
+
+    def rows():
+        for row in ROWS:
+            produced.append(row)
+            yield row
+
+    lines = iter_table_lines(rows(), HEADERS, ALIGNMENTS, sample_size=1)
+
+    # The header is available after sampling a single row.
+    assert next(lines).startswith("+")
+    assert len(produced) == 1
+
+    # Within the sample size, the output is the same as tabulate's.
+    output = "".join(iter_table_lines(iter(ROWS), HEADERS, ALIGNMENTS))
+    assert output == expected_table(ROWS)
+
+
+def test_multiline_cells_fall_back_to_tabulate():
+    rows = [["2025-01-01", "Assets:Cash", "two\nlines", "1.00 EUR"]]
+    output = "".join(render_table(rows, HEADERS, ALIGNMENTS))
+    assert output == expected_table(rows)
@@ -0,0 +1,114 @@
+"""
+Tests for the on-disk cache of the query results.
+"""
+
+import os
+import shutil
+
+import pytest
+from click.testing import CliRunner
+
+from ledger2bql import ledger, result_cache, utils
+from ledger2bql.main import cli
+
+SAMPLE_LEDGER = os.path.join(os.path.dirname(__file__), "sample_ledger.bean")
+
+QUERY = "SELECT account, sum(position) GROUP BY account ORDER BY account"
+
+
+@pytest.fixture
+def book(tmp_path, monkeypatch):
+    """A private copy of the sample ledger, with the cache in a temp directory."""
+    monkeypatch.delenv("LEDGER2BQL_DISABLE_CACHE", raising=False)
+    monkeypatch.delenv("LEDGER2BQL_RESULT_CACHE_SIZE", raising=False)
+    monkeypatch.setattr(ledger, "_ledgers", {})
+    path = tmp_path / "ledger.bean"
+    shutil.copy(SAMPLE_LEDGER, path)
+    return str(path)
+
+
+def fail_execute(*args, **kwargs):
+    raise AssertionError("The result should have come from the cache.")
+
+
+def test_result_is_written_and_reused(book, monkeypatch):
+    columns, rows = utils.run_bql_query_with_columns(QUERY, book)
+    assert os.path.exists(result_cache.get_result_path(QUERY, book))
+
+    monkeypatch.setattr(utils, "_execute_query", fail_execute)
+    # The same query, written differently.
+    assert utils.run_bql_query_with_columns(f"  {QUERY}\n;", book) == (columns, rows)
+
+
+def test_modified_file_invalidates_result(book):
+    rows = utils.run_bql_query(QUERY, book)
+
+    with open(book, "a") as file:
+        file.write('\n2025-12-31 * "Late" \n  Expenses:Food  1.00 EUR\n  Assets:Cash\n')
+
+    assert utils.run_bql_query(QUERY, book) != rows
+
+
+def test_cache_can_be_bypassed(book, monkeypatch):
+    utils.run_bql_query(QUERY, book)
+    monkeypatch.setattr(utils, "_execute_query", fail_execute)
+
+    with pytest.raises(AssertionError):
+        utils.run_bql_query(QUERY, book, use_cache=False)
+
+    monkeypatch.setenv("LEDGER2BQL_RESULT_CACHE_SIZE", "0")
+    with pytest.raises(AssertionError):
+        utils.run_bql_query(QUERY, book)
+
+
+def test_daemon_results_are_not_stored(book, monkeypatch):
+    monkeypatch.setattr(
+        utils.daemon, "execute_query", lambda query, book: ([("account", str)], [])
+    )
+
+    utils.run_bql_query(QUERY, book)
+
+    assert not os.path.exists(result_cache.get_result_path(QUERY, book))
+
+
+def test_least_recently_used_results_are_evicted(book):
+    queries = [f"SELECT account WHERE account ~ '{name}'" for name in ("a", "b", "c")]
+    for query in queries:
+        utils.run_bql_query(query, book)
+    paths = [result_cache.get_result_path(query, book) for query in queries]
+    for age, path in enumerate(paths, 1):
+        os.utime(path, (age, age))
+    # Reading the first result again leaves the second as the oldest.
+    assert result_cache.read_result(queries[0], book) is not None
+    sizes = [os.path.getsize(path) for path in paths]
+
+    result_cache.evict(sum(sizes) - 1)
+
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
+
+
+def test_cache_command_stats_and_clear(book, monkeypatch):
+    monkeypatch.setenv("BEANCOUNT_FILE", book)
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ["bal", "--no-pager"])
+    assert result.exit_code == 0, result.output
+
+    result = runner.invoke(cli, ["cache", "stats"])
+    assert result.exit_code == 0, result.output
+    assert "Results:" in result.output
+    assert result_cache.get_cache_stats()["results"]["files"] == 1
+
+    result = runner.invoke(cli, ["cache", "clear", "--results"])
+    assert result.exit_code == 0, result.output
+    assert "Removed 1 cached files." in result.output
+    assert result_cache.get_cache_stats()["results"]["files"] == 0
+    assert result_cache.get_cache_stats()["ledgers"]["files"] == 1
+
+
+def test_result_that_cannot_be_pickled_is_not_cached(book):
+    rows = [(lambda: None,)]
+
+    result_cache.write_result(QUERY, book, [("value", object)], rows, [book])
+
+    assert not os.path.exists(result_cache.get_result_path(QUERY, book))
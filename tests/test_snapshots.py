@@ -0,0 +1,160 @@
+"""
+Tests for the monthly balance snapshots, which answer the balances at a date.
+"""
+
+import datetime
+import os
+import shutil
+
+import beanquery
+import pytest
+from beancount.core.inventory import Inventory
+from beancount.core.position import Position
+from click.testing import CliRunner
+
+from ledger2bql import ledger, snapshots
+from ledger2bql.main import cli
+from ledger2bql.snapshots import BalanceSnapshots, query_snapshot_end
+
+SAMPLE_LEDGER = os.path.join(os.path.dirname(__file__), "sample_ledger.bean")
+
+D = datetime.date
+
+
+def snapshot_end(query):
+    return query_snapshot_end(beanquery.connect("").parse(query))
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        (
+            "SELECT account, units(sum(position)) as Balance "
+            "WHERE date < date(\"2025-08-01\") ORDER BY account ASC",
+            D(2025, 8, 1),
+        ),
+        (
+            "SELECT account, units(sum(position)) as Balance, "
+            "convert(sum(position), 'EUR') as Converted "
+            "WHERE account ~ 'Assets' AND NOT (account ~ 'Cash') "
+            "AND currency IN ('EUR', 'CHF') AND date <= 2025-08-31 "
+            "ORDER BY sum(position) DESC LIMIT 3",
+            D(2025, 9, 1),
+        ),
+        ("SELECT account, sum(position) WHERE date < 2025-08-01 ORDER BY balance", None),
+        ("SELECT account, sum(position)", None),
+        ("SELECT account, sum(position) WHERE date >= 2025-01-01 AND date < 2025-08-01", None),
+        ("SELECT account, sum(position) WHERE payee ~ 'Shop' AND date < 2025-08-01", None),
+        ("SELECT account, sum(position) WHERE number > 10 AND date < 2025-08-01", None),
+        ("SELECT account, position WHERE date < 2025-08-01", None),
+        ("SELECT account, count(*) WHERE date < 2025-08-01", None),
+        ("SELECT root(account, 1) as account, sum(position) WHERE date < 2025-08-01", None),
+        ("SELECT account, last(date), sum(position) WHERE date < 2025-08-01", None),
+    ],
+)
+def test_query_snapshot_end(query, expected):
+    assert snapshot_end(query) == expected
+
+
+@pytest.fixture
+def book(tmp_path, monkeypatch):
+    """A private copy of the sample ledger, with the cache in a temp directory."""
+    monkeypatch.delenv("LEDGER2BQL_DISABLE_CACHE", raising=False)
+    monkeypatch.delenv("LEDGER2BQL_DISABLE_SNAPSHOTS", raising=False)
+    monkeypatch.setattr(ledger, "_ledgers", {})
+    path = tmp_path / "ledger.bean"
+    shutil.copy(SAMPLE_LEDGER, path)
+    monkeypatch.setenv("BEANCOUNT_FILE", str(path))
+    return str(path)
+
+
+def test_snapshots_hold_the_balances_at_each_month(book):
+    loaded = ledger.get_ledger(book)
+    built = BalanceSnapshots.build(loaded.entries)
+
+    assert built.months[0] == D(2025, 2, 1)
+    assert built.months[-1] == D(2025, 10, 1)
+    for month in built.months:
+        query = f"SELECT account, sum(position) WHERE date < {month} GROUP BY account"
+        expected = {
+            account: inventory
+            for account, inventory in loaded.connection.execute(query).fetchall()
+        }
+        _, entry = built.find(month)
+        assert entry.date < month
+        balances = {}
+        for posting in entry.postings:
+            balances.setdefault(posting.account, Inventory()).add_position(
+                Position(posting.units, posting.cost)
+            )
+        assert balances == expected, month
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ["-e", "2025-08-15"],
+        ["-e", "2025-09"],
+        ["-e", "2025-09-10", "-X", "EUR", "-T"],
+        ["Assets", "-e", "2025-09-09", "-H"],
+        ["not", "Expenses", "-e", "2025-10", "-S", "-balance"],
+        ["-e", "2025-09-30", "--currency", "ABC", "-Z"],
+        ["-d", "..2025-04-15"],
+        ["-e", "2025-01-15"],
+        ["-e", "2030-01-01", "-X", "EUR"],
+    ],
+)
+def test_balances_from_snapshots_match_the_full_scan(book, monkeypatch, options):
+    with_snapshots = CliRunner().invoke(cli, ["bal", "--no-pager", "--no-cache", *options])
+    assert ledger.get_ledger(book)._snapshots is not None
+
+    monkeypatch.setenv("LEDGER2BQL_DISABLE_SNAPSHOTS", "1")
+    monkeypatch.setattr(ledger, "_ledgers", {})
+    full_scan = CliRunner().invoke(cli, ["bal", "--no-pager", "--no-cache", *options])
+
+    assert with_snapshots.exit_code == 0, with_snapshots.output
+    assert with_snapshots.output == full_scan.output
+
+
+def test_other_queries_do_not_build_the_snapshots(book):
+    result = CliRunner().invoke(cli, ["bal", "--no-pager", "--no-cache", "-b", "2025-03"])
+
+    assert result.exit_code == 0
+    assert ledger.get_ledger(book)._snapshots is None
+    assert not os.path.exists(snapshots.get_snapshot_path(book))
+
+
+def fail_build(entries):
+    raise AssertionError("The snapshots should have been read from the cache.")
+
+
+def test_snapshots_are_stored_with_the_ledger_cache(book, monkeypatch):
+    built = ledger.get_ledger(book).snapshots
+    assert os.path.exists(snapshots.get_snapshot_path(book))
+
+    monkeypatch.setattr(ledger, "_ledgers", {})
+    monkeypatch.setattr(BalanceSnapshots, "build", fail_build)
+    cached = ledger.get_ledger(book).snapshots
+
+    assert cached.months == built.months
+    assert cached.postings == built.postings
+
+
+def test_modified_ledger_invalidates_the_snapshots(book):
+    ledger.get_ledger(book).snapshots
+
+    with open(book, "a", encoding="utf-8") as file:
+        file.write(
+            "\n2025-12-05 * \"Late\"\n"
+            "  Expenses:Food  7.00 EUR\n"
+            "  Assets:Cash:Pocket-Money\n"
+        )
+
+    assert snapshots.read_snapshots(book) is None
+    assert ledger.get_ledger(book).snapshots.months[-1] == D(2026, 1, 1)
+
+
+def test_snapshots_are_disabled_with_the_cache(book, monkeypatch):
+    monkeypatch.setenv("LEDGER2BQL_DISABLE_CACHE", "1")
+
+    assert ledger.get_ledger(book).snapshots is None
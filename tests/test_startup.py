@@ -0,0 +1,68 @@
+"""
+Tests for the CLI startup cost.
+
+The subcommands and the query engine are imported lazily, so that i.e.
+`--version` and `--help` do not pay for importing beanquery and tabulate.
+"""
+
+import json
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from ledger2bql.main import cli
+
+# Startup import-time budget for the CLI entry point, in seconds.
+IMPORT_TIME_BUDGET = 0.5
+
+HEAVY_MODULES = ["beanquery", "beancount.loader", "tabulate"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from ledger2bql.main import cli
+from click.testing import CliRunner
+CliRunner().invoke(cli, sys.argv[1:])
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+
+def run_probe(*args):
+    """Run the CLI in a fresh interpreter and report its import time and modules."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES), *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_version_does_not_import_query_engine():
+    probe = run_probe("--version")
+    assert probe["heavy"] == []
+
+
+def test_help_does_not_import_query_engine():
+    probe = run_probe("--help")
+    assert probe["heavy"] == []
+
+
+def test_startup_import_time_budget():
+    # Take the best of a few runs to reduce the noise.
+    elapsed = min(run_probe("--version")["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_TIME_BUDGET, f"Startup took {elapsed * 1000:.0f} ms"
+
+
+def test_commands_are_listed_and_aliases_resolve():
+    result = CliRunner().invoke(cli, ["--help"])
+    for name in ["assert", "bal", "lots", "price", "query", "reg", "serve"]:
+        assert name in result.output
+
+    for alias in ["b", "r", "q", "l", "a", "p"]:
+        result = CliRunner().invoke(cli, [alias, "--help"])
+        assert result.exit_code == 0
+        assert f"Usage: cli {alias}" in result.output
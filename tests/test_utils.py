@@ -57,3 +57,16 @@ def extract_table_data(output_lines):
             table_data.append(line)
 
     return table_data
+
+
+def extract_table_headers(output_lines):
+    """Extract the cells of the header line of the table."""
+    for i, line in enumerate(output_lines):
+        if line.strip().startswith("+") and "---" in line:
+            return split_table_row(output_lines[i + 1])
+    return []
+
+
+def split_table_row(line):
+    """Split a table line into its cells, without the padding."""
+    return [cell.strip() for cell in line.split("|")[1:-1]]